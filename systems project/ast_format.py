@@ -0,0 +1,396 @@
+# ast_format.py
+
+import mmap
+import struct
+import sys
+from array import array
+
+from lexical import Token, TokenKind, TokenBuffer
+from ast_nodes import (
+    ProgramNode, StatementListNode, DeclarationNode, AssignmentNode, DoWhileNode,
+    BinaryOpNode, IntLiteralNode, FloatLiteralNode, IdentifierNode, literal_node
+)
+from symbol_table import SymbolTable
+from tree_walker import iter_preorder
+
+# Binary format, version 1:
+#
+#   header   b'CAST', u16 version, u8 byte order (b'<' or b'>'), pad, u32 section count
+#   section  u8 name length, name, u8 typecode, pad, u64 data length in bytes,
+#            data, zero padding to a multiple of 8
+#
+# The tree is stored in pre-order as parallel arrays with one entry per node:
+# node kind, subtree size (a node's children start right after it and its next
+# sibling `size` entries later), slot, value (operator kind, or an index into
+# the string table for names and literal text), and the line and column of the
+# node's token. Declarations also keep their identifier's position in `aux`,
+# packed as line << 32 | column. Literal values are stored as exact hex text
+# (base-16 ints, float.hex), so nothing is rounded or limited in size.
+# Optional sections hold the symbol table and the token stream.
+#
+# Loading maps every array as a memoryview over the input buffer or an mmap of
+# the file: nothing is copied and no node object exists until a subtree is
+# decoded.
+
+MAGIC = b'CAST'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHcxI')
+SECTION_INFO = struct.Struct('<cxxxQ')
+BYTE_ORDER = b'<' if sys.byteorder == 'little' else b'>'
+
+PROGRAM = 0
+STATEMENT_LIST = 1
+INT_DECLARATION = 2
+FLOAT_DECLARATION = 3
+ASSIGNMENT = 4
+DO_WHILE = 5
+BINARY_OP = 6
+INT_LITERAL = 7
+FLOAT_LITERAL = 8
+IDENTIFIER = 9
+
+NODE_KINDS = {
+    ProgramNode: PROGRAM, StatementListNode: STATEMENT_LIST, AssignmentNode: ASSIGNMENT,
+    DoWhileNode: DO_WHILE, BinaryOpNode: BINARY_OP, IntLiteralNode: INT_LITERAL,
+    FloatLiteralNode: FLOAT_LITERAL, IdentifierNode: IDENTIFIER,
+}
+TYPE_KEYWORDS = {
+    INT_DECLARATION: (TokenKind.INT_KEYWORD, 'int'),
+    FLOAT_DECLARATION: (TokenKind.FLOAT_KEYWORD, 'float'),
+}
+OPERATOR_LEXEMES = {
+    TokenKind.PLUS: '+', TokenKind.MINUS: '-', TokenKind.MULTIPLY: '*', TokenKind.DIVIDE: '/',
+    TokenKind.LESS_THAN: '<', TokenKind.GREATER_THAN: '>', TokenKind.LESS_EQUAL: '<=',
+    TokenKind.GREATER_EQUAL: '>=', TokenKind.EQUAL_EQUAL: '==', TokenKind.NOT_EQUAL: '!=',
+}
+
+
+class FormatError(Exception):
+    pass
+
+
+def narrowest(values):
+    """Copies integer values into the smallest array type that holds them; the
+    reader takes each section's typecode from the file."""
+    low = min(values, default=0)
+    high = max(values, default=0)
+    for typecode in ('B', 'b', 'H', 'h', 'I', 'i'):
+        bits = array(typecode).itemsize * 8
+        minimum, maximum = (0, (1 << bits) - 1) if typecode.isupper() else (-(1 << bits - 1), (1 << bits - 1) - 1)
+        if minimum <= low and high <= maximum:
+            return array(typecode, values)
+    return array('q', values)
+
+
+class StringTable:
+    def __init__(self):
+        self.strings = []
+        self.indexes = {}
+
+    def add(self, text):
+        index = self.indexes.get(text)
+        if index is None:
+            index = self.indexes[text] = len(self.strings)
+            self.strings.append(text)
+        return index
+
+    def sections(self):
+        encoded = [text.encode('utf-8') for text in self.strings]
+        offsets = array('q', [0])
+        for data in encoded:
+            offsets.append(offsets[-1] + len(data))
+        return {'string_offsets': offsets, 'string_data': array('B', b''.join(encoded))}
+
+
+def encode_tree(root, strings):
+    kinds = array('B')
+    child_counts = array('i')
+    slots = array('i')
+    values = array('i')
+    lines = array('i')
+    columns = array('i')
+    aux = array('q')
+    for node, _ in iter_preorder(root):
+        node_type = type(node)
+        slot = value = line = column = extra = 0
+        if node_type is DeclarationNode:
+            kind = FLOAT_DECLARATION if node.type_token.kind == TokenKind.FLOAT_KEYWORD else INT_DECLARATION
+            identifier = node.identifier_token
+            slot, value = node.slot, strings.add(identifier.lexeme)
+            line, column = node.type_token.line, node.type_token.column
+            extra = identifier.line << 32 | identifier.column
+        else:
+            kind = NODE_KINDS[node_type]
+            if kind == ASSIGNMENT:
+                token = node.identifier_token
+                slot, value, line, column = node.slot, strings.add(token.lexeme), token.line, token.column
+            elif kind == IDENTIFIER:
+                token = node.token
+                slot, value, line, column = node.slot, strings.add(token.lexeme), token.line, token.column
+            elif kind == BINARY_OP:
+                token = node.operator_token
+                value, line, column = token.kind, token.line, token.column
+            elif kind == INT_LITERAL:
+                value, line, column = strings.add(format(node.value, 'x')), node.line, node.column
+            elif kind == FLOAT_LITERAL:
+                value, line, column = strings.add(node.value.hex()), node.line, node.column
+        kinds.append(kind)
+        child_counts.append(len(node.children))
+        slots.append(slot)
+        values.append(value)
+        lines.append(line)
+        columns.append(column)
+        aux.append(extra)
+
+    # Subtree sizes, computed from the end: the sizes of a node's children are
+    # the most recent ones on the stack.
+    sizes = array('i', bytes(4 * len(kinds)))
+    stack = []
+    for index in range(len(kinds) - 1, -1, -1):
+        size = 1
+        for _ in range(child_counts[index]):
+            size += stack.pop()
+        sizes[index] = size
+        stack.append(size)
+    return {'kinds': kinds, 'sizes': sizes, 'slots': slots, 'values': values,
+            'lines': lines, 'columns': columns, 'aux': aux}
+
+
+def encode_symbol_table(symbol_table, strings):
+    return {
+        'symbol_names': array('i', (strings.add(name) for name in symbol_table.names)),
+        'symbol_types': array('b', symbol_table.types),
+        'symbol_previous': array('q', symbol_table.previous),
+        'symbol_depths': array('q', symbol_table.depths),
+        'symbol_temporaries': array('q', symbol_table.temporaries),
+    }
+
+
+def encode_tokens(tokens):
+    source = tokens.source
+    is_text = isinstance(source, str)
+    data = source.encode('utf-8') if is_text else bytes(source)
+    return {
+        'token_source': array('B', data),
+        'token_source_is_text': array('B', [is_text]),
+        'token_kinds': array('B', tokens.kinds),
+        'token_starts': array('q', tokens.starts),
+        'token_ends': array('q', tokens.ends),
+        'token_lines': array('q', tokens.lines),
+        'token_columns': array('q', tokens.columns),
+    }
+
+
+def dumps(root=None, symbol_table=None, tokens=None):
+    """Serializes any of an AST, its symbol table and a token buffer."""
+    strings = StringTable()
+    sections = {}
+    if root is not None:
+        sections.update(encode_tree(root, strings))
+    if symbol_table is not None:
+        sections.update(encode_symbol_table(symbol_table, strings))
+    if tokens is not None:
+        sections.update(encode_tokens(tokens))
+    sections.update(strings.sections())
+
+    parts = [HEADER.pack(MAGIC, FORMAT_VERSION, BYTE_ORDER, len(sections))]
+    size = HEADER.size
+    for name, values in sections.items():
+        if name != 'token_source' and name != 'string_data':
+            values = narrowest(values)
+        encoded_name = name.encode('ascii')
+        data = values.tobytes()
+        header = bytes([len(encoded_name)]) + encoded_name
+        # Pad the section header so the data starts 8-byte aligned.
+        header += b'\0' * (-(size + len(header) + SECTION_INFO.size) % 8)
+        header += SECTION_INFO.pack(values.typecode.encode('ascii'), len(data))
+        padding = b'\0' * (-len(data) % 8)
+        parts.extend((header, data, padding))
+        size += len(header) + len(data) + len(padding)
+    return b''.join(parts)
+
+
+def dump(path, root=None, symbol_table=None, tokens=None):
+    with open(path, 'wb') as output:
+        output.write(dumps(root, symbol_table, tokens))
+
+
+def loads(data):
+    return SerializedProgram(memoryview(data))
+
+
+def load(path):
+    """Maps the file and loads it without reading it into memory."""
+    with open(path, 'rb') as input_file:
+        mapping = mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ)
+    return SerializedProgram(memoryview(mapping), mapping)
+
+
+class SerializedProgram:
+    """A loaded buffer. Arrays are memoryviews into it; `node(index)` decodes
+    one subtree (and remembers it), `root()` decodes the whole program, and
+    `kind`, `size` and `children` navigate without decoding anything."""
+
+    def __init__(self, view, mapping=None):
+        self.view = view
+        self.mapping = mapping
+        self.sections = {}
+        self.decoded = {}
+        if len(view) < HEADER.size:
+            raise FormatError("Truncated header")
+        magic, version, byte_order, count = HEADER.unpack_from(view, 0)
+        if magic != MAGIC:
+            raise FormatError("Not a serialized program")
+        if version != FORMAT_VERSION:
+            raise FormatError(f"Unsupported format version {version}")
+        if byte_order != BYTE_ORDER:
+            raise FormatError("Serialized with a different byte order")
+        offset = HEADER.size
+        for _ in range(count):
+            name_length = view[offset]
+            name = bytes(view[offset + 1:offset + 1 + name_length]).decode('ascii')
+            offset += 1 + name_length
+            offset += -(offset + SECTION_INFO.size) % 8
+            typecode, length = SECTION_INFO.unpack_from(view, offset)
+            offset += SECTION_INFO.size
+            if offset + length > len(view):
+                raise FormatError(f"Truncated section '{name}'")
+            self.sections[name] = view[offset:offset + length].cast(typecode.decode('ascii'))
+            offset += length + (-length % 8)
+        self.strings_cache = {}
+
+    def close(self):
+        # Decoded nodes stay valid; token buffers from tokens() do not.
+        for section in self.sections.values():
+            section.release()
+        self.sections.clear()
+        self.view.release()
+        if self.mapping is not None:
+            self.mapping.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self.sections['kinds']) if 'kinds' in self.sections else 0
+
+    def string(self, index):
+        text = self.strings_cache.get(index)
+        if text is None:
+            offsets = self.sections['string_offsets']
+            data = self.sections['string_data']
+            text = self.strings_cache[index] = bytes(data[offsets[index]:offsets[index + 1]]).decode('utf-8')
+        return text
+
+    def kind(self, index):
+        return self.sections['kinds'][index]
+
+    def size(self, index):
+        return self.sections['sizes'][index]
+
+    def children(self, index):
+        sizes = self.sections['sizes']
+        child = index + 1
+        end = index + sizes[index]
+        while child < end:
+            yield child
+            child += sizes[child]
+
+    def root(self):
+        return self.node(0)
+
+    def statements(self):
+        """Decodes the program's top-level statements one at a time."""
+        for statement_list in self.children(0):
+            for statement in self.children(statement_list):
+                yield self.node(statement)
+
+    def node(self, index):
+        node = self.decoded.get(index)
+        if node is None:
+            node = self.decoded[index] = self.decode(index)
+        return node
+
+    def decode(self, index):
+        # Children are decoded before their parents by walking the subtree
+        # backwards; each node takes its children off the top of `built`.
+        sections = self.sections
+        kinds, sizes, slots, values = sections['kinds'], sections['sizes'], sections['slots'], sections['values']
+        lines, columns, aux = sections['lines'], sections['columns'], sections['aux']
+        string = self.string
+        built = []
+        for position in range(index + sizes[index] - 1, index - 1, -1):
+            kind = kinds[position]
+            line, column = lines[position], columns[position]
+            if kind == IDENTIFIER:
+                node = IdentifierNode(Token(TokenKind.IDENTIFIER, string(values[position]), line, column))
+                node.slot = slots[position]
+            elif kind == INT_LITERAL:
+                node = literal_node(int(string(values[position]), 16), line, column)
+            elif kind == FLOAT_LITERAL:
+                node = literal_node(float.fromhex(string(values[position])), line, column)
+            elif kind == BINARY_OP:
+                operator = values[position]
+                left = built.pop()
+                right = built.pop()
+                node = BinaryOpNode(left, Token(operator, OPERATOR_LEXEMES[operator], line, column), right)
+            elif kind == ASSIGNMENT:
+                node = AssignmentNode(Token(TokenKind.IDENTIFIER, string(values[position]), line, column), built.pop())
+                node.slot = slots[position]
+            elif kind == INT_DECLARATION or kind == FLOAT_DECLARATION:
+                keyword_kind, keyword = TYPE_KEYWORDS[kind]
+                packed = aux[position]
+                identifier = Token(TokenKind.IDENTIFIER, string(values[position]), packed >> 32, packed & 0xFFFFFFFF)
+                initializer = built.pop() if sizes[position] > 1 else None
+                node = DeclarationNode(Token(keyword_kind, keyword, line, column), identifier, initializer)
+                node.slot = slots[position]
+            elif kind == DO_WHILE:
+                body = built.pop()
+                node = DoWhileNode(body, built.pop())
+            elif kind == PROGRAM or kind == STATEMENT_LIST:
+                node = ProgramNode() if kind == PROGRAM else StatementListNode()
+                child = position + 1
+                end = position + sizes[position]
+                while child < end:
+                    node.children.append(built.pop())
+                    child += sizes[child]
+            else:
+                raise FormatError(f"Unknown node kind {kind} at {position}")
+            built.append(node)
+        return built.pop()
+
+    def symbol_table(self):
+        sections = self.sections
+        if 'symbol_names' not in sections:
+            return None
+        table = SymbolTable()
+        table.names = [sys.intern(self.string(index)) for index in sections['symbol_names']]
+        table.types = array('b', sections['symbol_types'])
+        table.previous = array('l', sections['symbol_previous'])
+        table.depths = array('l', sections['symbol_depths'])
+        table.temporaries = list(sections['symbol_temporaries'])
+        # Only the outermost scope is still open after analysis.
+        for slot, name in enumerate(table.names):
+            if table.depths[slot] == 0:
+                table.visible[name] = slot
+                table.scopes[0].append(slot)
+        return table
+
+    def tokens(self):
+        """A TokenBuffer whose arrays are views into the loaded buffer."""
+        sections = self.sections
+        if 'token_kinds' not in sections:
+            return None
+        source = sections['token_source']
+        if sections['token_source_is_text'][0]:
+            source = bytes(source).decode('utf-8')
+        tokens = TokenBuffer(source)
+        tokens.kinds = sections['token_kinds']
+        tokens.starts = sections['token_starts']
+        tokens.ends = sections['token_ends']
+        tokens.lines = sections['token_lines']
+        tokens.columns = sections['token_columns']
+        return tokens
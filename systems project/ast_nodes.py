@@ -1,96 +1,172 @@
-class ASTNode:
-    def __init__(self, token=None):
-        self.token = token
-        self.children = []
-
-    def add_child(self, node):
-        if node:
-            self.children.append(node)
-
-    def __repr__(self):
-        return self.__class__.__name__
-
-class ProgramNode(ASTNode):
-    pass
-
-class StatementListNode(ASTNode):
-    pass
-
-class DeclarationNode(ASTNode):
-    def __init__(self, type_token, identifier_token, assignment_expr=None):
-        super().__init__(type_token)
-        self.type_token = type_token
-        self.identifier_token = identifier_token
-        self.assignment_expr = assignment_expr
-        self.add_child(assignment_expr)
-
-    def __repr__(self):
-        return f"Declaration({self.identifier_token.lexeme}: {self.type_token.lexeme})"
-
-
-class AssignmentNode(ASTNode):
-    def __init__(self, identifier_token, assignment_expr):
-        super().__init__(identifier_token)
-        self.identifier_token = identifier_token
-        self.assignment_expr = assignment_expr
-        self.add_child(assignment_expr)
-
-    def __repr__(self):
-        return f"Assignment({self.identifier_token.lexeme})"
-
-
-class DoWhileNode(ASTNode):
-    def __init__(self, body, condition):
-        super().__init__()
-        self.body = body
-        self.condition = condition
-        self.add_child(body)
-        self.add_child(condition)
-
-    def __repr__(self):
-        return "DoWhile"
-
-class ExpressionNode(ASTNode):
-    pass
-
-class BinaryOpNode(ExpressionNode):
-    def __init__(self, left, operator_token, right):
-        super().__init__(operator_token)
-        self.left = left
-        self.operator_token = operator_token
-        self.right = right
-        self.add_child(left)
-        self.add_child(right)
-
-    def __repr__(self):
-        return f"BinaryOp({self.operator_token.lexeme})"
-
-class FactorNode(ExpressionNode):
-    pass
-
-class IntLiteralNode(FactorNode):
-    def __init__(self, token):
-        super().__init__(token)
-        self.value = int(token.lexeme)
-
-    def __repr__(self):
-        return f"IntLiteral({self.value})"
-
-
-class FloatLiteralNode(FactorNode):
-    def __init__(self, token):
-        super().__init__(token)
-        self.value = float(token.lexeme)
-
-    def __repr__(self):
-        return f"FloatLiteral({self.value})"
-
-
-class IdentifierNode(FactorNode):
-    def __init__(self, token):
-        super().__init__(token)
-        self.name = token.lexeme
-
-    def __repr__(self):
-        return f"Identifier({self.name})"
-
+from lexical import Token, TokenKind
+
+# Nodes use __slots__ and keep each child in exactly one named field; `children`
+# is derived from those fields on demand. Only ProgramNode and StatementListNode
+# store a real list of children. `slot` on declarations, assignments and
+# identifiers is the symbol table slot filled in by semantic analysis (-1 until
+# then).
+
+class ASTNode:
+    __slots__ = ()
+    token = None
+    children = ()
+
+    def __repr__(self):
+        return self.__class__.__name__
+
+class ListNode(ASTNode):
+    """Base of the nodes that hold a list of children and can grow."""
+    __slots__ = ('children',)
+
+    def __init__(self):
+        self.children = []
+
+    def add_child(self, node):
+        if node:
+            self.children.append(node)
+
+class ProgramNode(ListNode):
+    __slots__ = ()
+
+class StatementListNode(ListNode):
+    __slots__ = ()
+
+class DeclarationNode(ASTNode):
+    __slots__ = ('type_token', 'identifier_token', 'assignment_expr', 'slot')
+
+    def __init__(self, type_token, identifier_token, assignment_expr=None):
+        self.type_token = type_token
+        self.identifier_token = identifier_token
+        self.assignment_expr = assignment_expr
+        self.slot = -1
+
+    @property
+    def token(self):
+        return self.type_token
+
+    @property
+    def children(self):
+        return () if self.assignment_expr is None else (self.assignment_expr,)
+
+    def __repr__(self):
+        return f"Declaration({self.identifier_token.lexeme}: {self.type_token.lexeme})"
+
+
+class AssignmentNode(ASTNode):
+    __slots__ = ('identifier_token', 'assignment_expr', 'slot')
+
+    def __init__(self, identifier_token, assignment_expr):
+        self.identifier_token = identifier_token
+        self.assignment_expr = assignment_expr
+        self.slot = -1
+
+    @property
+    def token(self):
+        return self.identifier_token
+
+    @property
+    def children(self):
+        return (self.assignment_expr,)
+
+    def __repr__(self):
+        return f"Assignment({self.identifier_token.lexeme})"
+
+
+class DoWhileNode(ASTNode):
+    __slots__ = ('body', 'condition')
+
+    def __init__(self, body, condition):
+        self.body = body
+        self.condition = condition
+
+    @property
+    def children(self):
+        return (self.body, self.condition)
+
+    def __repr__(self):
+        return "DoWhile"
+
+class ExpressionNode(ASTNode):
+    __slots__ = ()
+
+class BinaryOpNode(ExpressionNode):
+    __slots__ = ('left', 'operator_token', 'right')
+
+    def __init__(self, left, operator_token, right):
+        self.left = left
+        self.operator_token = operator_token
+        self.right = right
+
+    @property
+    def token(self):
+        return self.operator_token
+
+    @property
+    def children(self):
+        return (self.left, self.right)
+
+    def __repr__(self):
+        return f"BinaryOp({self.operator_token.lexeme})"
+
+class FactorNode(ExpressionNode):
+    __slots__ = ()
+
+# Literals keep only their value and position; `token` rebuilds a Token view
+# for error reporting. Its lexeme is spelled from the value, so it can differ
+# from the source text ('1.50' comes back as '1.5', '007' as '7').
+
+class IntLiteralNode(FactorNode):
+    __slots__ = ('value', 'line', 'column')
+
+    def __init__(self, token):
+        self.value = int(token.lexeme)
+        self.line = token.line
+        self.column = token.column
+
+    @property
+    def token(self):
+        return Token(TokenKind.INT_LITERAL, str(self.value), self.line, self.column)
+
+    def __repr__(self):
+        return f"IntLiteral({self.value})"
+
+
+class FloatLiteralNode(FactorNode):
+    __slots__ = ('value', 'line', 'column')
+
+    def __init__(self, token):
+        self.value = float(token.lexeme)
+        self.line = token.line
+        self.column = token.column
+
+    @property
+    def token(self):
+        return Token(TokenKind.FLOAT_LITERAL, repr(self.value), self.line, self.column)
+
+    def __repr__(self):
+        return f"FloatLiteral({self.value})"
+
+
+def literal_node(value, line, column):
+    """Builds an int or float literal node for a computed value."""
+    node_class = FloatLiteralNode if type(value) is float else IntLiteralNode
+    node = node_class.__new__(node_class)
+    node.value = value
+    node.line = line
+    node.column = column
+    return node
+
+
+class IdentifierNode(FactorNode):
+    __slots__ = ('token', 'slot')
+
+    def __init__(self, token):
+        self.token = token
+        self.slot = -1
+
+    @property
+    def name(self):
+        return self.token.lexeme
+
+    def __repr__(self):
+        return f"Identifier({self.name})"
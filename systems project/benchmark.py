@@ -0,0 +1,1231 @@
+import argparse
+import asyncio
+import datetime
+import json
+import mmap
+import os
+import pickle
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+from lexical import Lexer, LexicalError, TokenBuffer
+from parallel_lexer import MIN_CHUNK_SIZE, ParallelLexer, _count_chunk_lines, _lex_chunk, chunk_boundaries
+from parser import Parser, SyntaxError
+from semantic_analzer import SemanticAnalyzer, SemanticError
+from symbol_table import TYPE_FLOAT
+from diagnostics import CollectingSink, FileSink
+from interpreter import Interpreter, ExecutionError
+from complier import Compiler, VirtualMachine
+from pycodegen import CompiledProgram
+from optimizer import PassManager
+from ssa import SSABuilder, run_ssa
+from compile_cache import CompileCache, run_front_end
+from incremental import IncrementalDocument
+from driver import CompileDriver, collect_sources, compile_file
+from stats import Instrumentation, tree_shape
+from compile_server import CompileServer, ServerError, encode_frame, percentile, wait_for_server
+from vector_exec import VectorExecutor, np
+from tiered import HOT_LOOP_THRESHOLD, LoopCache, TieredInterpreter
+from workload import ERROR_EXCEPTIONS, ERROR_KINDS, TIERS, ProgramGenerator, write_program
+import ast_format
+from tree_walker import iter_preorder
+
+# Inputs that exercise the corners where the two lexer modes could disagree.
+LEXER_EDGE_CASES = [
+    "int x = 1;\r\nfloat y;\rdo { x = x + 1; } while (x < 3);\n",
+    "int1 intx _int 1int 2.5float int١ x١",
+    "a == b; a != b; a <= b >= c < d > e;",
+    "/* unterminated comment\nint x;",
+    "int x; // trailing comment without newline",
+    "// comment\r/* multi\r\nline */ x = 1;",
+    "x = 3 $ 4;",
+    "int y;\n\n   z = y @ 2;",
+    "/* café */ x = 1;\n// naïve\n  y = x;",
+    "/* 日本 */ x = ü;",
+    "",
+]
+
+
+def generate_source(target_size, seed=0):
+    """Builds a valid, semantically correct program of roughly target_size characters."""
+    rng = random.Random(seed)
+    parts = ["int counter = 0;\nfloat total = 0.0;\n"]
+    size = len(parts[0])
+    int_names = ['counter']
+    all_names = ['counter', 'total']
+    index = 0
+    while size < target_size:
+        index += 1
+        name = f"value_{index}"
+        choice = rng.random()
+        if choice < 0.3:
+            text = f"int {name} = ({rng.choice(int_names)} + {rng.randint(0, 999)}) * {rng.randint(1, 9)};\n"
+            int_names.append(name)
+            all_names.append(name)
+        elif choice < 0.5:
+            text = f"float {name} = {rng.choice(all_names)} / {rng.randint(1, 99)}.{rng.randint(0, 99)};\n"
+            all_names.append(name)
+        elif choice < 0.7:
+            text = f"total = total + {rng.choice(all_names)} * 2; // running sum\n"
+        elif choice < 0.85:
+            text = (f"/* loop {index} */\ndo {{\n    counter = counter + 1;\n"
+                    f"    total = total - {rng.randint(0, 9)}.5;\n}} while (counter < {rng.randint(1, 50)});\n")
+        else:
+            text = f"counter = counter - ({rng.choice(int_names)} - {rng.choice(int_names)});\n"
+        parts.append(text)
+        size += len(text)
+    return ''.join(parts)
+
+
+def generate_executable_source(statements, seed=0, max_iterations=6):
+    """Builds a program whose loops are bounded (each do-while counts its own
+    counter up to a small limit), for differential execution checks. Some
+    divisions use variables and may divide by zero at run time."""
+    rng = random.Random(seed)
+    lines = []
+    int_names = []
+    float_names = []
+    counters = set()
+
+    def operand(allow_float):
+        pool = int_names + float_names if allow_float else int_names
+        if pool and rng.random() < 0.6:
+            return rng.choice(pool)
+        if allow_float and rng.random() < 0.4:
+            return f"{rng.randint(0, 20)}.{rng.randint(0, 99)}"
+        return str(rng.randint(0, 20))
+
+    def expression(allow_float, depth=0):
+        if depth > 2 or rng.random() < 0.3:
+            return operand(allow_float)
+        operator = rng.choice(['+', '-', '*', '/', '+', '*', '<', '>=', '!='])
+        # Multiplying only by a small literal keeps ints from growing
+        # exponentially inside loops.
+        right = str(rng.randint(0, 3)) if operator == '*' else expression(allow_float, depth + 1)
+        text = f"{expression(allow_float, depth + 1)} {operator} {right}"
+        return f"({text})" if rng.random() < 0.5 else text
+
+    def block(count, indent, depth):
+        for _ in range(count):
+            choice = rng.random()
+            if choice < 0.25 or not int_names:
+                name = f"i{len(int_names) + len(float_names)}_{depth}"
+                lines.append(f"{indent}int {name} = {expression(False)};")
+                int_names.append(name)
+            elif choice < 0.4:
+                name = f"f{len(int_names) + len(float_names)}_{depth}"
+                lines.append(f"{indent}float {name} = {expression(True)};")
+                float_names.append(name)
+            elif choice < 0.8:
+                if float_names and rng.random() < 0.4:
+                    lines.append(f"{indent}{rng.choice(float_names)} = {expression(True)};")
+                else:
+                    # Loop counters are only ever written by their own loop.
+                    targets = [name for name in int_names if name not in counters]
+                    if targets:
+                        lines.append(f"{indent}{rng.choice(targets)} = {expression(False)};")
+            elif depth < 2:
+                counter = f"loop{len(counters) + 1}"
+                counters.add(counter)
+                lines.append(f"{indent}int {counter} = 0;")
+                int_names.append(counter)
+                saved = (len(int_names), len(float_names))
+                lines.append(f"{indent}do {{")
+                lines.append(f"{indent}    {counter} = {counter} + 1;")
+                block(rng.randint(1, 4), indent + "    ", depth + 1)
+                lines.append(f"{indent}}} while ({counter} < {rng.randint(1, max_iterations)});")
+                # Variables declared in the body go out of scope.
+                del int_names[saved[0]:]
+                del float_names[saved[1]:]
+
+    block(statements, "", 0)
+    return "\n".join(lines) + "\n"
+
+
+def analyzed_program(source):
+    analyzer = SemanticAnalyzer()
+    root = Parser(Lexer(source).tokenize_buffer()).parse()
+    analyzer.analyze(root)
+    return root, analyzer.symbol_table
+
+
+def execution_outcome(run):
+    try:
+        return run(), None
+    except ExecutionError as e:
+        return None, str(e)
+
+
+def same_results(left, right):
+    # Compares values and their int/float types; NaN equals NaN here.
+    if left[1] != right[1] or (left[0] is None) != (right[0] is None):
+        return False
+    if left[0] is None:
+        return True
+    if left[0].keys() != right[0].keys():
+        return False
+    for name, value in left[0].items():
+        other = right[0][name]
+        if type(value) is not type(other):
+            return False
+        if value != other and not (value != value and other != other):
+            return False
+    return True
+
+
+def check_backend_agrees(label, make_runner, programs=200):
+    """Differential check of an execution backend against the reference
+    Interpreter on generated programs."""
+    for seed in range(programs):
+        source = generate_executable_source(12, seed)
+        root, symbol_table = analyzed_program(source)
+        expected = execution_outcome(lambda: Interpreter(symbol_table).run(root))
+        actual = execution_outcome(make_runner(root, symbol_table))
+        if not same_results(expected, actual):
+            raise AssertionError(f"{label} disagrees with the interpreter on seed {seed}:\n{source}\n{expected}\n{actual}")
+
+
+def counting_loop_source(iterations):
+    return (f"int i = 0;\nint total = 0;\nfloat scaled = 0.0;\n"
+            f"do {{\n    total = total + i * 3;\n    scaled = scaled + i / 2.0;\n    i = i + 1;\n"
+            f"}} while (i < {iterations});\n")
+
+
+def optimizable_loop_source(iterations):
+    # `base` is unknown after its loop, so `base * base + height` is invariant
+    # but not constant; `width * height` folds once `width` is propagated.
+    return (f"int base = 0;\ndo {{\n    base = base + 3;\n}} while (base < 30);\n"
+            f"int i = 0;\nint width = 0;\nwidth = width + 640;\nint height = 480;\n"
+            f"int offset = 0;\nfloat total = 0.0;\nfloat scale = 0.5;\n"
+            f"do {{\n    offset = i * 2;\n    offset = (base * base + height + i) / 2;\n"
+            f"    total = total + scale * 1 * (width * height) + offset;\n    i = i + 1;\n"
+            f"}} while (i < {iterations});\n")
+
+
+def lex_outcome(source, mode):
+    try:
+        return [(t.kind, t.lexeme, t.line, t.column) for t in Lexer(source, mode).iter_tokens()], None
+    except LexicalError as e:
+        return None, str(e)
+
+
+def check_lexers_agree(sources):
+    """Differential check: the fast and regex lexers must produce identical
+    token streams, or identical LexicalError messages, from str and from
+    UTF-8 bytes alike."""
+    for source in sources:
+        fast = lex_outcome(source, 'fast')
+        for mode, encoded in (('regex', False), ('fast', True), ('regex', True)):
+            other = lex_outcome(source.encode('utf-8') if encoded else source, mode)
+            if fast != other:
+                raise AssertionError(f"Lexer disagrees on {source[:60]!r} ({mode}, bytes={encoded}):\n"
+                                     f"fast:  {fast}\nother: {other}")
+
+
+def time_call(function, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def benchmark_lexer(size_mb=4):
+    source = generate_source(int(size_mb * 1024 * 1024))
+    check_lexers_agree(LEXER_EDGE_CASES + [generate_source(20000, seed) for seed in range(5)] + [source])
+    print(f"--- Lexer ({len(source) / 1e6:.1f} MB, token streams verified identical) ---")
+    for mode in ('regex', 'fast'):
+        elapsed, buffer = time_call(lambda: Lexer(source, mode).tokenize_buffer())
+        print(f"{mode:>6}: {len(buffer) / elapsed:12,.0f} tokens/sec  ({elapsed:.3f} s)")
+
+
+def buffer_outcome(make_buffer):
+    try:
+        buffer = make_buffer()
+    except LexicalError as e:
+        return None, str(e)
+    return (list(buffer.kinds), list(buffer.starts), list(buffer.ends), list(buffer.lines), list(buffer.columns)), None
+
+
+def tokens_outcome(make_buffer):
+    try:
+        return [token_fields(token) for token in make_buffer()], None
+    except LexicalError as e:
+        return None, str(e)
+
+
+def check_parallel_lexer_agrees(sources, workers):
+    """Differential check: chunked parallel lexing must reproduce the serial
+    token columns and LexicalError messages exactly, even with tiny chunks.
+    A mapped file is lexed as bytes, so its offsets are byte offsets, but its
+    tokens, lines, columns and errors must match the str lexer's."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'source.txt')
+        for source in sources:
+            serial = buffer_outcome(lambda: Lexer(source).tokenize_buffer())
+            serial_tokens = tokens_outcome(lambda: Lexer(source).tokenize_buffer())
+            with open(path, 'w', newline='', encoding='utf-8') as file:
+                file.write(source)
+            for chunk_size in (1, 7, 64, 4096):
+                parallel = buffer_outcome(lambda: ParallelLexer(source, workers, chunk_size).tokenize_buffer())
+                mapped = tokens_outcome(lambda: ParallelLexer.from_path(path, workers, chunk_size).tokenize_buffer())
+                if parallel != serial or mapped != serial_tokens:
+                    raise AssertionError(f"Parallel lexer disagrees (chunk_size={chunk_size}) on {source[:60]!r}")
+
+
+def parallel_lexer_costs(path, workers):
+    """Times, in this process, each step of ParallelLexer.from_path(path,
+    workers) and returns (parent seconds, worker seconds, result bytes). The
+    parent's share (boundary scan, unpickling and stitching results) does not
+    shrink with more workers and bounds the speedup."""
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as source:
+        start = time.perf_counter()
+        boundaries = chunk_boundaries(source, max(MIN_CHUNK_SIZE, len(source) // (workers * 4) + 1))
+        spans = list(zip(boundaries, boundaries[1:]))
+        parent = time.perf_counter() - start
+        start = time.perf_counter()
+        first_line, results = 1, []
+        for chunk_start, chunk_end in spans:
+            task = (path, chunk_start, chunk_end)
+            results.append(pickle.dumps(_lex_chunk((None, *task, first_line, 'fast')), pickle.HIGHEST_PROTOCOL))
+            first_line += _count_chunk_lines(task)
+        worker = time.perf_counter() - start
+        start = time.perf_counter()
+        buffer = TokenBuffer(source)
+        for result in results:
+            buffer.extend_columns(*pickle.loads(result)[:5])
+        parent += time.perf_counter() - start
+        del buffer
+    return parent, worker, sum(map(len, results))
+
+
+def benchmark_parallel_lexer(size_mb=16, workers=None):
+    import os
+    workers = workers or os.cpu_count() or 1
+    source = generate_source(int(size_mb * 1024 * 1024))
+    broken = generate_source(50000, 1) + "\nint z = 1 $ 2;\n" + generate_source(50000, 2)
+    check_parallel_lexer_agrees(LEXER_EDGE_CASES + [generate_source(20000, 3), broken], max(workers, 2))
+    print(f"--- Parallel lexer ({len(source) / 1e6:.1f} MB, {workers} workers, output verified against serial) ---")
+    serial_time, serial = time_call(lambda: Lexer(source).tokenize_buffer(), repeat=1)
+    print(f"{'serial':>20}: {len(serial) / serial_time:12,.0f} tokens/sec  ({serial_time:.3f} s)")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'source.txt')
+        with open(path, 'w', newline='') as file:
+            file.write(source)
+        # The first call also starts the worker pool; later calls reuse it.
+        runs = (('parallel (str, cold)', lambda: ParallelLexer(source, workers)),
+                ('parallel (str, warm)', lambda: ParallelLexer(source, workers)),
+                ('parallel (file)', lambda: ParallelLexer.from_path(path, workers)))
+        for label, make_lexer in runs:
+            parallel_time, parallel = time_call(lambda: make_lexer().tokenize_buffer(), repeat=1)
+            if list(parallel.starts) != list(serial.starts) or list(parallel.lines) != list(serial.lines):
+                raise AssertionError(f"{label} lexer output differs from serial lexer")
+            print(f"{label:>20}: {len(parallel) / parallel_time:12,.0f} tokens/sec  ({parallel_time:.3f} s, "
+                  f"speedup {serial_time / parallel_time:.2f}x)")
+            del parallel
+        # Speedup over the serial lexer if worker time divided perfectly,
+        # before the cost of moving results through pipes.
+        parent, worker, result_bytes = parallel_lexer_costs(path, max(workers, 32))
+        bounds = ', '.join(f"{cores} cores {serial_time / (parent + worker / cores):.1f}x" for cores in (8, 32))
+        print(f"{'work split':>20}: parent {parent:.3f} s, workers {worker:.3f} s in all,"
+              f" {result_bytes / 1e6:.0f} MB of results; at most {bounds}")
+
+
+def deep_parenthesised_source(depth):
+    return "int x = " + "(" * depth + "x + 1" + ")" * depth + ";\n"
+
+
+def wide_expression_source(width):
+    terms = " + ".join(f"{index} * x" for index in range(width))
+    return f"int x = 1;\nx = {terms};\n"
+
+
+def deep_do_while_source(depth):
+    return "int x = 0;\n" + "do { x = x + 1;\n" * depth + "} while (x < 0);\n" * depth
+
+
+def benchmark_parser(scale=20000):
+    print("--- Parser (explicit-stack expressions and statements) ---")
+    workloads = [
+        ('deep parentheses', deep_parenthesised_source(scale)),
+        ('wide expression', wide_expression_source(scale)),
+        ('deep do-while', deep_do_while_source(scale)),
+        ('generated program', generate_source(scale * 100)),
+    ]
+    for label, source in workloads:
+        buffer = Lexer(source).tokenize_buffer()
+        elapsed, _ = time_call(lambda: Parser(buffer).parse())
+        print(f"{label:>18}: {len(buffer) / elapsed:12,.0f} tokens/sec  ({elapsed:.3f} s)")
+
+
+def count_nodes(root):
+    count = 0
+    pending = [root]
+    while pending:
+        node = pending.pop()
+        count += 1
+        pending.extend(node.children)
+    return count
+
+
+def benchmark_ast_memory(statements=1000000):
+    import tracemalloc
+    source = "int x = 0;\nfloat y = 1.5;\n" + "x = (x + 1) * 2;\ny = y / 2.0;\n" * (statements // 2)
+    buffer = Lexer(source).tokenize_buffer()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    root = Parser(buffer).parse()
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    nodes = count_nodes(root)
+    print(f"--- AST memory ({statements:,} statements) ---")
+    print(f"{nodes:,} nodes, {retained / nodes:.1f} bytes per node (including referenced tokens)")
+
+
+def benchmark_semantic_tracing(size_mb=1):
+    import contextlib
+    import io
+    import os
+    source = generate_source(int(size_mb * 1024 * 1024))
+    root = Parser(Lexer(source).tokenize_buffer()).parse()
+    nodes = count_nodes(root)
+    print(f"--- Semantic analysis tracing ({nodes:,} nodes) ---")
+
+    def analyze_with_line_printing():
+        # Reproduces the old behaviour: one unbuffered print per visited node.
+        with contextlib.redirect_stdout(io.StringIO()):
+            SemanticAnalyzer(FileSink(buffer_lines=1)).analyze(root)
+
+    with open(os.devnull, 'w') as devnull:
+        variants = [
+            ('print per node', analyze_with_line_printing),
+            ('buffered file', lambda: SemanticAnalyzer(FileSink(devnull)).analyze(root)),
+            ('in-memory', lambda: SemanticAnalyzer(CollectingSink()).analyze(root)),
+            ('tracing off', lambda: SemanticAnalyzer().analyze(root)),
+        ]
+        for label, analyze in variants:
+            elapsed, _ = time_call(analyze)
+            print(f"{label:>15}: {nodes / elapsed:12,.0f} nodes/sec  ({elapsed:.3f} s)")
+
+
+def benchmark_vm(iterations=200000):
+    check_backend_agrees('VM', lambda root, table: VirtualMachine(Compiler(table).compile(root)).run)
+    root, symbol_table = analyzed_program(counting_loop_source(iterations))
+    bytecode = Compiler(symbol_table).compile(root)
+    print(f"--- Bytecode VM ({iterations:,}-iteration loop, results verified against the AST interpreter) ---")
+    interpreter_time, expected = time_call(lambda: Interpreter(symbol_table).run(root), repeat=1)
+    vm_time, actual = time_call(lambda: VirtualMachine(bytecode).run(), repeat=1)
+    if expected != actual:
+        raise AssertionError(f"VM result {actual} differs from interpreter result {expected}")
+    print(f"interpreter: {iterations / interpreter_time:12,.0f} iterations/sec  ({interpreter_time:.3f} s)")
+    print(f"         vm: {iterations / vm_time:12,.0f} iterations/sec  ({vm_time:.3f} s)")
+
+
+def benchmark_pycodegen(iterations=200000):
+    check_backend_agrees('Python codegen', lambda root, table: CompiledProgram(root, table).run)
+    # Deeper than CPython's block nesting limit: must fall back, not fail.
+    root, symbol_table = analyzed_program(deep_do_while_source(40))
+    if CompiledProgram(root, symbol_table).run() != Interpreter(symbol_table).run(root):
+        raise AssertionError("Python codegen fallback disagrees with the interpreter")
+
+    root, symbol_table = analyzed_program(counting_loop_source(iterations))
+    print(f"--- Python codegen ({iterations:,}-iteration loop, results verified against the AST interpreter) ---")
+    compile_time, program = time_call(lambda: CompiledProgram(root, symbol_table), repeat=1)
+    expected = Interpreter(symbol_table).run(root)
+    vm_time, _ = time_call(VirtualMachine(Compiler(symbol_table).compile(root)).run, repeat=1)
+    native_time, actual = time_call(program.run, repeat=1)
+    if expected != actual:
+        raise AssertionError(f"Python codegen result {actual} differs from interpreter result {expected}")
+    print(f"translate+compile: {compile_time * 1000:.2f} ms")
+    print(f"               vm: {iterations / vm_time:12,.0f} iterations/sec  ({vm_time:.3f} s)")
+    print(f"           native: {iterations / native_time:12,.0f} iterations/sec  ({native_time:.3f} s)")
+
+
+def optimized_runner(level, backend):
+    def make_runner(root, symbol_table):
+        PassManager(level).run(root, symbol_table)
+        return backend(root, symbol_table)
+    return make_runner
+
+
+def benchmark_optimizer(iterations=200000):
+    for level in (1, 2):
+        check_backend_agrees(f"-O{level} interpreter", optimized_runner(level, lambda root, table: lambda: Interpreter(table).run(root)))
+        check_backend_agrees(f"-O{level} VM", optimized_runner(level, lambda root, table: VirtualMachine(Compiler(table).compile(root)).run))
+        check_backend_agrees(f"-O{level} Python codegen", optimized_runner(level, lambda root, table: CompiledProgram(root, table).run))
+
+    source = optimizable_loop_source(iterations)
+    print(f"--- Optimizer ({iterations:,}-iteration loop, results verified against -O0) ---")
+    expected = None
+    for level in (0, 1, 2):
+        root, symbol_table = analyzed_program(source)
+        manager = PassManager(level)
+        manager.run(root, symbol_table)
+        vm_time, result = time_call(VirtualMachine(Compiler(symbol_table).compile(root)).run, repeat=1)
+        native_time, native_result = time_call(CompiledProgram(root, symbol_table).run, repeat=1)
+        expected = expected or result
+        if result != expected or native_result != expected:
+            raise AssertionError(f"-O{level} result {result} differs from -O0 result {expected}")
+        print(f"-O{level}: {count_nodes(root):4} nodes   vm {iterations / vm_time:12,.0f} iterations/sec"
+              f"   native {iterations / native_time:12,.0f} iterations/sec")
+        if manager.results:
+            print(manager.report())
+
+
+def ssa_runner(optimize):
+    def make_runner(root, symbol_table):
+        program = SSABuilder(symbol_table).build(root)
+        if optimize:
+            program.optimize()
+        return lambda: run_ssa(program)
+    return make_runner
+
+
+def benchmark_ssa(size_mb=2):
+    check_backend_agrees('SSA', ssa_runner(False))
+    check_backend_agrees('optimized SSA', ssa_runner(True))
+
+    source = generate_source(int(size_mb * 1024 * 1024))
+    print(f"--- SSA construction ({len(source) / (1024 * 1024):.1f} MB generated source) ---")
+    front_time, (root, symbol_table) = time_call(lambda: analyzed_program(source))
+    build_time, program = time_call(lambda: SSABuilder(symbol_table).build(root))
+    instructions = len(program)
+    pass_times = []
+    for name in ('copy_propagation', 'value_numbering', 'dead_code_elimination', 'compact'):
+        elapsed, removed = time_call(getattr(program, name), repeat=1)
+        pass_times.append((name, elapsed, removed))
+    print(f"lex+parse+analyze: {front_time:.3f} s")
+    print(f"        SSA build: {build_time:.3f} s  (+{build_time / front_time:.0%} on top of the front end,"
+          f" {instructions:,} instructions, {len(program.block_starts):,} blocks)")
+    for name, elapsed, removed in pass_times:
+        print(f"{name:>22}: {elapsed:.3f} s  removed {removed:,}")
+    print(f"{'remaining':>22}: {len(program):,} instructions")
+
+
+def benchmark_compile_cache(sources=200):
+    programs = [generate_executable_source(40, seed) for seed in range(sources)]
+    print(f"--- Compile cache ({sources} generated sources) ---")
+    with tempfile.TemporaryDirectory() as directory:
+        cache = CompileCache(directory)
+        cold_time, cold = time_call(lambda: [cache.compile(source) for source in programs], repeat=1)
+        warm_time, warm = time_call(lambda: [cache.compile(source) for source in programs], repeat=1)
+        if cache.stats()['hits'] != sources or not all(result.cached for result in warm):
+            raise AssertionError(f"expected {sources} hits, got {cache.stats()}")
+        for fresh, cached in zip(cold, warm):
+            expected = execution_outcome(lambda: Interpreter(fresh.symbol_table).run(fresh.ast))
+            actual = execution_outcome(lambda: Interpreter(cached.symbol_table).run(cached.ast))
+            if not same_results(expected, actual) or len(fresh.tokens) != len(cached.tokens):
+                raise AssertionError("cached front-end result differs from a fresh one")
+        print(f"cold (lex+parse+analyze+store): {cold_time * 1000:8.1f} ms")
+        print(f"warm (load from cache):         {warm_time * 1000:8.1f} ms")
+        print(f"counters: {cache.stats()}")
+
+        entry_bytes = sum(size for _, size, _ in cache.entries())
+        small = CompileCache(directory, max_bytes=entry_bytes // 2)
+        small.evict()
+        remaining = sum(size for _, size, _ in small.entries())
+        if remaining > entry_bytes // 2:
+            raise AssertionError("eviction left the cache over its size bound")
+        print(f"eviction to {entry_bytes // 2:,} bytes: {small.evictions} entries removed, {remaining:,} bytes left")
+
+    with tempfile.TemporaryDirectory() as directory:
+        # A cache that keeps evicting must still scan its directory rarely.
+        bounded = CompileCache(directory, max_bytes=entry_bytes // 4)
+        bounded_time, _ = time_call(lambda: [bounded.compile(source) for source in programs], repeat=1)
+        stats = bounded.stats()
+        remaining = sum(size for _, size, _ in bounded.entries())
+        if remaining > bounded.max_bytes or stats['scans'] > stats['stores'] // 4:
+            raise AssertionError(f"bounded cache over its limit or scanning too often: {stats}")
+        print(f"bounded to {bounded.max_bytes:,} bytes: {bounded_time * 1000:.1f} ms, {stats['stores']} stores,"
+              f" {stats['scans']} directory scans, {stats['evictions']} evictions")
+
+
+def tree_signature(root, slot_keys=None):
+    """Everything a node carries, in pre-order, for round-trip comparisons.
+    With slot_keys, slots are compared by their key instead of their number."""
+    signature = []
+    for node, depth in iter_preorder(root):
+        token = node.token
+        identifier = getattr(node, 'identifier_token', None)
+        value = getattr(node, 'value', None)
+        slot = getattr(node, 'slot', None)
+        if slot_keys is not None and slot is not None:
+            slot = slot_keys[slot]
+        signature.append((
+            type(node).__name__, depth, slot, repr(value), type(value),
+            token and (token.kind, token.lexeme, token.line, token.column),
+            identifier and (identifier.lexeme, identifier.line, identifier.column),
+        ))
+    return signature
+
+
+def token_fields(token):
+    return token.kind, token.lexeme, token.line, token.column
+
+
+def check_ast_format_round_trip(sources):
+    for source in sources:
+        tokens = Lexer(source).tokenize_buffer()
+        root, symbol_table = analyzed_program(source)
+        # Optimised trees add temporaries and computed literals (negative,
+        # huge or non-finite values).
+        for level in (0, 2):
+            PassManager(level).run(root, symbol_table)
+            program = ast_format.loads(ast_format.dumps(root, symbol_table, tokens))
+            if tree_signature(program.root()) != tree_signature(root):
+                raise AssertionError(f"AST round trip changed the tree for:\n{source}")
+            table = program.symbol_table()
+            if (table.names, table.types, table.visible, table.temporaries) != \
+                    (symbol_table.names, symbol_table.types, symbol_table.visible, symbol_table.temporaries):
+                raise AssertionError(f"symbol table round trip failed for:\n{source}")
+            if list(map(token_fields, program.tokens())) != list(map(token_fields, tokens)):
+                raise AssertionError(f"token round trip failed for:\n{source}")
+            statements = [tree_signature(statement) for statement in program.statements()]
+            if statements != [tree_signature(statement) for statement in root.children[0].children]:
+                raise AssertionError("lazily decoded statements differ")
+
+
+def benchmark_ast_format(size_mb=1):
+    check_ast_format_round_trip(
+        [generate_executable_source(30, seed) for seed in range(50)]
+        + [deep_do_while_source(5000), deep_parenthesised_source(5000), wide_expression_source(5000),
+           "float big = 1" + "0" * 400 + ".0 * 10.0;\nfloat nothing = big * 0.0;\nint huge = 99999999999 * 99999999999 * 99999999999;\n"
+           "int negative = 0 - 7;\nfloat zero = 0.0 * (0.0 - 1.0);\n"])
+
+    source = generate_source(int(size_mb * 1024 * 1024))
+    tokens = Lexer(source).tokenize_buffer()
+    root, symbol_table = analyzed_program(source)
+    print(f"--- AST format ({len(source) / (1024 * 1024):.1f} MB source, {count_nodes(root):,} nodes) ---")
+    binary = ast_format.dumps(root, symbol_table, tokens)
+    pickled = pickle.dumps((tokens, root, symbol_table), pickle.HIGHEST_PROTOCOL)
+    print(f"size: binary {len(binary):,} bytes, pickle {len(pickled):,} bytes")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'program.cast')
+        with open(path, 'wb') as output:
+            output.write(binary)
+        map_time, program = time_call(lambda: ast_format.load(path))
+        first_time, _ = time_call(lambda: next(program.statements()), repeat=1)
+        decode_time, _ = time_call(lambda: ast_format.loads(binary).root())
+        pickle_time, _ = time_call(lambda: pickle.loads(pickled))
+        program.close()
+    print(f"mmap load:            {map_time * 1000:9.3f} ms")
+    print(f"first statement:      {first_time * 1000:9.3f} ms")
+    print(f"decode whole tree:    {decode_time * 1000:9.3f} ms")
+    print(f"pickle.loads:         {pickle_time * 1000:9.3f} ms")
+
+
+# Edits for the incremental check: single characters, line breaks, comments,
+# whole statements, and text that breaks the program for a while.
+INCREMENTAL_SNIPPETS = [
+    ' ', '\n', '\r\n', '7', '0.5', 'x', ';', '}', 'do { ', ' } while (0);', '/*', '*/', '// note\n',
+    '\nint extra = 1;', '\nfloat ratio = 2.5;', 'int', '@',
+]
+
+
+def random_edit(rng, source):
+    offset = rng.randint(0, len(source))
+    removed = rng.randint(0, min(5, len(source) - offset)) if rng.random() < 0.4 else 0
+    if rng.random() < 0.25 and source:
+        start = rng.randint(0, len(source))
+        return offset, removed, source[start:start + rng.randint(1, 40)]
+    return offset, removed, rng.choice(INCREMENTAL_SNIPPETS)
+
+
+def front_end_outcome(compile):
+    try:
+        return compile(), None
+    except (LexicalError, SyntaxError, SemanticError) as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def slot_keys(table):
+    """(name, rank) for each slot, rank counting the earlier slots of the
+    same name: what results depend on, unlike the slot numbers themselves."""
+    ranks = {}
+    keys = []
+    for name in table.names:
+        rank = ranks.get(name, 0)
+        ranks[name] = rank + 1
+        keys.append((name, rank))
+    return keys
+
+
+def same_front_end(actual, expected):
+    """Same tokens, tree and symbol table, with slots compared by slot_keys."""
+    keys, expected_keys = slot_keys(actual.symbol_table), slot_keys(expected.symbol_table)
+
+    def table_signature(table, keys):
+        rows = sorted((keys[slot], table.types[slot], table.depths[slot], keys[previous] if previous >= 0 else None)
+                      for slot, previous in enumerate(table.previous))
+        return rows, {name: keys[slot] for name, slot in table.visible.items()}
+
+    return [token_fields(token) for token in actual.tokens] == [token_fields(token) for token in expected.tokens] \
+        and tree_signature(actual.ast, keys) == tree_signature(expected.ast, expected_keys) \
+        and table_signature(actual.symbol_table, keys) == table_signature(expected.symbol_table, expected_keys)
+
+
+def check_incremental_agrees(programs=100, edits=15):
+    """Applies random edits to documents and compares each result, or error,
+    with compiling the edited source from scratch."""
+    rng = random.Random(0)
+    for seed in range(programs):
+        source = generate_executable_source(rng.randint(1, 20), seed)
+        document = IncrementalDocument(source)
+        undo = None
+        for _ in range(edits):
+            offset, removed, inserted = undo or random_edit(rng, source)
+            edited = source[:offset] + inserted + source[offset + removed:]
+            expected, expected_error = front_end_outcome(lambda: run_front_end(edited))
+            _, error = front_end_outcome(lambda: document.apply_edit(offset, removed, inserted))
+            # Undo a breaking edit next, so most edits start from a valid program.
+            undo = (offset, len(inserted), source[offset:offset + removed]) if error else None
+            source = edited
+            if error != expected_error:
+                raise AssertionError(f"incremental error {error!r}, expected {expected_error!r} for:\n{source}")
+            if error:
+                continue
+            actual = document.front_end()
+            if not same_front_end(actual, expected):
+                raise AssertionError(f"incremental result differs from a fresh compile for:\n{source}")
+
+
+def benchmark_incremental(sizes_kb=(64, 512, 2048), random_edits=20):
+    check_incremental_agrees()
+    print("--- Incremental edits (middle of the file; random offsets with front_end) ---")
+    print(f"{'source':>10} {'full compile':>13} {'digit':>9} {'space':>9} {'newline':>9} {'statement':>10}"
+          f" {'random+front_end p50/max':>26}")
+    for size_kb in sizes_kb:
+        source = generate_source(size_kb * 1024)
+        full_time, _ = time_call(lambda: run_front_end(source), repeat=1)
+        document = IncrementalDocument(source)
+        middle = source.index(';', len(source) // 2) + 1
+        digit = re.compile(r'\b\d').search(source, middle).start()
+        timings = []
+        for offset, removed, inserted in ((digit, 1, '7'), (middle, 0, ' '), (middle, 0, '\n'),
+                                          (middle, 0, '\nint inserted = 3;')):
+            edit_time, _ = time_call(lambda: document.apply_edit(offset, removed, inserted), repeat=1)
+            document.apply_edit(offset, len(inserted), source[offset:offset + removed])
+            timings.append(edit_time)
+        # A declaration inserted after a random statement, then removed, each
+        # followed by front_end() as a compile of the edited file would be.
+        rng = random.Random(size_kb)
+        document.front_end()
+        cycles = []
+        for index in range(random_edits):
+            offset = source.find(';', rng.randrange(len(source)))
+            offset = (source.rindex(';') if offset < 0 else offset) + 1
+            inserted = f"\nint inserted{index} = {index};"
+            for edit in ((offset, 0, inserted), (offset, len(inserted), '')):
+                cycle_time, _ = time_call(lambda: (document.apply_edit(*edit), document.front_end()), repeat=1)
+                cycles.append(cycle_time)
+        if not same_front_end(document.front_end(), run_front_end(source)):
+            raise AssertionError("incremental document drifted from its source")
+        cycles.sort()
+        print(f"{size_kb:>7} KB {full_time * 1000:10.1f} ms " + " ".join(f"{t * 1000:6.2f} ms" for t in timings) +
+              f"  {percentile(cycles, 0.5) * 1000:9.2f} / {cycles[-1] * 1000:.2f} ms")
+
+
+def write_source_tree(directory, files, seed=0):
+    """A few large files and many small ones, some of them broken."""
+    rng = random.Random(seed)
+    for index in range(files):
+        size = 200_000 if index < files // 50 else rng.randint(200, 8000)
+        source = generate_source(size, seed=index)
+        if index % 25 == 0:
+            source += "undeclared_name = 1;\n"
+        subdirectory = os.path.join(directory, f"package_{index % 8}")
+        os.makedirs(subdirectory, exist_ok=True)
+        with open(os.path.join(subdirectory, f"module_{index}.txt"), 'w') as output:
+            output.write(source)
+
+
+def benchmark_driver(files=600, jobs=None):
+    jobs = jobs or os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as directory:
+        write_source_tree(directory, files)
+        paths = collect_sources([directory])
+        print(f"--- Batch driver ({len(paths)} files, {sum(map(os.path.getsize, paths)) / 1e6:.1f} MB) ---")
+        reports = {}
+        for workers in sorted({1, 2, jobs}):
+            with CompileDriver(workers, codegen='bytecode') as driver:
+                driver.run(paths[:workers])
+                reports[workers] = driver.run(paths)
+            summary = reports[workers].summary()
+            print(f"{workers:3} workers: {summary['wall_seconds']:7.2f} s  {summary['files_per_second']:8.1f} files/s  "
+                  f"{summary['failed']} failed")
+        strip = lambda report: [{key: value for key, value in record.items() if key not in ('seconds', 'cpu_seconds')}
+                                for record in report.records]
+        if any(strip(report) != strip(reports[1]) for report in reports.values()):
+            raise AssertionError("parallel driver results differ from the serial run")
+
+
+def benchmark_stats(size_mb=1):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'program.txt')
+        with open(path, 'w') as output:
+            output.write(generate_source(int(size_mb * 1024 * 1024)))
+        print(f"--- Phase statistics overhead ({size_mb} MB source, -O2, bytecode) ---")
+        plain_time, _ = time_call(lambda: compile_file(path, 'bytecode', 2))
+        timed = Instrumentation()
+        timed_time, _ = time_call(lambda: compile_file(path, 'bytecode', 2, timed))
+        with Instrumentation(memory=True) as traced:
+            traced_time, _ = time_call(lambda: compile_file(path, 'bytecode', 2, traced), repeat=1)
+        print(f"disabled:        {plain_time * 1000:9.1f} ms")
+        print(f"timings:         {timed_time * 1000:9.1f} ms  (includes one AST walk for node counts)")
+        print(f"timings+memory:  {traced_time * 1000:9.1f} ms")
+        print(traced.table())
+
+
+HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_history.json')
+SUITE_TIERS = ('1k', '64k', '1m')
+# Each phase with the phase whose result it consumes.
+SUITE_PHASES = {'lex': None, 'parse': 'lex', 'analyze': 'parse', 'bytecode': 'analyze', 'vm': 'bytecode',
+                'pycodegen': 'analyze', 'python': 'pycodegen'}
+# A phase counts as regressed when it is this much slower than in the
+# previous recorded run of the same tier, seed, machine and Python.
+REGRESSION_RATIO = 1.10
+# Tiers larger than this are written to a temporary file and lexed from it.
+STREAMED_TIER_BYTES = TIERS['16m']
+
+
+def check_server_recovers():
+    """Malformed headers and a crashed worker must each get an error response,
+    and the server must warm a new pool and compile again after the crash."""
+
+    def exercise(path, server):
+        with wait_for_server(path, timeout=60) as client:
+            for header in ([1, 2], "compile", None):
+                client.socket.sendall(encode_frame(header))
+                try:
+                    client.response()
+                except ServerError:
+                    continue
+                raise AssertionError(f"header {header!r} was accepted")
+            # Kill the only worker, as a crash inside compile() would.
+            try:
+                server.pool.submit(os._exit, 1).result()
+            except Exception:
+                pass
+            try:
+                client.compile("int x = 1;\n")
+            except ServerError:
+                pass
+            record, _ = client.compile("int y = 2;\n")
+            if record['status'] != 'ok':
+                raise AssertionError(f"server did not recover from a broken pool: {record}")
+            # The replacement pool is warmed without waiting for a request.
+            deadline = time.monotonic() + 60
+            while server.warming is None or not server.warming.done():
+                if time.monotonic() > deadline:
+                    raise AssertionError("replacement worker pool was not warmed")
+                time.sleep(0.01)
+            if server.warming.exception() is not None:
+                raise AssertionError(f"warming the replacement pool failed: {server.warming.exception()!r}")
+            client.shutdown()
+
+    async def run(path):
+        server = CompileServer(path, jobs=1)
+        serving = asyncio.create_task(server.serve())
+        await asyncio.get_running_loop().run_in_executor(None, exercise, path, server)
+        await serving
+
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(run(os.path.join(directory, 'server.sock')))
+
+
+def benchmark_compile_server(requests=200, cold_runs=20):
+    check_server_recovers()
+    directory_of_this = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for index in range(requests):
+            path = os.path.join(directory, f"request_{index}.txt")
+            source = generate_source(random.Random(index).randint(500, 8000), seed=index)
+            if index % 10 == 0:
+                source += "undeclared_name = 1;\n"
+            with open(path, 'w') as output:
+                output.write(source)
+            paths.append(path)
+        print(f"--- Compile server ({requests} requests, bytecode, -O1) ---")
+        cold = []
+        for path in paths[:cold_runs]:
+            start = time.perf_counter()
+            subprocess.run([sys.executable, os.path.join(directory_of_this, 'driver.py'), '-j', '1', '-O', '1',
+                            '--codegen', 'bytecode', path], capture_output=True)
+            cold.append(time.perf_counter() - start)
+        socket_path = os.path.join(directory, 'server.sock')
+        server = subprocess.Popen([sys.executable, os.path.join(directory_of_this, 'compile_server.py'),
+                                   '--socket', socket_path, 'serve', '-j', '1', '--cache-entries', str(requests)])
+        try:
+            with wait_for_server(socket_path) as client:
+                latencies = {'miss': [], 'hit': []}
+                for kind in latencies:
+                    for path in paths:
+                        with open(path, 'rb') as source_file:
+                            source = source_file.read()
+                        start = time.perf_counter()
+                        record, _ = client.compile(source, 'bytecode', 1)
+                        latencies[kind].append(time.perf_counter() - start)
+                        if record['cached'] != (kind == 'hit'):
+                            raise AssertionError(f"unexpected cache state for {path}")
+                        expected = compile_file(path, 'bytecode', 1)
+                        fields = ('status', 'bytes', 'tokens', 'nodes', 'symbols', 'code_size', 'error')
+                        if any(record.get(field) != expected.get(field) for field in fields):
+                            raise AssertionError(f"server record differs from compile_file for {path}:\n"
+                                                 f"{record}\n{expected}")
+                record, artifact = client.compile("int x = 2;\nx = x * 3;\n", artifact='python')
+                if b'def ' not in artifact:
+                    raise AssertionError("python artifact missing from the response")
+                client.shutdown()
+        finally:
+            try:
+                server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+        for label, values in (('cold process', cold), ('server, compiled', latencies['miss']),
+                              ('server, cached', latencies['hit'])):
+            values.sort()
+            print(f"{label:>17}: p50 {percentile(values, 0.5) * 1000:8.2f} ms   "
+                  f"p99 {percentile(values, 0.99) * 1000:8.2f} ms")
+
+
+VECTOR_INPUTS = "int p_count;\nint p_step;\nfloat p_scale;\n"
+VECTOR_PROGRAM = """int years;
+float rate;
+float deposit;
+float balance = 0.0;
+int year = 0;
+do {
+    balance = balance * (1.0 + rate) + deposit;
+    year = year + 1;
+} while (year < years);
+int doubled = balance > deposit * years * 2;
+"""
+
+
+def parameterised_source(seed):
+    """An executable program where some literals read the inputs p_count,
+    p_step and p_scale instead, loop limits included, so lanes take
+    different paths, divide by zero or overflow int64."""
+    rng = random.Random(seed)
+    pick = lambda choices: lambda match: rng.choice(choices) if rng.random() < 0.3 else match.group()
+    lines = []
+    for line in generate_executable_source(12, seed).splitlines():
+        # Counter increments stay literal, so every loop still ends.
+        if not re.match(r'\s*(loop\d+) = \1 \+ 1;', line):
+            line = re.sub(r'(?<![\w.])\d+\.\d+(?![\w.])', pick(('p_scale',)), line)
+            line = re.sub(r'(?<![\w.])\d+(?![\w.])', pick(('p_count', 'p_step')), line)
+        lines.append(line)
+    return VECTOR_INPUTS + "\n".join(lines) + "\n"
+
+
+def lane_inputs(inputs, lane):
+    return {name: values[lane].item() for name, values in inputs.items()}
+
+
+def check_vector_agrees(programs=150, lanes=48):
+    """Differential check of every lane of VectorExecutor against a scalar
+    Interpreter run with that lane's inputs."""
+    rng = np.random.default_rng(0)
+    for seed in range(programs):
+        source = parameterised_source(seed)
+        root, symbol_table = analyzed_program(source)
+        inputs = {'p_count': rng.integers(-3, 9, lanes), 'p_step': rng.integers(-2, 6, lanes),
+                  'p_scale': rng.uniform(-4.0, 4.0, lanes)}
+        result = VectorExecutor(root, symbol_table).run(inputs)
+        for lane in range(lanes):
+            parameters = lane_inputs(inputs, lane)
+            expected = execution_outcome(lambda: Interpreter(symbol_table, parameters).run(root))
+            if not same_results(expected, result.lane(lane)):
+                raise AssertionError(f"vector lane {lane} disagrees with the interpreter on seed {seed} "
+                                     f"with {parameters}:\n{source}\n{expected}\n{result.lane(lane)}")
+
+
+def benchmark_vector(lanes=200000, scalar_lanes=2000):
+    if np is None:
+        print("--- Vector execution: skipped, NumPy is not installed ---")
+        return
+    check_vector_agrees()
+    root, symbol_table = analyzed_program(VECTOR_PROGRAM)
+    rng = np.random.default_rng(1)
+    inputs = {'years': rng.integers(1, 40, lanes), 'rate': rng.uniform(0.0, 0.1, lanes),
+              'deposit': rng.uniform(10.0, 1000.0, lanes)}
+    print(f"--- Vector execution ({lanes} lanes, 1-39 loop iterations each, lanes verified against the interpreter) ---")
+    scalar_time, expected = time_call(lambda: [Interpreter(symbol_table, lane_inputs(inputs, lane)).run(root)
+                                               for lane in range(scalar_lanes)], repeat=1)
+    vector_time, result = time_call(lambda: VectorExecutor(root, symbol_table).run(inputs))
+    for lane in range(scalar_lanes):
+        if not same_results((expected[lane], None), result.lane(lane)):
+            raise AssertionError(f"vector lane {lane} disagrees with the interpreter")
+    scalar_rate = scalar_lanes / scalar_time
+    print(f"interpreter: {scalar_rate:12,.0f} lanes/sec")
+    print(f"vector:      {lanes / vector_time:12,.0f} lanes/sec  ({vector_time:.3f} s, "
+          f"{lanes / vector_time / scalar_rate:.0f}x)")
+
+
+def check_tiered_threshold():
+    """A loop must be compiled as soon as one run passes the threshold."""
+    root, symbol_table = analyzed_program(counting_loop_source(HOT_LOOP_THRESHOLD + 1))
+    engine = TieredInterpreter(symbol_table)
+    engine.run(root)
+    if engine.cache.compilations != 1 or engine.cache.compiled_iterations != 1:
+        raise AssertionError(f"loop past the threshold did not run compiled: {engine.cache.stats()}")
+
+
+def check_tiered_guards():
+    """A compiled loop whose variable changes type must fail its guard, run
+    interpreted and be compiled again for the new type."""
+    root, symbol_table = analyzed_program(counting_loop_source(4 * HOT_LOOP_THRESHOLD))
+    cache = LoopCache()
+    TieredInterpreter(symbol_table, cache=cache).run(root)
+    compilations, guard_failures = cache.compilations, cache.guard_failures
+    if not compilations:
+        raise AssertionError("loop was not compiled")
+    symbol_table.types[symbol_table.names.index('total')] = TYPE_FLOAT
+    expected = execution_outcome(lambda: Interpreter(symbol_table).run(root))
+    actual = execution_outcome(lambda: TieredInterpreter(symbol_table, cache=cache).run(root))
+    if not same_results(expected, actual):
+        raise AssertionError(f"tiered result after a type change differs: {actual} != {expected}")
+    if cache.guard_failures != guard_failures + 1 or cache.compilations != compilations + 1:
+        raise AssertionError(f"loop was not recompiled after its guard failed: {cache.stats()}")
+
+
+def benchmark_tiered(iterations=200000):
+    # A small shared cache and low thresholds make the checks compile, evict
+    # and re-enter compiled loops on almost every program.
+    cache = LoopCache(max_entries=4)
+    tiered = lambda root, table: TieredInterpreter(table, threshold=2, cache=cache).run(root)
+    check_backend_agrees('Tiered interpreter', lambda root, table: lambda: tiered(root, table))
+    check_backend_agrees('-O2 tiered interpreter', optimized_runner(2, lambda root, table: lambda: tiered(root, table)))
+    check_tiered_threshold()
+    check_tiered_guards()
+    print(f"--- Tiered interpreter (hot loops compiled, results verified against the AST interpreter) ---")
+    workload = ProgramGenerator(0, iterations=40).generate(64 * 1024)
+    for label, source in ((f"{iterations:,}-iteration loop", counting_loop_source(iterations)),
+                          (f"{iterations:,}-iteration -O0 loop", optimizable_loop_source(iterations)),
+                          ("64 KB workload", workload)):
+        root, symbol_table = analyzed_program(source)
+        interpreter_time, expected = time_call(lambda: Interpreter(symbol_table).run(root), repeat=1)
+        engine = TieredInterpreter(symbol_table)
+        tiered_time, actual = time_call(lambda: engine.run(root), repeat=1)
+        if not same_results((expected, None), (actual, None)):
+            raise AssertionError(f"tiered result differs from the interpreter on the {label}")
+        stats = engine.cache.stats()
+        print(f"{label:>28}: interpreter {interpreter_time * 1000:9.1f} ms   tiered {tiered_time * 1000:9.1f} ms"
+              f"   {stats['compilations']} compiled, {stats['compiled_iterations']:,} iterations compiled,"
+              f" ~{stats['seconds_saved'] * 1000:.1f} ms saved")
+
+
+def check_workload(programs=40):
+    """Generated programs must analyze and run the same on every backend, and
+    every injected error must raise its own exception."""
+    for seed in range(programs):
+        source = ProgramGenerator(seed).generate(3000)
+        root, symbol_table = analyzed_program(source)
+        expected = execution_outcome(lambda: Interpreter(symbol_table).run(root))
+        if expected[1] is not None:
+            raise AssertionError(f"generated program fails on seed {seed}: {expected[1]}\n{source}")
+        for label, run in (('vm', lambda: VirtualMachine(Compiler(symbol_table).compile(root)).run()),
+                           ('python', lambda: CompiledProgram(root, symbol_table).run())):
+            if not same_results(expected, execution_outcome(run)):
+                raise AssertionError(f"{label} disagrees with the interpreter on workload seed {seed}:\n{source}")
+        for kind in ERROR_KINDS:
+            try:
+                analyzed_program(ProgramGenerator(seed).generate(3000, error=kind))
+            except ERROR_EXCEPTIONS[kind]:
+                continue
+            raise AssertionError(f"injected {kind} error was not reported on seed {seed}")
+
+
+def current_commit():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def analyze_program(root):
+    analyzer = SemanticAnalyzer()
+    analyzer.analyze(root)
+    return analyzer.symbol_table
+
+
+def measure_tier(source, phases, repeat):
+    """Best time of each phase in `phases` on one program, and the program's
+    size in bytes, tokens and nodes. Phases that the requested ones depend
+    on also run, once and untimed."""
+    needed = set()
+    for phase in phases:
+        while phase is not None and phase not in needed:
+            needed.add(phase)
+            phase = SUITE_PHASES[phase]
+    timings = {}
+
+    def measure(phase, function):
+        if phase not in needed:
+            return None
+        elapsed, output = time_call(function, repeat if phase in phases else 1)
+        if phase in phases:
+            timings[phase] = elapsed
+        return output
+
+    sizes = {'bytes': len(source)}
+    if isinstance(source, str):
+        tokens = measure('lex', lambda: Lexer(source).tokenize())
+        count = None if tokens is None else len(tokens)
+    else:
+        # A mapped file is lexed as a stream, one token at a time; parsing
+        # needs the tokens, so they are lexed again into a compact buffer.
+        count = measure('lex', lambda: sum(1 for _ in Lexer(source).iter_tokens()))
+        tokens = Lexer(source).tokenize_buffer() if 'parse' in needed else None
+    if count is not None:
+        sizes['tokens'] = count
+    root = measure('parse', lambda: Parser(tokens).parse())
+    del tokens
+    if root is not None:
+        sizes['nodes'] = tree_shape(root)[0]
+    symbol_table = measure('analyze', lambda: analyze_program(root))
+    bytecode = measure('bytecode', lambda: Compiler(symbol_table).compile(root))
+    measure('vm', lambda: VirtualMachine(bytecode).run())
+    program = measure('pycodegen', lambda: CompiledProgram(root, symbol_table))
+    measure('python', lambda: program.run())
+    return sizes, timings
+
+
+def load_history(path):
+    try:
+        with open(path, 'r') as history_file:
+            return json.load(history_file)
+    except FileNotFoundError:
+        return []
+
+
+def previous_timing(history, current, tier, phase):
+    """The commit and time of `phase` in the last run comparable to
+    `current`: same tier, seed, machine and Python version."""
+    for run in reversed(history):
+        if any(run.get(field) != current[field] for field in ('seed', 'machine', 'python')):
+            continue
+        result = run['tiers'].get(tier)
+        if result is not None and phase in result['phases']:
+            return run['commit'], result['phases'][phase]
+    return None, None
+
+
+def measure_streamed_tier(size, seed, phases):
+    """Writes the tier's program to a temporary file and measures it from a
+    memory map, so the source is never held as one string."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'program.txt')
+        generate_time, _ = time_call(lambda: write_program(path, size, seed), repeat=1)
+        with open(path, 'rb') as program_file:
+            with mmap.mmap(program_file.fileno(), 0, access=mmap.ACCESS_READ) as source:
+                sizes, timings = measure_tier(source, phases, 1)
+    return generate_time, sizes, timings
+
+
+def benchmark_suite(tiers=SUITE_TIERS, phases=tuple(SUITE_PHASES), history=HISTORY_PATH, seed=0):
+    """Times each phase on a generated program per size tier and appends the
+    run to a JSON history, comparing every phase with the last recorded run
+    of the same tier and seed on the same machine and Python version.
+
+    Tiers above SUITE_TIERS go up to '1g'. Those past '16m' are streamed to
+    a temporary file and lexed from it one token at a time, so '--phases lex'
+    runs in constant memory at any size; later phases still hold the token
+    buffer and AST in memory, so restrict large tiers to the phases that fit."""
+    check_workload()
+    runs = load_history(history) if history else []
+    run = {'commit': current_commit(), 'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+           'python': platform.python_version(), 'machine': platform.machine(), 'seed': seed, 'tiers': {}}
+    print(f"--- Workload suite (commit {run['commit']}, seed {seed}, generated programs verified) ---")
+    print(f"{'tier':>5} {'phase':>10} {'seconds':>10} {'rate':>22} {'vs last':>16}")
+    regressions = []
+    for tier in tiers:
+        size = TIERS[tier]
+        if size > STREAMED_TIER_BYTES:
+            generate_time, sizes, timings = measure_streamed_tier(size, seed, phases)
+        else:
+            generate_time, source = time_call(lambda: ProgramGenerator(seed).generate(size), repeat=1)
+            sizes, timings = measure_tier(source, phases, 3 if size <= TIERS['1m'] else 1)
+            del source
+        run['tiers'][tier] = dict(sizes, generate_seconds=generate_time, phases=timings)
+        for phase, elapsed in timings.items():
+            unit = 'tokens' if phase == 'lex' else 'nodes'
+            rate = f"{sizes[unit] / elapsed:,.0f} {unit}/s" if elapsed else '-'
+            commit, last = previous_timing(runs, run, tier, phase)
+            change = '-'
+            if last:
+                change = f"{(elapsed / last - 1) * 100:+.1f}% {commit or ''}"
+                if elapsed > last * REGRESSION_RATIO:
+                    regressions.append(f"{tier} {phase}")
+            print(f"{tier:>5} {phase:>10} {elapsed:10.4f} {rate:>22} {change:>16}")
+    if history:
+        runs.append(run)
+        with open(history, 'w') as history_file:
+            json.dump(runs, history_file, indent=1)
+    if regressions:
+        print(f"slower than the last run by more than {(REGRESSION_RATIO - 1) * 100:.0f}%: {', '.join(regressions)}")
+    return run
+
+
+BENCHMARKS = {
+    'lexer': benchmark_lexer,
+    'parallel_lexer': benchmark_parallel_lexer,
+    'parser': benchmark_parser,
+    'ast_memory': benchmark_ast_memory,
+    'semantic_tracing': benchmark_semantic_tracing,
+    'vm': benchmark_vm,
+    'pycodegen': benchmark_pycodegen,
+    'optimizer': benchmark_optimizer,
+    'ssa': benchmark_ssa,
+    'compile_cache': benchmark_compile_cache,
+    'ast_format': benchmark_ast_format,
+    'incremental': benchmark_incremental,
+    'driver': benchmark_driver,
+    'stats': benchmark_stats,
+    'compile_server': benchmark_compile_server,
+    'vector': benchmark_vector,
+    'tiered': benchmark_tiered,
+    'suite': benchmark_suite,
+}
+
+
+def main(argv=None):
+    arguments = argparse.ArgumentParser(description="Run compiler benchmarks.")
+    arguments.add_argument('names', nargs='*', help=f"benchmarks to run (default: all): {', '.join(BENCHMARKS)}")
+    arguments.add_argument('--tiers', default=','.join(SUITE_TIERS),
+                           help=f"suite size tiers, comma separated: {', '.join(TIERS)}")
+    arguments.add_argument('--phases', default=','.join(SUITE_PHASES),
+                           help=f"suite phases, comma separated: {', '.join(SUITE_PHASES)}")
+    arguments.add_argument('--history', default=HISTORY_PATH, help="suite JSON history file ('' to keep none)")
+    arguments.add_argument('--seed', type=int, default=0, help="suite workload seed")
+    options = arguments.parse_args(argv)
+    tiers = options.tiers.split(',')
+    phases = options.phases.split(',')
+    for name in options.names:
+        if name not in BENCHMARKS:
+            arguments.error(f"unknown benchmark {name!r}")
+    for tier in tiers:
+        if tier not in TIERS:
+            arguments.error(f"unknown tier {tier!r}")
+    for phase in phases:
+        if phase not in SUITE_PHASES:
+            arguments.error(f"unknown phase {phase!r}")
+    for name in options.names or list(BENCHMARKS):
+        if name == 'suite':
+            benchmark_suite(tiers, phases, options.history, options.seed)
+        else:
+            BENCHMARKS[name]()
+
+
+if __name__ == '__main__':
+    main()
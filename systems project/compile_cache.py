@@ -0,0 +1,192 @@
+# compile_cache.py
+
+import hashlib
+import os
+import struct
+import tempfile
+
+import ast_format
+from lexical import Lexer
+from parser import Parser
+from semantic_analzer import SemanticAnalyzer
+
+# Modules whose code decides what the front end produces. Changing any of them
+# changes COMPILER_VERSION, so stale entries are never loaded.
+FRONT_END_MODULES = (
+    'lexical.py', 'parser.py', 'ast_nodes.py', 'symbol_table.py',
+    'semantic_analzer.py', 'tree_walker.py', 'ast_format.py', 'compile_cache.py',
+)
+DEFAULT_DIRECTORY = '.compile_cache'
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+ENTRY_SUFFIX = '.cast'
+# Eviction deletes down to this fraction of max_bytes, so that the directory
+# is scanned once per many stores rather than on every store past the limit.
+LOW_WATER_FRACTION = 0.75
+
+
+def compiler_version():
+    digest = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in FRONT_END_MODULES:
+        with open(os.path.join(directory, name), 'rb') as module_file:
+            digest.update(name.encode('ascii'))
+            digest.update(module_file.read())
+    return digest.hexdigest()
+
+
+COMPILER_VERSION = compiler_version()
+
+
+class FrontEndResult:
+    """Everything the front end produces for one source: the token buffer,
+    the analyzed AST and its symbol table. `cached` tells whether it came
+    from the cache."""
+
+    __slots__ = ('tokens', 'ast', 'symbol_table', 'cached')
+
+    def __init__(self, tokens, ast, symbol_table, cached=False):
+        self.tokens = tokens
+        self.ast = ast
+        self.symbol_table = symbol_table
+        self.cached = cached
+
+
+def run_front_end(source):
+    tokens = Lexer(source).tokenize_buffer()
+    ast = Parser(tokens).parse()
+    analyzer = SemanticAnalyzer()
+    analyzer.analyze(ast)
+    return FrontEndResult(tokens, ast, analyzer.symbol_table)
+
+
+class CompileCache:
+    """Content-addressed cache of front-end results on disk.
+
+    An entry's key is the SHA-256 of the compiler version and the source
+    bytes, and its file is <directory>/<key>.cast, in the ast_format binary
+    format. Entries are written to a
+    temporary file in the same directory and renamed into place, so
+    concurrent builds sharing the directory only ever see complete entries.
+    A hit refreshes the entry's mtime; when the directory grows past
+    max_bytes the least recently used entries are deleted until it is back
+    under the low-water mark.
+
+    The directory is scanned once, then a running total of its size is kept
+    from this cache's own stores and only rescanned when it passes
+    max_bytes. Entries written by other processes are only seen at that
+    rescan, so a shared directory can briefly exceed the limit."""
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_bytes=DEFAULT_MAX_BYTES, version=COMPILER_VERSION):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.version = version.encode('ascii')
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.scans = 0
+        self.total_bytes = None
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, source):
+        if isinstance(source, str):
+            source = source.encode('utf-8')
+        return hashlib.sha256(self.version + b'\0' + source).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+    def load(self, key):
+        path = self.path(key)
+        try:
+            # Read rather than mapped, so the entry can be evicted or replaced
+            # while its tokens are still in use.
+            with open(path, 'rb') as entry_file:
+                program = ast_format.loads(entry_file.read())
+            result = FrontEndResult(program.tokens(), program.root(), program.symbol_table(), cached=True)
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ast_format.FormatError, struct.error, IndexError, KeyError, ValueError, TypeError):
+            # Truncated or unreadable: drop it and recompile.
+            self.discard(path)
+            return None
+        return result
+
+    def store(self, key, result):
+        data = ast_format.dumps(result.ast, result.symbol_table, result.tokens)
+        if self.total_bytes is None:
+            self.total_bytes = sum(size for _, size, _ in self.scan())
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as entry_file:
+                entry_file.write(data)
+            os.replace(temporary_path, self.path(key))
+        except BaseException:
+            self.discard(temporary_path)
+            raise
+        self.stores += 1
+        # Replacing an existing entry counts its bytes twice; that only makes
+        # the next rescan come sooner.
+        self.total_bytes += len(data)
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def compile(self, source):
+        """Returns the front-end result for `source`, from the cache when
+        possible. Sources with errors raise as usual and are not cached."""
+        key = self.key(source)
+        result = self.load(key)
+        if result is not None:
+            self.hits += 1
+            return result
+        self.misses += 1
+        result = run_front_end(source)
+        self.store(key, result)
+        return result
+
+    def entries(self):
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.name.endswith(ENTRY_SUFFIX):
+                    try:
+                        status = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((status.st_mtime, status.st_size, entry.path))
+        return entries
+
+    def scan(self):
+        self.scans += 1
+        return self.entries()
+
+    def evict(self):
+        entries = self.scan()
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            low_water = self.max_bytes * LOW_WATER_FRACTION
+            entries.sort()
+            for _, size, path in entries:
+                if total <= low_water:
+                    break
+                if self.discard(path):
+                    self.evictions += 1
+                total -= size
+        self.total_bytes = total
+
+    def discard(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def clear(self):
+        for _, _, path in self.entries():
+            self.discard(path)
+        self.total_bytes = 0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'stores': self.stores, 'evictions': self.evictions,
+                'scans': self.scans}
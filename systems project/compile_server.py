@@ -0,0 +1,407 @@
+# compile_server.py
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import socket
+import struct
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import ast_format
+from driver import CODEGEN_CHOICES, compile_source, failure
+
+# A frame is a header of two big-endian lengths, then that many bytes of
+# compact JSON and then the payload: the source in a request, the artifact in
+# a response.
+FRAME_HEADER = struct.Struct('>II')
+MAX_HEADER_BYTES = 1 << 20
+MAX_PAYLOAD_BYTES = 1 << 30
+ARTIFACTS = ('ast', 'bytecode', 'python')
+CACHE_ENTRIES = 256
+
+
+def default_socket_path():
+    return os.path.join(tempfile.gettempdir(), f"compile-server-{os.getuid()}.sock")
+
+
+def encode_frame(header, payload=b''):
+    data = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    return FRAME_HEADER.pack(len(data), len(payload)) + data + payload
+
+
+def check_lengths(header_length, payload_length):
+    if header_length > MAX_HEADER_BYTES or payload_length > MAX_PAYLOAD_BYTES:
+        raise ValueError(f"Frame of {header_length} + {payload_length} bytes is too large")
+
+
+async def read_frame(reader):
+    """Returns (header, payload), or None when the peer closed the stream."""
+    try:
+        header_length, payload_length = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            raise
+        return None
+    check_lengths(header_length, payload_length)
+    header = json.loads(await reader.readexactly(header_length))
+    payload = await reader.readexactly(payload_length)
+    return header, payload
+
+
+def compile_request(source, codegen, level, artifact):
+    """Compiles one request's source in a worker. Returns the record, in the
+    same form as a driver record, and the artifact bytes."""
+    record = {'bytes': len(source), 'status': 'ok'}
+    payload = b''
+    start = time.perf_counter()
+    try:
+        if artifact in ('bytecode', 'python'):
+            codegen = artifact
+        ast, symbol_table, generated = compile_source(source, record, codegen, level)
+        if artifact == 'ast':
+            payload = ast_format.dumps(ast, symbol_table)
+        elif artifact == 'bytecode':
+            payload = generated.disassemble().encode('utf-8')
+        elif artifact == 'python':
+            payload = generated.source.encode('utf-8')
+    except Exception as e:
+        failure(record, e)
+    record['seconds'] = time.perf_counter() - start
+    record['artifact'] = artifact if payload else None
+    return record, payload
+
+
+def warm_up():
+    # Run in every worker once, so the first real request does not pay for
+    # the lazy parts of start-up.
+    compile_request("int warm = 1;\n", 'bytecode', 2, 'python')
+    return os.getpid()
+
+
+class CompileServer:
+    """Serves compile requests on a Unix socket.
+
+    The server process stays up between builds, so imports, compiled token
+    regexes and warm worker processes are paid for once. Requests are
+    compiled on a pool of `jobs` workers (in this process when jobs is 0),
+    and the last `cache_entries` responses are kept, keyed by the source and
+    options, so an unchanged file is answered without compiling.
+
+    A request header is {"id", "op"} where op is "compile" (with "codegen",
+    "level" and "artifact", the source being the payload), "stats", "ping" or
+    "shutdown". Every response echoes the id; compile responses carry the
+    driver's record (status, counts and error) and the artifact as payload.
+    Requests on one connection may be pipelined; their responses come back in
+    completion order. Every request gets a response: a malformed header gets
+    "protocol_error" and a failure inside the server, such as a crashed
+    worker, gets "internal_error". A broken worker pool is replaced and the
+    new one warmed in the background, so later requests compile again."""
+
+    def __init__(self, path=None, jobs=None, cache_entries=CACHE_ENTRIES):
+        self.path = path or default_socket_path()
+        self.jobs = (os.cpu_count() or 1) if jobs is None else jobs
+        self.cache_entries = cache_entries
+        self.cache = OrderedDict()
+        self.pool = None
+        # Warm-up of a pool that replaced a broken one.
+        self.warming = None
+        self.server = None
+        self.stopping = None
+        self.connections = {}
+        self.started = time.time()
+        self.requests = 0
+        self.hits = 0
+        self.errors = 0
+        self.latencies = []
+
+    async def start(self):
+        if self.jobs:
+            self.pool = ProcessPoolExecutor(self.jobs)
+            await self.warm_pool()
+        else:
+            warm_up()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.stopping = asyncio.Event()
+        self.server = await asyncio.start_unix_server(self.handle, self.path)
+
+    async def warm_pool(self):
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.pool, warm_up) for _ in range(self.jobs)))
+
+    def replace_pool(self, broken):
+        # Requests in flight on the broken pool all fail; only the first
+        # replaces it.
+        if self.pool is broken:
+            broken.shutdown(wait=False, cancel_futures=True)
+            self.pool = ProcessPoolExecutor(self.jobs)
+            # Started now, so the next request does not pay the cold start.
+            self.warming = asyncio.create_task(self.warm_pool())
+
+    async def serve(self):
+        await self.start()
+        try:
+            await self.stopping.wait()
+        finally:
+            await self.close()
+
+    async def close(self):
+        self.server.close()
+        # Closing a connection ends its reader, so its handler finishes the
+        # requests in flight and returns.
+        for writer in self.connections.values():
+            writer.close()
+        await asyncio.gather(*self.connections, return_exceptions=True)
+        await self.server.wait_closed()
+        if self.warming is not None:
+            await asyncio.gather(self.warming, return_exceptions=True)
+        if self.pool is not None:
+            self.pool.shutdown()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    async def handle(self, reader, writer):
+        tasks = set()
+        self.connections[asyncio.current_task()] = writer
+        try:
+            while True:
+                try:
+                    frame = await read_frame(reader)
+                except (asyncio.IncompleteReadError, ValueError) as e:
+                    writer.write(encode_frame({'id': None, 'status': 'protocol_error', 'error': str(e)}))
+                    break
+                if frame is None:
+                    break
+                task = asyncio.create_task(self.respond(writer, *frame))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            del self.connections[asyncio.current_task()]
+            writer.close()
+
+    async def respond(self, writer, header, payload):
+        start = time.perf_counter()
+        if not isinstance(header, dict):
+            self.errors += 1
+            response = {'id': None, 'status': 'protocol_error', 'error': "Request header must be a JSON object"}
+            writer.write(encode_frame(response))
+            return
+        op = header.get('op')
+        response = {'id': header.get('id'), 'status': 'ok'}
+        artifact = b''
+        try:
+            if op == 'compile':
+                response, artifact = await self.compile(header, payload)
+            elif op == 'stats':
+                response['stats'] = self.stats()
+            elif op == 'shutdown':
+                self.stopping.set()
+            elif op != 'ping':
+                response = {'id': header.get('id'), 'status': 'protocol_error', 'error': f"Unknown op {op!r}"}
+        except Exception as e:
+            self.errors += 1
+            response = {'id': header.get('id'), 'status': 'internal_error', 'error': f"{type(e).__name__}: {e}"}
+            artifact = b''
+        writer.write(encode_frame(response, artifact))
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        if op == 'compile':
+            self.latencies.append(time.perf_counter() - start)
+
+    async def compile(self, header, payload):
+        self.requests += 1
+        codegen = header.get('codegen', 'none')
+        level = header.get('level', 0)
+        artifact = header.get('artifact')
+        if codegen not in CODEGEN_CHOICES or level not in (0, 1, 2) or artifact not in ARTIFACTS + (None,):
+            self.errors += 1
+            return {'id': header.get('id'), 'status': 'protocol_error', 'error': "Bad compile options"}, b''
+        key = hashlib.sha256(f"{codegen}:{level}:{artifact}:".encode('ascii') + payload).digest()
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            record, artifact_bytes = cached
+            return dict(record, id=header.get('id'), cached=True), artifact_bytes
+        try:
+            source = payload.decode('utf-8')
+        except UnicodeDecodeError as e:
+            self.errors += 1
+            record = {'bytes': len(payload), 'status': 'ok'}
+            failure(record, e)
+            return dict(record, id=header.get('id'), cached=False), b''
+        if self.pool is None:
+            record, artifact_bytes = compile_request(source, codegen, level, artifact)
+        else:
+            loop = asyncio.get_running_loop()
+            pool = self.pool
+            try:
+                record, artifact_bytes = await loop.run_in_executor(
+                    pool, compile_request, source, codegen, level, artifact)
+            except BrokenProcessPool:
+                self.replace_pool(pool)
+                raise
+        if record['status'] != 'ok':
+            self.errors += 1
+        self.cache[key] = (record, artifact_bytes)
+        if len(self.cache) > self.cache_entries:
+            self.cache.popitem(last=False)
+        return dict(record, id=header.get('id'), cached=False), artifact_bytes
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        return {
+            'uptime_seconds': time.time() - self.started,
+            'workers': self.jobs,
+            'requests': self.requests,
+            'cache_hits': self.hits,
+            'cache_entries': len(self.cache),
+            'errors': self.errors,
+            'p50_seconds': percentile(latencies, 0.50),
+            'p99_seconds': percentile(latencies, 0.99),
+        }
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class ServerError(Exception):
+    pass
+
+
+class CompileClient:
+    """Blocking client for CompileServer, one request at a time."""
+
+    def __init__(self, path=None, timeout=None):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.settimeout(timeout)
+        self.socket.connect(path or default_socket_path())
+        self.next_id = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.socket.close()
+
+    def receive(self, size):
+        data = bytearray()
+        while len(data) < size:
+            chunk = self.socket.recv(size - len(data))
+            if not chunk:
+                raise ServerError("Server closed the connection")
+            data += chunk
+        return bytes(data)
+
+    def request(self, header, payload=b''):
+        self.next_id += 1
+        header = dict(header, id=self.next_id)
+        self.socket.sendall(encode_frame(header, payload))
+        return self.response()
+
+    def response(self):
+        """Reads one response. Protocol and internal errors raise ServerError."""
+        header_length, payload_length = FRAME_HEADER.unpack(self.receive(FRAME_HEADER.size))
+        check_lengths(header_length, payload_length)
+        response = json.loads(self.receive(header_length))
+        artifact = self.receive(payload_length)
+        if response['status'] in ('protocol_error', 'internal_error'):
+            raise ServerError(response['error'])
+        return response, artifact
+
+    def compile(self, source, codegen='none', level=0, artifact=None):
+        """Returns the record for `source` and the artifact bytes (empty when
+        none was asked for or the source has errors)."""
+        if isinstance(source, str):
+            source = source.encode('utf-8')
+        return self.request({'op': 'compile', 'codegen': codegen, 'level': level, 'artifact': artifact}, source)
+
+    def ping(self):
+        return self.request({'op': 'ping'})[0]
+
+    def stats(self):
+        return self.request({'op': 'stats'})[0]['stats']
+
+    def shutdown(self):
+        return self.request({'op': 'shutdown'})[0]
+
+
+def wait_for_server(path=None, timeout=30.0):
+    """Connects once the server at `path` answers a ping."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            client = CompileClient(path)
+            client.ping()
+            return client
+        except (OSError, ServerError):
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def main(argv=None):
+    arguments = argparse.ArgumentParser(description="Long-lived compile server and its client.")
+    arguments.add_argument('--socket', default=default_socket_path(), help="Unix socket path")
+    commands = arguments.add_subparsers(dest='command', required=True)
+    serve = commands.add_parser('serve', help="run the server until it is shut down")
+    serve.add_argument('-j', '--jobs', type=int, default=None, help="worker processes (0: compile in the server)")
+    serve.add_argument('--cache-entries', type=int, default=CACHE_ENTRIES, help="responses kept in memory")
+    compile_command = commands.add_parser('compile', help="compile files on the server")
+    compile_command.add_argument('files', nargs='+')
+    compile_command.add_argument('-O', dest='level', type=int, choices=(0, 1, 2), default=0)
+    compile_command.add_argument('--codegen', choices=CODEGEN_CHOICES, default='none')
+    compile_command.add_argument('--artifact', choices=ARTIFACTS, help="write this artifact next to each file")
+    commands.add_parser('stats', help="print the server's counters")
+    commands.add_parser('stop', help="shut the server down")
+    options = arguments.parse_args(argv)
+
+    if options.command == 'serve':
+        server = CompileServer(options.socket, options.jobs, options.cache_entries)
+        try:
+            asyncio.run(server.serve())
+        except KeyboardInterrupt:
+            pass
+        return 0
+    with CompileClient(options.socket) as client:
+        if options.command == 'stats':
+            print(json.dumps(client.stats(), indent=2))
+            return 0
+        if options.command == 'stop':
+            client.shutdown()
+            return 0
+        failed = 0
+        for path in options.files:
+            with open(path, 'rb') as source_file:
+                record, artifact = client.compile(source_file.read(), options.codegen, options.level, options.artifact)
+            if record['status'] != 'ok':
+                failed += 1
+                print(f"{path}: {record['error']['type']}: {record['error']['message']}", file=sys.stderr)
+            elif artifact:
+                with open(f"{path}.{options.artifact}", 'wb') as output:
+                    output.write(artifact)
+        return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
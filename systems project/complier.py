@@ -0,0 +1,289 @@
+# complier.py
+
+from array import array
+
+from lexical import TokenKind
+from ast_nodes import IdentifierNode, IntLiteralNode, FloatLiteralNode
+from symbol_table import TYPE_INT, TYPE_FLOAT
+from tree_walker import TreeWalker
+from interpreter import ExecutionError, int_div, division_error, initial_values, results_by_name
+
+# Opcodes. Instructions are an opcode followed by its operands, all stored as
+# machine words in one array. Operands are variable slots, constant-pool
+# indexes or jump targets. Only division and int-to-float stores depend on the
+# static types. Arithmetic and comparisons run the same Python operator for
+# ints and floats, so _INT/_FLOAT variants of them would only lengthen the
+# dispatch chain.
+LOAD_CONST = 0          # k
+LOAD_VAR = 1            # slot
+STORE_VAR = 2           # slot
+TO_FLOAT = 3
+ADD = 4
+SUB = 5
+MUL = 6
+DIV_INT = 7             # truncating division of two ints
+DIV_FLOAT = 8
+LESS_THAN = 9
+GREATER_THAN = 10
+LESS_EQUAL = 11
+GREATER_EQUAL = 12
+EQUAL_EQUAL = 13
+NOT_EQUAL = 14
+JUMP_IF_TRUE = 15       # target
+HALT = 16
+# Fused forms of "LOAD_VAR slot; LOAD_CONST k; op", the shape of most loop
+# counters and conditions.
+ADD_VAR_CONST = 17      # slot, k
+SUB_VAR_CONST = 18      # slot, k
+MUL_VAR_CONST = 19      # slot, k
+LESS_THAN_VAR_CONST = 20  # slot, k
+GREATER_THAN_VAR_CONST = 21  # slot, k
+# Fused "LOAD_VAR a; LOAD_VAR b; op".
+ADD_VAR_VAR = 22        # slot, slot
+SUB_VAR_VAR = 23        # slot, slot
+MUL_VAR_VAR = 24        # slot, slot
+
+OPCODE_NAMES = {
+    value: name for name, value in globals().items()
+    if name.isupper() and isinstance(value, int) and name not in ('TYPE_INT', 'TYPE_FLOAT')
+}
+OPERAND_COUNTS = {opcode: 0 for opcode in OPCODE_NAMES}
+OPERAND_COUNTS.update({LOAD_CONST: 1, LOAD_VAR: 1, STORE_VAR: 1, JUMP_IF_TRUE: 1})
+OPERAND_COUNTS.update(dict.fromkeys(
+    (ADD_VAR_CONST, SUB_VAR_CONST, MUL_VAR_CONST, LESS_THAN_VAR_CONST, GREATER_THAN_VAR_CONST,
+     ADD_VAR_VAR, SUB_VAR_VAR, MUL_VAR_VAR), 2))
+
+ARITHMETIC_OPCODES = {
+    TokenKind.PLUS: ADD, TokenKind.MINUS: SUB, TokenKind.MULTIPLY: MUL,
+}
+COMPARISON_OPCODES = {
+    TokenKind.LESS_THAN: LESS_THAN, TokenKind.GREATER_THAN: GREATER_THAN,
+    TokenKind.LESS_EQUAL: LESS_EQUAL, TokenKind.GREATER_EQUAL: GREATER_EQUAL,
+    TokenKind.EQUAL_EQUAL: EQUAL_EQUAL, TokenKind.NOT_EQUAL: NOT_EQUAL,
+}
+VAR_CONST_OPCODES = {
+    ADD: ADD_VAR_CONST, SUB: SUB_VAR_CONST, MUL: MUL_VAR_CONST,
+    LESS_THAN: LESS_THAN_VAR_CONST, GREATER_THAN: GREATER_THAN_VAR_CONST,
+}
+VAR_VAR_OPCODES = {ADD: ADD_VAR_VAR, SUB: SUB_VAR_VAR, MUL: MUL_VAR_VAR}
+
+
+class Bytecode:
+    def __init__(self, code, constants, symbol_table, locations):
+        self.code = code
+        self.constants = constants
+        self.symbol_table = symbol_table
+        # Source token of every instruction that can fail, by offset.
+        self.locations = locations
+
+    def disassemble(self):
+        lines = []
+        code = self.code
+        pc = 0
+        while pc < len(code):
+            opcode = code[pc]
+            operands = list(code[pc + 1:pc + 1 + OPERAND_COUNTS[opcode]])
+            lines.append(f"{pc:6} {OPCODE_NAMES[opcode]:<24} {' '.join(map(str, operands))}".rstrip())
+            pc += 1 + len(operands)
+        return "\n".join(lines)
+
+
+class Compiler(TreeWalker):
+    """Lowers an analyzed AST to stack bytecode. Expression types are known
+    statically from the symbol table, so division and int-to-float stores are
+    selected at compile time instead of being checked at run time."""
+
+    def __init__(self, symbol_table):
+        self.symbol_table = symbol_table
+        self.code = array('l')
+        self.constants = []
+        self.constant_indexes = {}
+        self.locations = {}
+        self.loop_starts = []
+
+    def compile(self, program):
+        self.walk(program)
+        self.emit(HALT)
+        return Bytecode(self.code, self.constants, self.symbol_table, self.locations)
+
+    def emit(self, opcode, *operands):
+        self.code.append(opcode)
+        self.code.extend(operands)
+
+    def constant(self, value):
+        key = (type(value), repr(value))
+        index = self.constant_indexes.get(key)
+        if index is None:
+            index = self.constant_indexes[key] = len(self.constants)
+            self.constants.append(value)
+        return index
+
+    def store(self, slot, value_type):
+        if self.symbol_table.types[slot] == TYPE_FLOAT and value_type == TYPE_INT:
+            self.emit(TO_FLOAT)
+        self.emit(STORE_VAR, slot)
+
+    def leave_DeclarationNode(self, node, child_types):
+        if node.assignment_expr is None:
+            is_float = self.symbol_table.types[node.slot] == TYPE_FLOAT
+            self.emit(LOAD_CONST, self.constant(0.0 if is_float else 0))
+            self.emit(STORE_VAR, node.slot)
+        else:
+            self.store(node.slot, child_types[0])
+
+    def leave_AssignmentNode(self, node, child_types):
+        self.store(node.slot, child_types[0])
+
+    def enter_DoWhileNode(self, node):
+        self.loop_starts.append(len(self.code))
+
+    def leave_DoWhileNode(self, node, child_types):
+        self.emit(JUMP_IF_TRUE, self.loop_starts.pop())
+
+    def leave_BinaryOpNode(self, node, child_types):
+        left_type, right_type = child_types
+        result_type = TYPE_INT if left_type == TYPE_INT and right_type == TYPE_INT else TYPE_FLOAT
+        kind = node.operator_token.kind
+        if kind == TokenKind.DIVIDE:
+            self.locations[len(self.code)] = node.operator_token
+            self.emit(DIV_INT if result_type == TYPE_INT else DIV_FLOAT)
+            return result_type
+        if kind in COMPARISON_OPCODES:
+            opcode = COMPARISON_OPCODES[kind]
+            result_type = TYPE_INT
+        else:
+            opcode = ARITHMETIC_OPCODES[kind]
+
+        # Peephole: both operands were just emitted as two 2-word loads.
+        left, right = node.left, node.right
+        if type(left) is IdentifierNode:
+            right_type_node = type(right)
+            if opcode in VAR_CONST_OPCODES and (right_type_node is IntLiteralNode or right_type_node is FloatLiteralNode):
+                del self.code[-4:]
+                self.emit(VAR_CONST_OPCODES[opcode], left.slot, self.constant(right.value))
+                return result_type
+            if opcode in VAR_VAR_OPCODES and right_type_node is IdentifierNode:
+                del self.code[-4:]
+                self.emit(VAR_VAR_OPCODES[opcode], left.slot, right.slot)
+                return result_type
+        self.emit(opcode)
+        return result_type
+
+    def leave_IntLiteralNode(self, node, child_types):
+        self.emit(LOAD_CONST, self.constant(node.value))
+        return TYPE_INT
+
+    def leave_FloatLiteralNode(self, node, child_types):
+        self.emit(LOAD_CONST, self.constant(node.value))
+        return TYPE_FLOAT
+
+    def leave_IdentifierNode(self, node, child_types):
+        self.emit(LOAD_VAR, node.slot)
+        return self.symbol_table.types[node.slot]
+
+
+class VirtualMachine:
+    def __init__(self, bytecode):
+        self.bytecode = bytecode
+        self.values = initial_values(bytecode.symbol_table)
+
+    def run(self):
+        bytecode = self.bytecode
+        # Lists index faster than arrays (no int boxing per fetch).
+        code = bytecode.code.tolist()
+        constants = bytecode.constants
+        values = self.values
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        pc = 0
+        while True:
+            opcode = code[pc]
+            if opcode == LOAD_VAR:
+                push(values[code[pc + 1]])
+                pc += 2
+            elif opcode == STORE_VAR:
+                values[code[pc + 1]] = pop()
+                pc += 2
+            elif opcode == ADD_VAR_CONST:
+                push(values[code[pc + 1]] + constants[code[pc + 2]])
+                pc += 3
+            elif opcode == LOAD_CONST:
+                push(constants[code[pc + 1]])
+                pc += 2
+            elif opcode == LESS_THAN_VAR_CONST:
+                push(1 if values[code[pc + 1]] < constants[code[pc + 2]] else 0)
+                pc += 3
+            elif opcode == JUMP_IF_TRUE:
+                if pop():
+                    pc = code[pc + 1]
+                else:
+                    pc += 2
+            elif opcode == ADD_VAR_VAR:
+                push(values[code[pc + 1]] + values[code[pc + 2]])
+                pc += 3
+            elif opcode == MUL_VAR_CONST:
+                push(values[code[pc + 1]] * constants[code[pc + 2]])
+                pc += 3
+            elif opcode == SUB_VAR_CONST:
+                push(values[code[pc + 1]] - constants[code[pc + 2]])
+                pc += 3
+            elif opcode == ADD:
+                right = pop()
+                stack[-1] += right
+                pc += 1
+            elif opcode == MUL:
+                right = pop()
+                stack[-1] *= right
+                pc += 1
+            elif opcode == SUB:
+                right = pop()
+                stack[-1] -= right
+                pc += 1
+            elif opcode == TO_FLOAT:
+                stack[-1] = float(stack[-1])
+                pc += 1
+            elif opcode == MUL_VAR_VAR:
+                push(values[code[pc + 1]] * values[code[pc + 2]])
+                pc += 3
+            elif opcode == SUB_VAR_VAR:
+                push(values[code[pc + 1]] - values[code[pc + 2]])
+                pc += 3
+            elif opcode == GREATER_THAN_VAR_CONST:
+                push(1 if values[code[pc + 1]] > constants[code[pc + 2]] else 0)
+                pc += 3
+            elif opcode == DIV_INT or opcode == DIV_FLOAT:
+                right = pop()
+                if right == 0:
+                    raise division_error(bytecode.locations[pc])
+                left = stack[-1]
+                stack[-1] = int_div(left, right) if opcode == DIV_INT else left / right
+                pc += 1
+            elif opcode == LESS_THAN:
+                right = pop()
+                stack[-1] = 1 if stack[-1] < right else 0
+                pc += 1
+            elif opcode == GREATER_THAN:
+                right = pop()
+                stack[-1] = 1 if stack[-1] > right else 0
+                pc += 1
+            elif opcode == LESS_EQUAL:
+                right = pop()
+                stack[-1] = 1 if stack[-1] <= right else 0
+                pc += 1
+            elif opcode == GREATER_EQUAL:
+                right = pop()
+                stack[-1] = 1 if stack[-1] >= right else 0
+                pc += 1
+            elif opcode == EQUAL_EQUAL:
+                right = pop()
+                stack[-1] = 1 if stack[-1] == right else 0
+                pc += 1
+            elif opcode == NOT_EQUAL:
+                right = pop()
+                stack[-1] = 1 if stack[-1] != right else 0
+                pc += 1
+            elif opcode == HALT:
+                return results_by_name(bytecode.symbol_table, values)
+            else:
+                raise ExecutionError(f"Bad opcode {opcode} at offset {pc}")
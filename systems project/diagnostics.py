@@ -0,0 +1,119 @@
+# diagnostics.py
+
+import sys
+from abc import ABC, abstractmethod
+
+# Verbosity levels. A sink only receives events at or below its own level.
+TRACE_OFF = 0
+TRACE_SUMMARY = 1   # analysis start/end and the final symbol table
+TRACE_NODES = 2     # one event per checked node
+
+
+class TraceEvent:
+    """One structured trace record. `types` holds the type names involved, e.g.
+    (left, right, result) for a binary operation; `detail` carries the name,
+    operator or literal value the event is about."""
+
+    __slots__ = ('kind', 'node', 'types', 'detail', 'line', 'column')
+
+    def __init__(self, kind, node=None, types=(), detail=None, line=None, column=None):
+        self.kind = kind
+        self.node = node
+        self.types = types
+        self.detail = detail
+        self.line = line
+        self.column = column
+
+    def format(self):
+        kind, types, detail = self.kind, self.types, self.detail
+        if kind == 'declaration':
+            return f"Semantic: Declared variable '{detail}' with type '{types[0]}'"
+        if kind == 'assignment':
+            return f"Semantic: Checked assignment for '{detail}'"
+        if kind == 'do_while':
+            return "Semantic: Checked do-while loop."
+        if kind == 'binary_op':
+            return (f"Semantic: Checked binary operation '{detail}' with operand types "
+                    f"'{types[0]}' and '{types[1]}', resulting type '{types[2]}'")
+        if kind == 'int_literal':
+            return f"Semantic: Found IntLiteral with value {detail}"
+        if kind == 'float_literal':
+            return f"Semantic: Found FloatLiteral with value {detail}"
+        if kind == 'identifier':
+            return f"Semantic: Found Identifier '{detail}' with type '{types[0]}'"
+        if kind == 'analysis_started':
+            return "\n--- Semantic Analysis ---"
+        if kind == 'analysis_completed':
+            return "Semantic analysis completed successfully."
+        if kind == 'symbol_table':
+            lines = ["--- Symbol Table ---"]
+            lines.extend(f"Variable: {name}, Type: {type_name}" for name, type_name in detail)
+            lines.append("----------------------")
+            return "\n".join(lines)
+        return f"{kind}: {detail}"
+
+    def __repr__(self):
+        return f"TraceEvent({self.kind}, {self.detail!r}, types={self.types}, Line {self.line}, Col {self.column})"
+
+
+class TraceSink(ABC):
+    verbosity = TRACE_OFF
+
+    @abstractmethod
+    def emit(self, event):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+
+class NullSink(TraceSink):
+    """Discards everything; analysis code skips building events entirely."""
+
+    def emit(self, event):
+        pass
+
+
+NULL_SINK = NullSink()
+
+
+class CollectingSink(TraceSink):
+    """Keeps events in memory, for tests and tools."""
+
+    def __init__(self, verbosity=TRACE_NODES):
+        self.verbosity = verbosity
+        self.events = []
+
+    def emit(self, event):
+        self.events.append(event)
+
+
+class FileSink(TraceSink):
+    """Writes formatted events to a file or stream, buffering lines so output
+    costs one write per batch rather than one per event."""
+
+    def __init__(self, file=None, verbosity=TRACE_NODES, buffer_lines=4096):
+        self.verbosity = verbosity
+        self.owns_file = isinstance(file, str)
+        self.file = open(file, 'w') if self.owns_file else (file or sys.stdout)
+        self.buffer_lines = buffer_lines
+        self.pending = []
+
+    def emit(self, event):
+        self.pending.append(event.format())
+        if len(self.pending) >= self.buffer_lines:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.file.write("\n".join(self.pending) + "\n")
+            self.pending.clear()
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        if self.owns_file:
+            self.file.close()
@@ -0,0 +1,295 @@
+# driver.py
+
+import argparse
+import fnmatch
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+
+from lexical import Lexer, LexicalError
+from parser import Parser, SyntaxError
+from semantic_analzer import SemanticAnalyzer, SemanticError
+from optimizer import PassManager, count_nodes
+from complier import Compiler
+from pycodegen import CompiledProgram
+from stats import Instrumentation, NULL_STATS, PHASE_UNITS, tree_shape
+
+CODEGEN_CHOICES = ('none', 'bytecode', 'python')
+DEFAULT_PATTERN = '*.txt'
+# Small files are grouped into tasks of about this many bytes, so thousands
+# of tiny files do not cost one round trip to a worker each.
+TASK_BYTES = 256 * 1024
+COMPILE_ERRORS = (LexicalError, SyntaxError, SemanticError)
+NULL_CONTEXT = nullcontext()
+
+
+def has_magic(path):
+    return any(character in path for character in '*?[')
+
+
+def collect_sources(inputs, pattern=DEFAULT_PATTERN):
+    """Expands directories (searched recursively for `pattern`), glob
+    patterns, manifests ('@list.txt', one path per line, '#' for comments)
+    and plain paths into a sorted list of unique files."""
+    paths = set()
+    for item in inputs:
+        if item.startswith('@'):
+            with open(item[1:], 'r') as manifest:
+                entries = [line.strip() for line in manifest]
+            paths.update(collect_sources([entry for entry in entries if entry and not entry.startswith('#')], pattern))
+        elif os.path.isdir(item):
+            for directory, _, names in os.walk(item):
+                paths.update(os.path.join(directory, name) for name in fnmatch.filter(names, pattern))
+        elif has_magic(item):
+            paths.update(path for path in glob.glob(item, recursive=True) if os.path.isfile(path))
+        else:
+            paths.add(item)
+    return sorted(paths)
+
+
+def schedule(paths, task_bytes=TASK_BYTES):
+    """Largest files first, so the longest jobs never start last; the small
+    files at the tail are packed into tasks of about task_bytes."""
+    sized = []
+    for path in paths:
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        sized.append((size, path))
+    sized.sort(key=lambda item: (-item[0], item[1]))
+    tasks = []
+    batch = []
+    batch_bytes = 0
+    for size, path in sized:
+        if size >= task_bytes:
+            tasks.append([path])
+            continue
+        batch.append(path)
+        batch_bytes += size
+        if batch_bytes >= task_bytes:
+            tasks.append(batch)
+            batch = []
+            batch_bytes = 0
+    if batch:
+        tasks.append(batch)
+    return tasks
+
+
+def compile_source(source, record, codegen='none', level=0, stats=NULL_STATS):
+    """Runs every phase after reading on `source`, filling in the counts of
+    `record`, and returns the analyzed AST, its symbol table and the
+    generated code (a Bytecode, a CompiledProgram or None). Errors in the
+    source raise."""
+    with stats.phase('lex'):
+        tokens = Lexer(source).tokenize_buffer()
+    record['tokens'] = len(tokens)
+    stats.count('lex', len(tokens))
+    with stats.phase('parse'):
+        ast = Parser(tokens).parse()
+    if stats.enabled:
+        nodes, depth = tree_shape(ast)
+        stats.count('parse', nodes)
+        stats.count('analyze', nodes)
+        stats.note('ast_depth', depth)
+    with stats.phase('analyze'):
+        analyzer = SemanticAnalyzer()
+        analyzer.analyze(ast)
+    symbol_table = analyzer.symbol_table
+    if level:
+        with stats.phase('optimize'):
+            PassManager(level).run(ast, symbol_table)
+    record['nodes'] = count_nodes(ast)
+    record['symbols'] = len(symbol_table)
+    if level:
+        stats.count('optimize', record['nodes'])
+    generated = None
+    if codegen != 'none':
+        with stats.phase('codegen'):
+            if codegen == 'bytecode':
+                generated = Compiler(symbol_table).compile(ast)
+                record['code_size'] = len(generated.code)
+            else:
+                generated = CompiledProgram(ast, symbol_table)
+                record['code_size'] = len(generated.source)
+        stats.count('codegen', record['nodes'])
+    return ast, symbol_table, generated
+
+
+def failure(record, e):
+    if isinstance(e, COMPILE_ERRORS + (OSError, UnicodeDecodeError)):
+        record['status'] = 'error'
+    else:
+        # A bug in the compiler; report it with the file instead of losing the batch.
+        record['status'] = 'internal_error'
+    record['error'] = {'type': type(e).__name__, 'message': str(e)}
+
+
+def compile_file(path, codegen='none', level=0, stats=NULL_STATS):
+    """Compiles one file and returns its record for the report. Errors in
+    the source are part of the record rather than raised."""
+    record = {'path': path, 'bytes': 0, 'status': 'ok'}
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        with stats.phase('read'):
+            with open(path, 'r', encoding='utf-8') as source_file:
+                source = source_file.read()
+        record['bytes'] = len(source)
+        stats.count('read', len(source))
+        compile_source(source, record, codegen, level, stats)
+    except Exception as e:
+        failure(record, e)
+    record['seconds'] = time.perf_counter() - start
+    record['cpu_seconds'] = time.process_time() - cpu_start
+    return record
+
+
+def compile_task(paths, codegen, level, memory=None):
+    # memory is None when statistics are off, else whether to trace memory.
+    if memory is None:
+        return [compile_file(path, codegen, level) for path in paths], None
+    with Instrumentation(memory=memory) as stats:
+        records = [compile_file(path, codegen, level, stats) for path in paths]
+    return records, stats.report()
+
+
+class BatchReport:
+    """Records of one driver run, in path order, with totals."""
+
+    def __init__(self, records, seconds, workers, stats=None):
+        self.records = sorted(records, key=lambda record: record['path'])
+        self.seconds = seconds
+        self.workers = workers
+        self.stats = stats
+
+    @property
+    def failed(self):
+        return [record for record in self.records if record['status'] != 'ok']
+
+    def summary(self):
+        files = len(self.records)
+        return {
+            'files': files,
+            'succeeded': files - len(self.failed),
+            'failed': len(self.failed),
+            'bytes': sum(record['bytes'] for record in self.records),
+            'tokens': sum(record.get('tokens', 0) for record in self.records),
+            'nodes': sum(record.get('nodes', 0) for record in self.records),
+            'workers': self.workers,
+            'wall_seconds': self.seconds,
+            'cpu_seconds': sum(record['cpu_seconds'] for record in self.records),
+            'files_per_second': files / self.seconds if self.seconds else 0.0,
+        }
+
+    def to_json(self, indent=None):
+        report = self.summary()
+        report['errors'] = [{'path': record['path'], **record['error']} for record in self.failed]
+        if self.stats is not None:
+            report['stats'] = self.stats.report()
+        report['results'] = self.records
+        return json.dumps(report, indent=indent)
+
+
+class CompileDriver:
+    """Compiles many files on a pool of long-lived worker processes.
+
+    The pool is created on first use and kept until close(), so repeated
+    runs (a watch loop, a build server) pay for process start-up and
+    imports once. Tasks are queued largest first and each idle worker takes
+    the next one, so a few big files cannot leave the other workers idle at
+    the end. With jobs=1 everything runs in this process.
+
+    Given an Instrumentation as `stats`, phase statistics of every file are
+    merged into it. A cProfile capture only sees this process, so profiling
+    runs everything here whatever `jobs` says."""
+
+    def __init__(self, jobs=None, codegen='none', level=0, task_bytes=TASK_BYTES, stats=None):
+        if codegen not in CODEGEN_CHOICES:
+            raise ValueError(f"Unknown code generator {codegen!r}")
+        self.jobs = jobs or os.cpu_count() or 1
+        self.codegen = codegen
+        self.level = level
+        self.task_bytes = task_bytes
+        self.stats = stats
+        self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def run(self, paths):
+        start = time.perf_counter()
+        tasks = schedule(paths, self.task_bytes)
+        records = []
+        stats = self.stats
+        if self.jobs == 1 or (stats is not None and stats.profiler is not None):
+            with stats or NULL_CONTEXT:
+                for task in tasks:
+                    records.extend(compile_file(path, self.codegen, self.level, stats or NULL_STATS)
+                                   for path in task)
+        else:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(self.jobs)
+            memory = None if stats is None else stats.memory
+            futures = [self.pool.submit(compile_task, task, self.codegen, self.level, memory) for task in tasks]
+            for future in as_completed(futures):
+                task_records, report = future.result()
+                records.extend(task_records)
+                if report is not None:
+                    stats.merge(report)
+        return BatchReport(records, time.perf_counter() - start, self.jobs, stats)
+
+
+def main(argv=None):
+    arguments = argparse.ArgumentParser(description="Compile many source files in parallel.")
+    arguments.add_argument('inputs', nargs='+', help="files, directories, glob patterns or @manifest files")
+    arguments.add_argument('-j', '--jobs', type=int, default=None, help="worker processes (default: CPU count)")
+    arguments.add_argument('-O', dest='level', type=int, choices=(0, 1, 2), default=0, help="optimisation level")
+    arguments.add_argument('--codegen', choices=CODEGEN_CHOICES, default='none', help="back end to run after analysis")
+    arguments.add_argument('--pattern', default=DEFAULT_PATTERN, help="file name pattern inside directories")
+    arguments.add_argument('--report', help="write the JSON report here ('-' for stdout)")
+    arguments.add_argument('--stats', nargs='?', const='table', choices=('table', 'json'),
+                           help="print time, rate and memory per phase")
+    arguments.add_argument('--stats-memory', action='store_true', help="trace peak memory per phase (slower)")
+    arguments.add_argument('--profile', metavar='PHASE', choices=sorted(PHASE_UNITS),
+                           help="cProfile one phase (runs in this process)")
+    options = arguments.parse_args(argv)
+
+    stats = None
+    if options.stats or options.stats_memory or options.profile:
+        stats = Instrumentation(memory=options.stats_memory, profile=options.profile)
+    paths = collect_sources(options.inputs, options.pattern)
+    with CompileDriver(options.jobs, options.codegen, options.level, stats=stats) as driver:
+        report = driver.run(paths)
+    if options.report == '-':
+        print(report.to_json(indent=2))
+    else:
+        if options.report:
+            with open(options.report, 'w') as report_file:
+                report_file.write(report.to_json(indent=2))
+        summary = report.summary()
+        for record in report.failed:
+            print(f"{record['path']}: {record['error']['type']}: {record['error']['message']}", file=sys.stderr)
+        print(f"{summary['succeeded']}/{summary['files']} files compiled in {summary['wall_seconds']:.2f} s "
+              f"({summary['files_per_second']:.1f} files/s, {summary['workers']} workers)")
+        if stats is not None:
+            print(stats.to_json(indent=2) if options.stats == 'json' else stats.table())
+            if options.profile:
+                print(stats.profile_text())
+    return 1 if report.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
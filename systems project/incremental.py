@@ -0,0 +1,801 @@
+# incremental.py
+
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import chain
+
+from lexical import Lexer, LexicalError, Token, TokenBuffer, TokenKind
+from parser import Parser, SyntaxError, BINARY_PRECEDENCE
+from ast_nodes import (
+    StatementListNode, DeclarationNode, AssignmentNode, DoWhileNode, BinaryOpNode, IdentifierNode,
+)
+from semantic_analzer import SemanticAnalyzer, SemanticError
+from compile_cache import FrontEndResult
+from tree_walker import iter_preorder
+
+# Characters lexed past the end of an edit before looking for a token that
+# lines up with the old tokens; the window grows fourfold until one does.
+RELEX_WINDOW = 256
+# Runs an Offsets keeps before folding them, and the piece size of a Text.
+MAX_RUNS = 64
+PIECE_SIZE = 1 << 16
+
+# Token kinds that some AST node keeps a position for.
+POSITIONED_KINDS = frozenset((
+    TokenKind.INT_KEYWORD, TokenKind.FLOAT_KEYWORD, TokenKind.IDENTIFIER,
+    TokenKind.INT_LITERAL, TokenKind.FLOAT_LITERAL,
+)) | frozenset(BINARY_PRECEDENCE)
+
+
+class Offsets:
+    """An ascending array of offsets kept as runs that each carry a shift:
+    entry i is values[i] plus the shift of the last run starting at or
+    before i. replace() rewrites the entries an edit changes and starts a new
+    run after them, so an edit costs the same however far it is from the
+    previous one. fold() applies the shifts to the values, which also
+    happens whenever there are more than MAX_RUNS runs."""
+
+    __slots__ = ('values', 'runs', 'shifts')
+
+    def __init__(self, values):
+        self.values = values
+        self.runs = [0]
+        self.shifts = [0]
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        runs = self.runs
+        if len(runs) == 1:
+            return self.values[index] + self.shifts[0]
+        return self.values[index] + self.shifts[bisect_right(runs, index) - 1]
+
+    def search(self, value, bisect, strict):
+        # The answer lies in the last run whose first entry is below value
+        # (at most value when not strict), or just past its end.
+        values, runs, shifts = self.values, self.runs, self.shifts
+        if not values:
+            return 0
+        low, high = 0, len(runs)
+        while low < high:
+            middle = (low + high) // 2
+            first = values[runs[middle]] + shifts[middle]
+            if first < value or (first == value and not strict):
+                low = middle + 1
+            else:
+                high = middle
+        run = low - 1
+        if run < 0:
+            return 0
+        stop = runs[run + 1] if run + 1 < len(runs) else len(values)
+        return bisect(values, value - shifts[run], runs[run], stop)
+
+    def bisect_left(self, value):
+        return self.search(value, bisect_left, True)
+
+    def bisect_right(self, value):
+        return self.search(value, bisect_right, False)
+
+    def replace(self, start, stop, values, delta):
+        """Replaces entries start:stop with the absolute `values`, and shifts
+        every entry after them by delta."""
+        stored = self.values
+        old_length = len(stored)
+        values = array(stored.typecode, values)
+        stored[start:stop] = values
+        count = len(values)
+        runs, shifts = self.runs, self.shifts
+        keep = bisect_left(runs, start)
+        after = bisect_right(runs, stop)
+        new_runs = [(runs[run], shifts[run]) for run in range(keep)]
+        if count:
+            new_runs.append((start, 0))
+        if stop < old_length:
+            new_runs.append((start + count, shifts[after - 1] + delta))
+        moved = count - (stop - start)
+        new_runs.extend((runs[run] + moved, shifts[run] + delta) for run in range(after, len(runs)))
+        self.runs, self.shifts = [0], [0]
+        for run_start, shift in new_runs:
+            if run_start == 0:
+                self.shifts[0] = shift
+            elif shift != self.shifts[-1]:
+                self.runs.append(run_start)
+                self.shifts.append(shift)
+        if len(self.runs) > MAX_RUNS:
+            self.fold()
+
+    def spans(self):
+        """(start, stop, shift) for every run."""
+        return zip(self.runs, self.runs[1:] + [len(self.values)], self.shifts)
+
+    def absolute(self):
+        values = self.values
+        result = array(values.typecode)
+        for start, stop, shift in self.spans():
+            if shift:
+                result.extend(map(shift.__add__, values[start:stop]))
+            else:
+                result.extend(values[start:stop])
+        return result
+
+    def copy(self):
+        offsets = Offsets(self.values[:])
+        offsets.runs, offsets.shifts = self.runs[:], self.shifts[:]
+        return offsets
+
+    def fold(self):
+        """Applies the shifts to the values and returns them."""
+        if len(self.runs) > 1 or self.shifts[0]:
+            self.values = self.absolute()
+            self.runs, self.shifts = [0], [0]
+        return self.values
+
+
+class Text:
+    """A string kept as pieces of about PIECE_SIZE characters, so that an
+    edit copies the pieces it touches rather than the whole text. Slices are
+    str; str(text) joins the pieces, once per version of the text."""
+
+    __slots__ = ('pieces', 'starts', 'length', 'joined')
+
+    def __init__(self, text):
+        self.pieces = [text[start:start + PIECE_SIZE] for start in range(0, len(text), PIECE_SIZE)] or ['']
+        self.starts = Offsets(array('q', range(0, len(text) or 1, PIECE_SIZE)))
+        self.length = len(text)
+        self.joined = text
+
+    def __len__(self):
+        return self.length
+
+    def __str__(self):
+        if self.joined is None:
+            self.joined = ''.join(self.pieces)
+        return self.joined
+
+    def __getitem__(self, key):
+        start, stop, _ = key.indices(self.length)
+        if self.joined is not None:
+            return self.joined[start:stop]
+        pieces, starts = self.pieces, self.starts
+        index = starts.bisect_right(start) - 1
+        parts = []
+        while start < stop:
+            piece_start = starts[index]
+            piece = pieces[index]
+            parts.append(piece[start - piece_start:stop - piece_start])
+            start = piece_start + len(piece)
+            index += 1
+        return ''.join(parts)
+
+    def replace(self, offset, removed, inserted):
+        pieces, starts = self.pieces, self.starts
+        end = offset + removed
+        first = starts.bisect_right(offset) - 1
+        last = max(first, starts.bisect_right(end) - 1)
+        first_start, last_start = starts[first], starts[last]
+        merged = pieces[first][:offset - first_start] + inserted + pieces[last][end - last_start:]
+        new_pieces = [merged[start:start + PIECE_SIZE] for start in range(0, len(merged), PIECE_SIZE)]
+        if not new_pieces and last - first + 1 == len(pieces):
+            new_pieces = ['']
+        pieces[first:last + 1] = new_pieces
+        starts.replace(first, last + 1, [first_start + index * PIECE_SIZE for index in range(len(new_pieces))],
+                       len(inserted) - removed)
+        self.length += len(inserted) - removed
+        self.joined = None
+
+
+class EditableTokens:
+    """The columns of a TokenBuffer with offsets and lines kept as Offsets
+    over a Text, so an edit only touches the tokens it re-lexes."""
+
+    __slots__ = ('source', 'kinds', 'starts', 'ends', 'lines', 'columns')
+
+    def __init__(self, buffer, source):
+        # Copies, so edits never change a buffer handed out by front_end().
+        self.source = source
+        self.kinds = buffer.kinds[:]
+        self.starts = Offsets(buffer.starts[:])
+        self.ends = Offsets(buffer.ends[:])
+        self.lines = Offsets(buffer.lines[:])
+        self.columns = buffer.columns[:]
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def lexeme(self, index):
+        if self.kinds[index] == TokenKind.EOF:
+            return 'EOF'
+        return self.source[self.starts[index]:self.ends[index]]
+
+    def __getitem__(self, index):
+        return Token(self.kinds[index], self.lexeme(index), self.lines[index], self.columns[index])
+
+    def buffer(self):
+        offsets = {'starts': self.starts.copy(), 'ends': self.ends.copy(), 'lines': self.lines.copy()}
+        return DocumentTokens(str(self.source), self.kinds[:], self.columns[:], offsets)
+
+
+class DocumentTokens(TokenBuffer):
+    """A TokenBuffer whose starts, ends and lines are copies of Offsets,
+    applied the first time each column is read, since consumers that never
+    read them should not pay for shifting every token after an edit."""
+
+    __slots__ = ('offsets',)
+
+    def __init__(self, source, kinds, columns, offsets):
+        self.source = source
+        self.kinds = kinds
+        self.columns = columns
+        self.offsets = offsets
+
+    def __getattr__(self, name):
+        # Only reached while the slot is still unset.
+        offsets = self.offsets.pop(name, None)
+        if offsets is None:
+            raise AttributeError(name)
+        values = offsets.fold()
+        setattr(self, name, values)
+        return values
+
+
+def statement_ends(kinds, start, stop):
+    """Token indices just past the ';' closing each top-level statement in
+    kinds[start:stop]."""
+    semicolon, left_brace, right_brace = TokenKind.SEMICOLON, TokenKind.LBRACE, TokenKind.RBRACE
+    ends = []
+    depth = 0
+    for index in range(start, stop):
+        kind = kinds[index]
+        if kind == semicolon:
+            if depth == 0:
+                ends.append(index + 1)
+        elif kind == left_brace:
+            depth += 1
+        elif kind == right_brace:
+            depth -= 1
+    return ends
+
+
+def names_used(statement):
+    """Every name a statement declares, assigns or reads, at any depth."""
+    names = set()
+    for node, _ in iter_preorder(statement):
+        if isinstance(node, (DeclarationNode, AssignmentNode)):
+            names.add(node.identifier_token.lexeme)
+        elif isinstance(node, IdentifierNode):
+            names.add(node.token.lexeme)
+    return names
+
+
+def positioned(statement):
+    """Yields the tokens and literal nodes of a statement in source order."""
+    stack = [statement]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, Token):
+            yield item
+        elif isinstance(item, DeclarationNode):
+            if item.assignment_expr is not None:
+                stack.append(item.assignment_expr)
+            stack.append(item.identifier_token)
+            stack.append(item.type_token)
+        elif isinstance(item, AssignmentNode):
+            stack.append(item.assignment_expr)
+            stack.append(item.identifier_token)
+        elif isinstance(item, DoWhileNode):
+            stack.append(item.condition)
+            stack.append(item.body)
+        elif isinstance(item, StatementListNode):
+            stack.extend(reversed(item.children))
+        elif isinstance(item, BinaryOpNode):
+            stack.append(item.right)
+            stack.append(item.operator_token)
+            stack.append(item.left)
+        elif isinstance(item, IdentifierNode):
+            yield item.token
+        else:
+            yield item
+
+
+def restore_positions(statement, buffer, start, stop):
+    """Copies line and column numbers from buffer[start:stop] into the
+    statement those tokens were parsed into."""
+    kinds, lines, columns = buffer.kinds, buffer.lines, buffer.columns
+    items = positioned(statement)
+    for index in range(start, stop):
+        if kinds[index] in POSITIONED_KINDS:
+            item = next(items)
+            item.line = lines[index]
+            item.column = columns[index]
+
+
+def transplant_slots(old, new):
+    # The two statements have the same tokens, so their trees have the same shape.
+    for (old_node, _), (new_node, _) in zip(iter_preorder(old), iter_preorder(new)):
+        slot = getattr(old_node, 'slot', None)
+        if slot is not None:
+            new_node.slot = slot
+
+
+class EditResult:
+    """What one edit cost: tokens re-lexed, top-level statements reparsed and
+    re-analyzed, and whether it fell back to a full rebuild."""
+
+    __slots__ = ('relexed', 'reparsed', 'reanalyzed', 'full')
+
+    def __init__(self, relexed, reparsed, reanalyzed, full=False):
+        self.relexed = relexed
+        self.reparsed = reparsed
+        self.reanalyzed = reanalyzed
+        self.full = full
+
+    def __repr__(self):
+        return (f"EditResult(relexed={self.relexed}, reparsed={self.reparsed}, "
+                f"reanalyzed={self.reanalyzed}, full={self.full})")
+
+
+class IncrementalDocument:
+    """A source file kept lexed, parsed and analyzed across edits.
+
+    apply_edit(offset, removed, inserted) re-lexes from the last token that
+    ends before the edit until a new token lines up with an old one, reparses
+    only the top-level statements those tokens belong to (a whole top-level
+    do-while when the edit is inside one), and re-analyzes the new statements
+    plus any later statement that uses a name whose top-level declaration was
+    added or removed. A reparsed statement whose tokens did not change keeps
+    its analysis, and a re-analyzed one keeps its slots.
+
+    Work past the edit is deferred so that an edit costs about the same
+    anywhere in the file. The source is kept as a Text. Token offsets,
+    lines and statement ends are kept as Offsets. Line shifts for later
+    statements are recorded per statement and applied by front_end().
+    front_end() then fills the slots left by removed statements with the
+    last slots in the table and reorders the slots of each name it touched
+    into program order. Only statements that use those names are visited.
+    Slot numbers are therefore dense, and the slots sharing a name follow
+    program order, which is all that results depend on. Slots of different
+    names can be numbered differently from a fresh compile.
+
+    Any error raised by an edit comes from a full rebuild, so it is exactly
+    the error a fresh compile reports; edits keep rebuilding in full until the
+    source is valid again."""
+
+    def __init__(self, source):
+        self.text = Text(source)
+        self.valid = False
+        self.rebuild()
+
+    @property
+    def source(self):
+        return str(self.text)
+
+    def rebuild(self):
+        self.valid = False
+        buffer = Lexer(self.source).tokenize_buffer()
+        self.ast = Parser(buffer).parse()
+        self.statements = self.ast.children[0].children
+        self.ends = Offsets(array('q', statement_ends(buffer.kinds, 0, len(buffer) - 1)))
+        self.tokens = EditableTokens(buffer, self.text)
+        self.buffer = buffer
+        self.items = [list(positioned(statement)) for statement in self.statements]
+        # Line shifts not yet applied to each statement's positions. They are
+        # not ascending, so only replace() and spans() are used on them.
+        self.line_shifts = Offsets(array('q', bytes(8 * len(self.statements))))
+        self.restore = set()
+        self.dead = []
+        self.touched = set()
+        analyzer = SemanticAnalyzer()
+        analyzer.analyze(self.ast)
+        self.symbol_table = analyzer.symbol_table
+        self.uses = [names_used(statement) for statement in self.statements]
+        self.users = {}
+        self.declarations = {}
+        for statement, names in zip(self.statements, self.uses):
+            self.index(statement, names)
+        self.valid = True
+
+    def index(self, statement, names):
+        users = self.users
+        for name in names:
+            statement_users = users.get(name)
+            if statement_users is None:
+                users[name] = statement_users = set()
+            statement_users.add(statement)
+        if isinstance(statement, DeclarationNode):
+            self.declarations[statement.identifier_token.lexeme] = statement
+
+    def unindex(self, statement, names):
+        users = self.users
+        for name in names:
+            users[name].discard(statement)
+        if isinstance(statement, DeclarationNode):
+            name = statement.identifier_token.lexeme
+            if self.declarations.get(name) is statement:
+                del self.declarations[name]
+                # Inner-scope slots are already invisible once their do-while
+                # has been analyzed; only the top-level one needs hiding.
+                visible = self.symbol_table.visible
+                if visible.get(name) == statement.slot:
+                    del visible[name]
+
+    def front_end(self):
+        """The document as a FrontEndResult: the same tokens, tree and names
+        as compiling its current source from scratch, with slots numbered as
+        described above."""
+        if self.buffer is None:
+            self.buffer = self.tokens.buffer()
+        self.apply_positions()
+        if self.dead or self.touched:
+            self.renumber()
+        return FrontEndResult(self.buffer, self.ast, self.symbol_table)
+
+    def apply_positions(self):
+        statements, items = self.statements, self.items
+        for start, stop, shift in self.line_shifts.spans():
+            if shift:
+                for item in chain.from_iterable(items[start:stop]):
+                    item.line += shift
+        if len(self.line_shifts.runs) > 1 or self.line_shifts.shifts[0]:
+            self.line_shifts = Offsets(array('q', bytes(8 * len(statements))))
+        # Statements sharing a line with the end of an edit also had their
+        # columns moved; they are copied from the tokens.
+        for statement in self.restore:
+            position = statements.index(statement)
+            start = self.ends[position - 1] if position else 0
+            restore_positions(statement, self.tokens, start, self.ends[position])
+        self.restore.clear()
+
+    def renumber(self):
+        table = self.symbol_table
+        dead = set(self.dead)
+        size = len(table.names) - len(dead)
+        # Live slots past the new end move into the holes below it.
+        movers = [slot for slot in range(size, len(table.names)) if slot not in dead]
+        moves = dict(zip(movers, sorted(slot for slot in dead if slot < size)))
+        touched = self.touched
+        touched.update(table.names[slot] for slot in movers)
+        for name in touched:
+            self.place(name, moves)
+        del table.names[size:], table.types[size:], table.previous[size:], table.depths[size:]
+        if dead:
+            table.scopes[0] = [slot for slot in range(size) if table.depths[slot] == 0]
+        self.dead = []
+        self.touched = set()
+
+    def place(self, name, moves):
+        """Gives the slots of `name` the numbers in `moves` and puts them in
+        program order, in the table and in every statement using the name."""
+        nodes = []
+        declarations = []
+        for statement in self.users.get(name, ()):
+            for node, _ in iter_preorder(statement):
+                node_type = type(node)
+                if node_type is IdentifierNode:
+                    if node.token.lexeme == name:
+                        nodes.append(node)
+                elif node_type is DeclarationNode or node_type is AssignmentNode:
+                    if node.identifier_token.lexeme == name:
+                        nodes.append(node)
+                        if node_type is DeclarationNode:
+                            declarations.append(node)
+        declarations.sort(key=lambda node: (node.identifier_token.line, node.identifier_token.column))
+        slots = [node.slot for node in declarations]
+        numbers = sorted(moves.get(slot, slot) for slot in slots)
+        final = {slot: number for slot, number in zip(slots, numbers) if slot != number}
+        if not final:
+            return
+        table = self.symbol_table
+        rows = {slot: (table.types[slot], table.previous[slot], table.depths[slot]) for slot in final}
+        for slot, number in final.items():
+            type_code, previous, depth = rows[slot]
+            table.names[number] = name
+            table.types[number] = type_code
+            table.previous[number] = final.get(previous, previous)
+            table.depths[number] = depth
+        # Slots that kept their number may still shadow one that moved.
+        for slot in slots:
+            if slot not in final and table.previous[slot] in final:
+                table.previous[slot] = final[table.previous[slot]]
+        for node in nodes:
+            node.slot = final.get(node.slot, node.slot)
+        visible = table.visible.get(name)
+        if visible in final:
+            table.visible[name] = final[visible]
+
+    def apply_edit(self, offset, removed, inserted):
+        if not 0 <= offset <= offset + removed <= len(self.text):
+            raise ValueError(f"Edit ({offset}, {removed}) is outside a source of {len(self.text)} characters")
+        removed_text = self.text[offset:offset + removed]
+        self.text.replace(offset, removed, inserted)
+        self.buffer = None
+        if self.valid:
+            try:
+                return self.update(offset, removed_text, len(inserted))
+            except (LexicalError, SyntaxError, SemanticError):
+                pass
+        self.rebuild()
+        return EditResult(len(self.tokens), len(self.statements), len(self.statements), full=True)
+
+    def update(self, offset, removed_text, inserted_length):
+        tokens = self.tokens
+        first_token, old_stop, new_stop, moved_stop, line_delta, old_kinds, old_lexemes = \
+            self.relex(offset, removed_text, inserted_length)
+        token_delta = new_stop - old_stop
+        ends = self.ends
+        # Statements holding a changed token, extended until a boundary in the
+        # new tokens falls on an old statement boundary after the change.
+        first = ends.bisect_right(first_token)
+        region_start = ends[first - 1] if first else 0
+        eof = len(tokens) - 1
+        new_ends = []
+        last = None
+        depth = 0
+        kinds = tokens.kinds
+        for index in range(region_start, eof):
+            kind = kinds[index]
+            if kind == TokenKind.LBRACE:
+                depth += 1
+            elif kind == TokenKind.RBRACE:
+                depth -= 1
+            elif kind == TokenKind.SEMICOLON and depth == 0:
+                new_ends.append(index + 1)
+                if index + 1 >= new_stop:
+                    old_end = index + 1 - token_delta
+                    position = ends.bisect_left(old_end)
+                    if position < len(ends) and ends[position] == old_end:
+                        last = position
+                        break
+        if last is None:
+            last = len(ends) - 1
+            region_stop = eof
+        else:
+            region_stop = new_ends[-1]
+
+        parser = Parser([tokens[index] for index in range(region_start, region_stop)] + [tokens[eof]])
+        new_statements = parser.statement_list((TokenKind.EOF,)).children
+        if len(new_statements) != len(new_ends):
+            raise SyntaxError("Reparsed statements do not match their boundaries")
+        old_statements = self.statements[first:last + 1]
+        old_uses = self.uses[first:last + 1]
+
+        # Statements at either end of the region whose tokens did not change
+        # keep their analysis.
+        def old_token(index):
+            if index < first_token:
+                return kinds[index], tokens.lexeme(index)
+            if index < old_stop:
+                return old_kinds[index - first_token], old_lexemes[index - first_token]
+            return kinds[index + token_delta], tokens.lexeme(index + token_delta)
+
+        def unchanged(old_start, old_end, new_start, new_end):
+            if old_end - old_start != new_end - new_start:
+                return False
+            for old_index, new_index in zip(range(old_start, old_end), range(new_start, new_end)):
+                if old_token(old_index) != (kinds[new_index], tokens.lexeme(new_index)):
+                    return False
+            return True
+
+        old_bounds = [region_start] + [ends[index] for index in range(first, last + 1)]
+        new_bounds = [region_start] + new_ends
+        count = min(len(old_statements), len(new_statements))
+        prefix = 0
+        while prefix < count and unchanged(old_bounds[prefix], old_bounds[prefix + 1],
+                                           new_bounds[prefix], new_bounds[prefix + 1]):
+            prefix += 1
+        suffix = 0
+        while suffix < count - prefix and unchanged(old_bounds[-suffix - 2], old_bounds[-suffix - 1],
+                                                    new_bounds[-suffix - 2], new_bounds[-suffix - 1]):
+            suffix += 1
+        kept = {index: index for index in range(prefix)}
+        for from_end in range(1, suffix + 1):
+            kept[len(new_statements) - from_end] = len(old_statements) - from_end
+
+        changed = set()
+        kept_old = set(kept.values())
+        for old_index, statement in enumerate(old_statements):
+            self.unindex(statement, old_uses[old_index])
+            self.restore.discard(statement)
+            if old_index not in kept_old:
+                # Its slots become holes that front_end() fills.
+                self.dead.extend(node.slot for node, _ in iter_preorder(statement)
+                                 if type(node) is DeclarationNode)
+                if isinstance(statement, DeclarationNode):
+                    changed.add(statement.identifier_token.lexeme)
+        new_uses = []
+        for new_index, statement in enumerate(new_statements):
+            old_index = kept.get(new_index)
+            if old_index is None:
+                new_uses.append(None)
+                if isinstance(statement, DeclarationNode):
+                    changed.add(statement.identifier_token.lexeme)
+                continue
+            old = old_statements[old_index]
+            transplant_slots(old, statement)
+            if isinstance(old, DeclarationNode):
+                # unindex hid the slot along with the old node.
+                self.symbol_table.visible[old.identifier_token.lexeme] = old.slot
+            new_uses.append(old_uses[old_index])
+            self.index(statement, old_uses[old_index])
+
+        self.statements[first:last + 1] = new_statements
+        self.uses[first:last + 1] = new_uses
+        self.items[first:last + 1] = [list(positioned(statement)) for statement in new_statements]
+        ends.replace(first, last + 1, new_ends, token_delta)
+        # The new statements were parsed with current positions; every later
+        # one moves by line_delta when front_end() runs.
+        self.line_shifts.replace(first, last + 1, bytes(8 * len(new_statements)), line_delta)
+        if moved_stop > new_stop:
+            for position in range(ends.bisect_right(new_stop), ends.bisect_right(moved_stop - 1) + 1):
+                if position < len(self.statements):
+                    self.restore.add(self.statements[position])
+
+        pending = [first + new_index for new_index in range(len(new_statements)) if new_index not in kept]
+        affected = set()
+        for name in changed:
+            affected.update(self.users.get(name, ()))
+        for statement in affected:
+            position = self.statements.index(statement)
+            self.unindex(statement, self.uses[position])
+            pending.append(position)
+        pending.sort()
+        for position in pending:
+            self.analyze_statement(position)
+        return EditResult(new_stop - first_token, len(new_statements), len(pending))
+
+    def analyze_statement(self, position):
+        statement = self.statements[position]
+        uses = self.uses[position]
+        fresh = uses is None
+        if fresh:
+            uses = self.uses[position] = names_used(statement)
+        # Top-level names declared further down are in the table already, but
+        # not visible at this point of the program: hide them while it is
+        # analyzed.
+        visible = self.symbol_table.visible
+        hidden = []
+        for name in uses:
+            declaration = self.declarations.get(name)
+            if declaration is not None and visible.get(name) == declaration.slot and \
+                    self.statements.index(declaration) > position:
+                del visible[name]
+                hidden.append((name, declaration.slot))
+        table = self.symbol_table
+        declarations = [node for node, _ in iter_preorder(statement) if type(node) is DeclarationNode]
+        old_slots = None if fresh else [node.slot for node in declarations]
+        base = len(table.names)
+        analyzer = SemanticAnalyzer()
+        analyzer.symbol_table = table
+        try:
+            analyzer.visit(statement)
+        finally:
+            for name, slot in hidden:
+                visible.setdefault(name, slot)
+        if old_slots is None:
+            self.touched.update(node.identifier_token.lexeme for node in declarations)
+        else:
+            self.keep_slots(statement, declarations, old_slots, base)
+        self.index(statement, uses)
+
+    def keep_slots(self, statement, declarations, old_slots, base):
+        """Moves the slots a re-analyzed statement was just given back to the
+        ones it had, and drops the new ones from the end of the table."""
+        table = self.symbol_table
+        slots = {node.slot: old for node, old in zip(declarations, old_slots)}
+        for slot, old in slots.items():
+            previous = table.previous[slot]
+            table.previous[old] = slots.get(previous, previous)
+            table.depths[old] = table.depths[slot]
+            name = table.names[slot]
+            if table.visible.get(name) == slot:
+                table.visible[name] = old
+        scope = table.scopes[0]
+        if scope and scope[-1] in slots:
+            scope[-1] = slots[scope[-1]]
+        for node, _ in iter_preorder(statement):
+            slot = getattr(node, 'slot', None)
+            if slot in slots:
+                node.slot = slots[slot]
+        del table.names[base:], table.types[base:], table.previous[base:], table.depths[base:]
+
+    def relex(self, offset, removed_text, inserted_length):
+        """Re-lexes the tokens an edit can change and splices them in. Returns
+        the first re-lexed index, where the old and new tokens line up again
+        (old and new index), the end of the later tokens whose columns moved,
+        the change in line numbers after the edit, and the kinds and lexemes
+        of the replaced tokens."""
+        tokens = self.tokens
+        kinds, starts, ends, lines, columns = tokens.kinds, tokens.starts, tokens.ends, tokens.lines, tokens.columns
+        removed = len(removed_text)
+        delta = inserted_length - removed
+        edit_end = offset + inserted_length
+        # Restart at the last token ending before the edit, backing up over
+        # tokens glued to their predecessor so keyword checks see a real
+        # boundary.
+        first = ends.bisect_left(offset) - 1
+        while first > 0 and ends[first - 1] == starts[first]:
+            first -= 1
+        if first < 0:
+            first, restart, line, column = 0, 0, 1, 1
+        else:
+            restart, line, column = starts[first], lines[first], columns[first]
+
+        source = self.text
+        window = RELEX_WINDOW + inserted_length
+        while True:
+            stop = min(len(source), edit_end + window)
+            complete = stop == len(source)
+            try:
+                fresh = Lexer(source[restart:stop], first_line=line).tokenize_buffer()
+            except LexicalError:
+                # A window can end inside a comment; only a complete lex is final.
+                if complete:
+                    raise
+                window *= 4
+                continue
+            aligned = self.align(fresh, restart, stop, edit_end, delta, complete)
+            if aligned is not None:
+                break
+            window *= 4
+        count, old_stop = aligned
+
+        # The text has already been edited; old spans are read around the edit.
+        removed_end = offset + removed
+
+        def old_text(start, end):
+            if end <= offset:
+                return source[start:end]
+            if start >= removed_end:
+                return source[start + delta:end + delta]
+            text = removed_text[max(start - offset, 0):end - offset]
+            if start < offset:
+                text = source[start:offset] + text
+            if end > removed_end:
+                text += source[edit_end:end + delta]
+            return text
+
+        old_kinds = kinds[first:old_stop]
+        old_lexemes = [old_text(starts[index], ends[index]) for index in range(first, old_stop)]
+        fresh_lines, fresh_columns = fresh.lines, fresh.columns
+        for index in range(count + 1):
+            if fresh_lines[index] != line:
+                break
+            fresh_columns[index] += column - 1
+        column_line = lines[old_stop]
+        line_delta = fresh_lines[count] - column_line
+        column_delta = fresh_columns[count] - columns[old_stop]
+
+        kinds[first:old_stop] = fresh.kinds[:count]
+        starts.replace(first, old_stop, map(restart.__add__, fresh.starts[:count]), delta)
+        ends.replace(first, old_stop, map(restart.__add__, fresh.ends[:count]), delta)
+        lines.replace(first, old_stop, fresh_lines[:count], line_delta)
+        columns[first:old_stop] = fresh_columns[:count]
+        new_stop = index = first + count
+        if column_delta:
+            moved_line = column_line + line_delta
+            while index < len(kinds) and lines[index] == moved_line:
+                columns[index] += column_delta
+                index += 1
+        return first, old_stop, new_stop, index, line_delta, old_kinds, old_lexemes
+
+    def align(self, fresh, restart, stop, edit_end, delta, complete):
+        # A fresh token past the edit with the same kind and (shifted) span as
+        # an old token proves the rest of the old tokens are still right.
+        tokens = self.tokens
+        kinds, starts, ends = tokens.kinds, tokens.starts, tokens.ends
+        fresh_starts, fresh_ends, fresh_kinds = fresh.starts, fresh.ends, fresh.kinds
+        for index in range(len(fresh_kinds)):
+            start = fresh_starts[index] + restart
+            if start < edit_end:
+                continue
+            kind = fresh_kinds[index]
+            if kind == TokenKind.EOF:
+                return (index, len(kinds) - 1) if complete else None
+            end = fresh_ends[index] + restart
+            if not complete and end >= stop:
+                return None
+            old_index = starts.bisect_left(start - delta)
+            if old_index < len(kinds) and starts[old_index] == start - delta and \
+                    ends[old_index] == end - delta and kinds[old_index] == kind:
+                return index, old_index
+        return None
@@ -0,0 +1,147 @@
+# interpreter.py
+
+from lexical import TokenKind
+from ast_nodes import (
+    ProgramNode, StatementListNode, DeclarationNode, AssignmentNode, DoWhileNode,
+    BinaryOpNode, IntLiteralNode, FloatLiteralNode, IdentifierNode
+)
+from symbol_table import TYPE_FLOAT
+
+# Runtime semantics shared by every backend:
+#  - a declaration without an initializer sets the variable to 0 (or 0.0);
+#  - a value stored into a float variable is converted to float;
+#  - int op int stays int and '/' on two ints truncates toward zero, any float
+#    operand makes the result float;
+#  - comparisons produce the int 1 or 0, and a do-while repeats while its
+#    condition is non-zero;
+#  - division by zero raises ExecutionError.
+
+
+class ExecutionError(Exception):
+    pass
+
+
+def int_div(left, right):
+    quotient = abs(left) // abs(right)
+    return quotient if (left < 0) == (right < 0) else -quotient
+
+
+def division_error(token):
+    return division_error_at(token.line, token.column)
+
+
+def division_error_at(line, column):
+    return ExecutionError(f"Division by zero at line {line}, column {column}")
+
+
+def initial_values(symbol_table):
+    return [0.0 if type_code == TYPE_FLOAT else 0 for type_code in symbol_table.types]
+
+
+def parameter_values(symbol_table, parameters):
+    """Maps the slots named in `parameters` to their values, converted to the
+    variable's type. Ints given for float variables become floats; anything
+    but an int for an int variable is an error."""
+    slots = {}
+    for slot, name in enumerate(symbol_table.names):
+        if name not in parameters:
+            continue
+        value = parameters[name]
+        if symbol_table.types[slot] == TYPE_FLOAT:
+            slots[slot] = float(value)
+        elif isinstance(value, int) and not isinstance(value, bool):
+            slots[slot] = value
+        else:
+            raise ValueError(f"Parameter '{name}' must be an int, got {value!r}")
+    return slots
+
+
+def results_by_name(symbol_table, values):
+    # Later slots win when a name was declared in several sibling scopes.
+    results = dict(zip(symbol_table.names, values))
+    for slot in symbol_table.temporaries:
+        del results[symbol_table.names[slot]]
+    return results
+
+
+class Interpreter:
+    """Reference evaluator that walks the analyzed AST directly. It is kept
+    deliberately simple; faster backends are checked against it.
+
+    `parameters` maps variable names to input values: a declaration without
+    an initializer takes its parameter instead of 0."""
+
+    def __init__(self, symbol_table, parameters=None):
+        self.symbol_table = symbol_table
+        self.values = initial_values(symbol_table)
+        self.parameters = parameter_values(symbol_table, parameters) if parameters else {}
+
+    def run(self, program):
+        self.execute(program)
+        return results_by_name(self.symbol_table, self.values)
+
+    def execute(self, node):
+        values = self.values
+        node_type = type(node)
+        if node_type is StatementListNode or node_type is ProgramNode:
+            for statement in node.children:
+                self.execute(statement)
+        elif node_type is AssignmentNode:
+            value = self.evaluate(node.assignment_expr)
+            values[node.slot] = float(value) if self.symbol_table.types[node.slot] == TYPE_FLOAT else value
+        elif node_type is DeclarationNode:
+            is_float = self.symbol_table.types[node.slot] == TYPE_FLOAT
+            if node.assignment_expr is None:
+                value = self.parameters.get(node.slot, 0)
+            else:
+                value = self.evaluate(node.assignment_expr)
+            values[node.slot] = float(value) if is_float else value
+        elif node_type is DoWhileNode:
+            self.run_loop(node)
+        else:
+            raise ExecutionError(f"Cannot execute {node!r}")
+
+    def run_loop(self, node):
+        while True:
+            self.execute(node.body)
+            if not self.evaluate(node.condition):
+                break
+
+    def evaluate(self, node):
+        node_type = type(node)
+        if node_type is IdentifierNode:
+            return self.values[node.slot]
+        if node_type is IntLiteralNode or node_type is FloatLiteralNode:
+            return node.value
+        left = self.evaluate(node.left)
+        right = self.evaluate(node.right)
+        return binary_op(node.operator_token, left, right)
+
+
+def binary_op(operator_token, left, right):
+    kind = operator_token.kind
+    if kind == TokenKind.PLUS:
+        return left + right
+    if kind == TokenKind.MINUS:
+        return left - right
+    if kind == TokenKind.MULTIPLY:
+        return left * right
+    if kind == TokenKind.DIVIDE:
+        if right == 0:
+            raise division_error(operator_token)
+        if type(left) is int and type(right) is int:
+            return int_div(left, right)
+        return left / right
+    if kind == TokenKind.LESS_THAN:
+        return int(left < right)
+    if kind == TokenKind.GREATER_THAN:
+        return int(left > right)
+    if kind == TokenKind.LESS_EQUAL:
+        return int(left <= right)
+    if kind == TokenKind.GREATER_EQUAL:
+        return int(left >= right)
+    if kind == TokenKind.EQUAL_EQUAL:
+        return int(left == right)
+    if kind == TokenKind.NOT_EQUAL:
+        return int(left != right)
+    raise ExecutionError(f"Unknown operator '{operator_token.lexeme}'")
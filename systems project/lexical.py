@@ -1,102 +1,459 @@
-import re
-
-class Token:
-    def __init__(self, type, lexeme, line, column):
-        self.type = type
-        self.lexeme = lexeme
-        self.line = line
-        self.column = column
-
-    def __repr__(self):
-        return f"Token({self.type}, '{self.lexeme}', Line {self.line}, Col {self.column})"
-
-class LexicalError(Exception):
-    pass
-
-class Lexer:
-    def __init__(self, source_code):
-        self.source_code = source_code
-        self.tokens = []
-        self.current_position = 0
-        self.token_specs = [
-            ('COMMENT',         r'//.*?(\r\n?|\n)|/\*[\s\S]*?\*/'),
-            ('WHITESPACE',      r'[ \t\n\r]+'),
-            ('FLOAT_KEYWORD',   r'\bfloat\b'),
-            ('INT_KEYWORD',     r'\bint\b'),
-            ('DO_KEYWORD',      r'\bdo\b'),
-            ('WHILE_KEYWORD',   r'\bwhile\b'),
-            ('IF_KEYWORD',      r'\bif\b'),
-            ('ELSE_KEYWORD',    r'\belse\b'),
-            ('FLOAT_LITERAL',   r'\d+\.\d+'),
-            ('INT_LITERAL',     r'\d+'),
-            ('IDENTIFIER',      r'[a-zA-Z_][a-zA-Z0-9_]*'),
-            ('PLUS',            r'\+'),
-            ('MINUS',           r'-'),
-            ('MULTIPLY',        r'\*'),
-            ('DIVIDE',          r'/'),
-            ('ASSIGN',          r'='),
-            ('SEMICOLON',       r';'),
-            ('LPAREN',          r'\('),
-            ('RPAREN',          r'\)'),
-            ('LBRACE',          r'\{'),
-            ('RBRACE',          r'\}'),
-            ('LESS_EQUAL',      r'<='), 
-            ('GREATER_EQUAL',   r'>=' ),
-            ('LESS_THAN',       r'<'),
-            ('GREATER_THAN',    r'>'),
-            ('EQUAL_EQUAL',     r'=='),
-            ('NOT_EQUAL',       r'!='), 
-            ('MISMATCH',        r'.')  # Catch-all for unexpected characters
-        ]
-        self.token_regex = re.compile('|'.join(f'(?P<{spec[0]}>{spec[1]})' for spec in self.token_specs))
-
-    def tokenize(self):
-        self.tokens = []
-        self.current_position = 0
-        line_num = 1
-        line_start = 0
-
-        while self.current_position < len(self.source_code):
-            match = self.token_regex.match(self.source_code, self.current_position)
-            if match:
-                token_type = match.lastgroup
-                lexeme = match.group(token_type)
-                column = self.current_position - line_start + 1
-
-                # Handling line number updates for whitespace and comments
-                if token_type == 'WHITESPACE' or token_type == 'COMMENT':
-                    temp_lexeme_for_newlines = lexeme.replace('\r\n', '\n').replace('\r', '\n')
-                    total_newlines = temp_lexeme_for_newlines.count('\n')
-
-                    if total_newlines > 0:
-                        line_num += total_newlines
-                        last_newline_in_lexeme_idx = -1
-                        idx_n = lexeme.rfind('\n')
-                        if idx_n > -1:
-                            last_newline_in_lexeme_idx = max(last_newline_in_lexeme_idx, idx_n)
-                        idx_r = lexeme.rfind('\r')
-                        if idx_r > -1:
-                            if idx_r + 1 < len(lexeme) and lexeme[idx_r+1] == '\n':
-                                pass
-                            else:
-                                last_newline_in_lexeme_idx = max(last_newline_in_lexeme_idx, idx_r)
-                        if last_newline_in_lexeme_idx != -1:
-                             line_start = self.current_position + last_newline_in_lexeme_idx + 1
-                # Handle MISMATCH for unrecognized characters
-                elif token_type == 'MISMATCH':
-                    raise LexicalError(f"Unexpected character: '{lexeme}' at line {line_num}, column {column}")
-                else:
-                    # Add recognized token to the list
-                    self.tokens.append(Token(token_type, lexeme, line_num, column))
-
-                # Update the current position in the source code
-                self.current_position = match.end()
-            else:
-                # If no match is found, throw a lexical error
-                raise LexicalError(f"Unexpected character at position {self.current_position} (source index) on line {line_num}, near column {self.current_position - line_start + 1}")
-
-        # Add EOF token at the end
-        eof_column = self.current_position - line_start + 1
-        self.tokens.append(Token('EOF', 'EOF', line_num, eof_column))
-
-        return self.tokens
+import io
+import mmap
+import os
+import re
+import sys
+from array import array
+from functools import lru_cache
+
+# Token kinds are small integers so that token streams can be stored in typed
+# arrays and compared without string comparisons. TOKEN_TYPES maps a kind back
+# to the type name used in Token.type and in the lexer's regex groups.
+TOKEN_TYPES = (
+    'EOF', 'FLOAT_KEYWORD', 'INT_KEYWORD', 'DO_KEYWORD', 'WHILE_KEYWORD', 'IF_KEYWORD',
+    'ELSE_KEYWORD', 'FLOAT_LITERAL', 'INT_LITERAL', 'IDENTIFIER', 'PLUS', 'MINUS',
+    'MULTIPLY', 'DIVIDE', 'ASSIGN', 'SEMICOLON', 'LPAREN', 'RPAREN', 'LBRACE', 'RBRACE',
+    'LESS_EQUAL', 'GREATER_EQUAL', 'LESS_THAN', 'GREATER_THAN', 'EQUAL_EQUAL', 'NOT_EQUAL',
+)
+TOKEN_KINDS = {name: kind for kind, name in enumerate(TOKEN_TYPES)}
+
+class TokenKind:
+    EOF = TOKEN_KINDS['EOF']
+    FLOAT_KEYWORD = TOKEN_KINDS['FLOAT_KEYWORD']
+    INT_KEYWORD = TOKEN_KINDS['INT_KEYWORD']
+    DO_KEYWORD = TOKEN_KINDS['DO_KEYWORD']
+    WHILE_KEYWORD = TOKEN_KINDS['WHILE_KEYWORD']
+    IF_KEYWORD = TOKEN_KINDS['IF_KEYWORD']
+    ELSE_KEYWORD = TOKEN_KINDS['ELSE_KEYWORD']
+    FLOAT_LITERAL = TOKEN_KINDS['FLOAT_LITERAL']
+    INT_LITERAL = TOKEN_KINDS['INT_LITERAL']
+    IDENTIFIER = TOKEN_KINDS['IDENTIFIER']
+    PLUS = TOKEN_KINDS['PLUS']
+    MINUS = TOKEN_KINDS['MINUS']
+    MULTIPLY = TOKEN_KINDS['MULTIPLY']
+    DIVIDE = TOKEN_KINDS['DIVIDE']
+    ASSIGN = TOKEN_KINDS['ASSIGN']
+    SEMICOLON = TOKEN_KINDS['SEMICOLON']
+    LPAREN = TOKEN_KINDS['LPAREN']
+    RPAREN = TOKEN_KINDS['RPAREN']
+    LBRACE = TOKEN_KINDS['LBRACE']
+    RBRACE = TOKEN_KINDS['RBRACE']
+    LESS_EQUAL = TOKEN_KINDS['LESS_EQUAL']
+    GREATER_EQUAL = TOKEN_KINDS['GREATER_EQUAL']
+    LESS_THAN = TOKEN_KINDS['LESS_THAN']
+    GREATER_THAN = TOKEN_KINDS['GREATER_THAN']
+    EQUAL_EQUAL = TOKEN_KINDS['EQUAL_EQUAL']
+    NOT_EQUAL = TOKEN_KINDS['NOT_EQUAL']
+
+class Token:
+    __slots__ = ('kind', 'lexeme', 'line', 'column')
+
+    def __init__(self, type, lexeme, line, column):
+        # Accepts either a type name or an integer kind. Trivia such as
+        # 'COMMENT' never becomes a token, so it has no kind and is rejected.
+        kind = TOKEN_KINDS.get(type, type)
+        if kind.__class__ is not int or not 0 <= kind < len(TOKEN_TYPES):
+            raise ValueError(f"Unknown token kind {type!r}")
+        self.kind = kind
+        self.lexeme = lexeme
+        self.line = line
+        self.column = column
+
+    @property
+    def type(self):
+        return TOKEN_TYPES[self.kind]
+
+    def __repr__(self):
+        return f"Token({self.type}, '{self.lexeme}', Line {self.line}, Col {self.column})"
+
+class TokenBuffer:
+    """Token stream stored as parallel typed arrays (kind, start and end offset,
+    line, column). Lexemes are sliced out of the source only when asked for, and
+    indexing or iterating yields lightweight Token views."""
+
+    __slots__ = ('source', 'kinds', 'starts', 'ends', 'lines', 'columns')
+
+    def __init__(self, source):
+        self.source = source
+        self.kinds = array('B')
+        self.starts = array('q')
+        self.ends = array('q')
+        self.lines = array('l')
+        self.columns = array('l')
+
+    def append(self, kind, start, end, line, column):
+        self.kinds.append(kind)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.lines.append(line)
+        self.columns.append(column)
+
+    def extend_columns(self, kinds, starts, ends, lines, columns):
+        self.kinds.extend(kinds)
+        self.starts.extend(starts)
+        self.ends.extend(ends)
+        self.lines.extend(lines)
+        self.columns.extend(columns)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def lexeme(self, index):
+        if self.kinds[index] == TokenKind.EOF:
+            return 'EOF'
+        lexeme = self.source[self.starts[index]:self.ends[index]]
+        if not isinstance(lexeme, str):
+            lexeme = bytes(lexeme).decode('utf-8')
+        return lexeme
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.kinds)
+        return Token(self.kinds[index], self.lexeme(index), self.lines[index], self.columns[index])
+
+    def __iter__(self):
+        for index in range(len(self.kinds)):
+            yield self[index]
+
+class LexicalError(Exception):
+    pass
+
+# Patterns for the fast scanner. Identifiers are matched once and keywords are
+# classified with a dict lookup. Trivia (comments and whitespace) is folded into
+# the front of every match, so it is skipped inside the regex engine without any
+# line bookkeeping; line and column numbers come from a precomputed index of
+# line starts instead. The token part is optional, so trailing trivia at the end
+# of the source produces one final match with no token group.
+FAST_TOKEN_PATTERN = (
+    r'(?://.*?(?:\r\n?|\n)|/\*[\s\S]*?\*/|[ \t\n\r]+)*'
+    r'(?:([a-zA-Z_][a-zA-Z0-9_]*)'
+    r'|(\d+\.\d+)'
+    r'|(\d+)'
+    r'|(<=|>=|!=|[-+*/=;(){}<>])'
+    r'|(.))?'
+)
+FAST_TOKEN_REGEX = re.compile(FAST_TOKEN_PATTERN)
+FAST_BYTES_TOKEN_REGEX = re.compile(FAST_TOKEN_PATTERN.encode('ascii'))
+NEWLINE_REGEX = re.compile(r'\r\n|\r|\n')
+BYTES_NEWLINE_REGEX = re.compile(rb'\r\n|\r|\n')
+
+KEYWORDS = {
+    'float': TokenKind.FLOAT_KEYWORD,
+    'int': TokenKind.INT_KEYWORD,
+    'do': TokenKind.DO_KEYWORD,
+    'while': TokenKind.WHILE_KEYWORD,
+    'if': TokenKind.IF_KEYWORD,
+    'else': TokenKind.ELSE_KEYWORD,
+}
+# '==' is deliberately absent: the regex lexer tries ASSIGN first, so '=='
+# has always lexed as two ASSIGN tokens.
+PUNCTUATION = {
+    '+': TokenKind.PLUS, '-': TokenKind.MINUS, '*': TokenKind.MULTIPLY,
+    '/': TokenKind.DIVIDE, '=': TokenKind.ASSIGN, ';': TokenKind.SEMICOLON,
+    '(': TokenKind.LPAREN, ')': TokenKind.RPAREN, '{': TokenKind.LBRACE,
+    '}': TokenKind.RBRACE, '<=': TokenKind.LESS_EQUAL, '>=': TokenKind.GREATER_EQUAL,
+    '<': TokenKind.LESS_THAN, '>': TokenKind.GREATER_THAN, '!=': TokenKind.NOT_EQUAL,
+}
+BYTES_KEYWORDS = {name.encode('ascii'): kind for name, kind in KEYWORDS.items()}
+KEYWORD_KINDS = frozenset(KEYWORDS.values())
+UNDERSCORES = ('_', b'_')
+BYTES_PUNCTUATION = {text.encode('ascii'): kind for text, kind in PUNCTUATION.items()}
+
+def line_start_index(source):
+    """Returns the offsets at which each line after the first starts."""
+    newline_regex = NEWLINE_REGEX if isinstance(source, str) else BYTES_NEWLINE_REGEX
+    return array('q', [match.end() for match in newline_regex.finditer(source)])
+
+# Columns count characters. In a bytes source the UTF-8 continuation bytes
+# between a line start and a token take no column of their own.
+CONTINUATION_BYTES_REGEX = re.compile(rb'[\x80-\xbf]+')
+
+def has_continuation_bytes(source):
+    return not isinstance(source, str) and CONTINUATION_BYTES_REGEX.search(source) is not None
+
+def continuation_bytes(source, start, end):
+    return sum(map(len, CONTINUATION_BYTES_REGEX.findall(source, start, end)))
+
+def mismatch_lexeme(source, start, lexeme):
+    # A bytes source matches one byte; the whole UTF-8 character is reported.
+    if isinstance(lexeme, str):
+        return lexeme
+    return bytes(source[start:start + 4]).decode('utf-8', 'replace')[0]
+
+def decoded_neighbours(source, start, end):
+    """The characters either side of source[start:end] in UTF-8 bytes."""
+    before = bytes(source[max(0, start - 4):start]).decode('utf-8', 'replace')[-1:]
+    after = bytes(source[end:end + 4]).decode('utf-8', 'replace')[:1]
+    return before, after
+
+@lru_cache(maxsize=None)
+def multibyte_regexes():
+    """Bytes versions of FAST_TOKEN_PATTERN and TOKEN_REGEX for sources with
+    non-ASCII characters. \\d also matches the UTF-8 encoding of every Unicode
+    decimal digit, as it does in the str patterns."""
+    endings = {}
+    for code in range(0x80, sys.maxunicode + 1):
+        character = chr(code)
+        if character.isdecimal():
+            encoded = character.encode('utf-8')
+            endings.setdefault(encoded[:-1], []).append(encoded[-1:])
+    leads = b''.join(sorted({re.escape(prefix[:1]) for prefix in endings}))
+    branches = b'|'.join(re.escape(prefix) + b'[' + b''.join(map(re.escape, last)) + b']'
+                         for prefix, last in endings.items())
+    digit = b'(?:[0-9]|(?=[' + leads + b'])(?:' + branches + b'))'
+    return (re.compile(FAST_TOKEN_PATTERN.encode('ascii').replace(rb'\d', digit)),
+            re.compile(TOKEN_REGEX.pattern.encode('ascii').replace(rb'\d', digit)))
+
+# Token patterns of the regex (reference) scanner, compiled once per process
+# rather than by every Lexer.
+TOKEN_SPECS = [
+    ('COMMENT',         r'//.*?(\r\n?|\n)|/\*[\s\S]*?\*/'),
+    ('WHITESPACE',      r'[ \t\n\r]+'),
+    ('FLOAT_KEYWORD',   r'\bfloat\b'),
+    ('INT_KEYWORD',     r'\bint\b'),
+    ('DO_KEYWORD',      r'\bdo\b'),
+    ('WHILE_KEYWORD',   r'\bwhile\b'),
+    ('IF_KEYWORD',      r'\bif\b'),
+    ('ELSE_KEYWORD',    r'\belse\b'),
+    ('FLOAT_LITERAL',   r'\d+\.\d+'),
+    ('INT_LITERAL',     r'\d+'),
+    ('IDENTIFIER',      r'[a-zA-Z_][a-zA-Z0-9_]*'),
+    ('PLUS',            r'\+'),
+    ('MINUS',           r'-'),
+    ('MULTIPLY',        r'\*'),
+    ('DIVIDE',          r'/'),
+    ('ASSIGN',          r'='),
+    ('SEMICOLON',       r';'),
+    ('LPAREN',          r'\('),
+    ('RPAREN',          r'\)'),
+    ('LBRACE',          r'\{'),
+    ('RBRACE',          r'\}'),
+    ('LESS_EQUAL',      r'<='), 
+    ('GREATER_EQUAL',   r'>=' ),
+    ('LESS_THAN',       r'<'),
+    ('GREATER_THAN',    r'>'),
+    ('EQUAL_EQUAL',     r'=='),
+    ('NOT_EQUAL',       r'!='), 
+    ('MISMATCH',        r'.')  # Catch-all for unexpected characters
+]
+TOKEN_REGEX = re.compile('|'.join(f'(?P<{spec[0]}>{spec[1]})' for spec in TOKEN_SPECS))
+BYTES_TOKEN_REGEX = re.compile(TOKEN_REGEX.pattern.encode('ascii'))
+
+class Lexer:
+    def __init__(self, source_code, mode='fast', first_line=1):
+        # mode='fast' uses the keyword-table scanner; mode='regex' runs the
+        # original master regex and is kept as the reference implementation.
+        # first_line numbers the first line of source_code, for lexing a slice
+        # of a larger file.
+        if mode not in ('fast', 'regex'):
+            raise ValueError(f"Unknown lexer mode: {mode!r}")
+        self.source_code = source_code
+        self.mode = mode
+        self.first_line = first_line
+        self.tokens = []
+        self.current_position = 0
+        self.token_specs = TOKEN_SPECS
+        self.token_regex = TOKEN_REGEX
+
+    @classmethod
+    def from_file(cls, file):
+        # Map the file into memory when it has a real descriptor so the source is
+        # paged in as the lexer walks it instead of being read up front.
+        try:
+            fileno = file.fileno()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            return cls(file.read())
+        if os.fstat(fileno).st_size == 0:
+            return cls('')
+        return cls(mmap.mmap(fileno, 0, access=mmap.ACCESS_READ))
+
+    def tokenize(self):
+        self.tokens = list(self.iter_tokens())
+        return self.tokens
+
+    def tokenize_buffer(self):
+        buffer = TokenBuffer(self.source_code)
+        # Tokens are staged in plain lists and moved into the typed columns in
+        # batches, which is much cheaper than five array appends per token.
+        columns = ([], [], [], [], [])
+        kinds, starts, ends, lines, cols = columns
+        for kind, start, end, line, column in self._scan():
+            kinds.append(kind)
+            starts.append(start)
+            ends.append(end)
+            lines.append(line)
+            cols.append(column)
+            if len(kinds) == 65536:
+                buffer.extend_columns(*columns)
+                for column_list in columns:
+                    column_list.clear()
+        buffer.extend_columns(*columns)
+        return buffer
+
+    def iter_tokens(self):
+        source = self.source_code
+        decode = None if isinstance(source, str) else bytes.decode
+        for kind, start, end, line, column in self._scan():
+            if kind == TokenKind.EOF:
+                lexeme = 'EOF'
+            else:
+                lexeme = source[start:end]
+                if decode:
+                    lexeme = decode(lexeme, 'utf-8')
+            yield Token(kind, lexeme, line, column)
+
+    def _scan(self):
+        # Yields (kind, start, end, line, column) for every significant token,
+        # followed by the EOF token.
+        if self.mode == 'fast':
+            return self._scan_fast()
+        return self._scan_regex()
+
+    def _scan_fast(self):
+        source = self.source_code
+        multibyte = has_continuation_bytes(source)
+        if isinstance(source, str):
+            token_regex, keywords, punctuation = FAST_TOKEN_REGEX, KEYWORDS, PUNCTUATION
+        else:
+            token_regex = multibyte_regexes()[0] if multibyte else FAST_BYTES_TOKEN_REGEX
+            keywords, punctuation = BYTES_KEYWORDS, BYTES_PUNCTUATION
+        identifier_kind = TokenKind.IDENTIFIER
+        float_kind = TokenKind.FLOAT_LITERAL
+        int_kind = TokenKind.INT_LITERAL
+
+        line_starts = line_start_index(source)
+        line_count = len(line_starts)
+        line_num = self.first_line
+        line_start = 0
+        line_index = 0
+        next_line_start = line_starts[0] if line_count else len(source) + 1
+        # Continuation bytes from line_start up to counted.
+        skipped = counted = 0
+
+        for match in token_regex.finditer(source):
+            group = match.lastindex
+            if group is None:
+                continue
+            start, end = match.span(group)
+            while start >= next_line_start:
+                line_start = counted = next_line_start
+                skipped = 0
+                line_num += 1
+                line_index += 1
+                next_line_start = line_starts[line_index] if line_index < line_count else len(source) + 1
+            if multibyte:
+                skipped += continuation_bytes(source, counted, start)
+                counted = start
+
+            if group == 1:
+                kind = keywords.get(match.group(1), identifier_kind)
+                if kind != identifier_kind:
+                    # The regex lexer matched keywords with \b on both sides, so a
+                    # keyword glued to a preceding number or a following Unicode
+                    # letter or digit stays an identifier.
+                    if multibyte:
+                        before, after = decoded_neighbours(source, start, end)
+                    else:
+                        before, after = source[start - 1:start], source[end:end + 1]
+                    if before.isalnum() or before in UNDERSCORES or after.isalnum() or after in UNDERSCORES:
+                        kind = identifier_kind
+            elif group == 4:
+                kind = punctuation[match.group(4)]
+            elif group == 2:
+                kind = float_kind
+            elif group == 3:
+                kind = int_kind
+            else:
+                lexeme = mismatch_lexeme(source, start, match.group(5))
+                self.current_position = start
+                raise LexicalError(f"Unexpected character: '{lexeme}' at line {line_num}, "
+                                   f"column {start - line_start - skipped + 1}")
+            yield kind, start, end, line_num, start - line_start - skipped + 1
+
+        end = len(source)
+        while end >= next_line_start:
+            line_start = counted = next_line_start
+            skipped = 0
+            line_num += 1
+            line_index += 1
+            next_line_start = line_starts[line_index] if line_index < line_count else end + 1
+        if multibyte:
+            skipped += continuation_bytes(source, counted, end)
+        self.current_position = end
+        yield TokenKind.EOF, end, end, line_num, end - line_start - skipped + 1
+
+    def _scan_regex(self):
+        source = self.source_code
+        if isinstance(source, str):
+            token_regex = self.token_regex
+            crlf, cr, lf = '\r\n', '\r', '\n'
+        else:
+            # bytes, bytearray and mmap sources are matched without decoding them
+            # as a whole; only the lexemes of emitted tokens are turned into str.
+            token_regex = multibyte_regexes()[1] if has_continuation_bytes(source) else BYTES_TOKEN_REGEX
+            crlf, cr, lf = b'\r\n', b'\r', b'\n'
+
+        self.current_position = 0
+        source_length = len(source)
+        line_num = self.first_line
+        line_start = 0
+        multibyte = has_continuation_bytes(source)
+        skipped = counted = 0
+
+        while self.current_position < source_length:
+            match = token_regex.match(source, self.current_position)
+            if match:
+                token_type = match.lastgroup
+                lexeme = match.group(token_type)
+                if multibyte:
+                    if counted < line_start:
+                        skipped, counted = 0, line_start
+                    skipped += continuation_bytes(source, counted, self.current_position)
+                    counted = self.current_position
+                column = self.current_position - line_start - skipped + 1
+
+                # Handling line number updates for whitespace and comments
+                if token_type == 'WHITESPACE' or token_type == 'COMMENT':
+                    temp_lexeme_for_newlines = lexeme.replace(crlf, lf).replace(cr, lf)
+                    total_newlines = temp_lexeme_for_newlines.count(lf)
+
+                    if total_newlines > 0:
+                        line_num += total_newlines
+                        last_newline_in_lexeme_idx = -1
+                        idx_n = lexeme.rfind(lf)
+                        if idx_n > -1:
+                            last_newline_in_lexeme_idx = max(last_newline_in_lexeme_idx, idx_n)
+                        idx_r = lexeme.rfind(cr)
+                        if idx_r > -1:
+                            if idx_r + 1 < len(lexeme) and lexeme[idx_r+1:idx_r+2] == lf:
+                                pass
+                            else:
+                                last_newline_in_lexeme_idx = max(last_newline_in_lexeme_idx, idx_r)
+                        if last_newline_in_lexeme_idx != -1:
+                             line_start = self.current_position + last_newline_in_lexeme_idx + 1
+                # Handle MISMATCH for unrecognized characters
+                elif token_type == 'MISMATCH':
+                    lexeme = mismatch_lexeme(source, self.current_position, lexeme)
+                    raise LexicalError(f"Unexpected character: '{lexeme}' at line {line_num}, column {column}")
+                else:
+                    kind = TOKEN_KINDS[token_type]
+                    if multibyte and kind in KEYWORD_KINDS:
+                        # \b in a bytes pattern only sees ASCII word characters.
+                        before, after = decoded_neighbours(source, self.current_position, match.end())
+                        if before.isalnum() or before == '_' or after.isalnum() or after == '_':
+                            kind = TokenKind.IDENTIFIER
+                    yield kind, self.current_position, match.end(), line_num, column
+
+                # Update the current position in the source code
+                self.current_position = match.end()
+            else:
+                # If no match is found, throw a lexical error
+                raise LexicalError(f"Unexpected character at position {self.current_position} (source index) on line {line_num}, near column {self.current_position - line_start + 1}")
+
+        # Add EOF token at the end
+        if multibyte:
+            if counted < line_start:
+                skipped, counted = 0, line_start
+            skipped += continuation_bytes(source, counted, self.current_position)
+        eof_column = self.current_position - line_start - skipped + 1
+        yield TokenKind.EOF, self.current_position, self.current_position, line_num, eof_column
@@ -0,0 +1,486 @@
+# optimizer.py
+
+import time
+
+from lexical import Token, TokenKind
+from ast_nodes import (
+    StatementListNode, AssignmentNode, DeclarationNode, DoWhileNode, BinaryOpNode,
+    IntLiteralNode, FloatLiteralNode, IdentifierNode, literal_node
+)
+from symbol_table import TYPE_INT, TYPE_FLOAT
+from tree_walker import TreeWalker, iter_preorder
+from interpreter import binary_op
+
+# Passes run on the analyzed AST, after semantic analysis has resolved every
+# variable to a slot, and keep it a valid input for every backend. None of them
+# moves or removes a division that might fail at run time, so a program that
+# raises ExecutionError still raises it, at the same location.
+
+COMPARISON_KINDS = frozenset((
+    TokenKind.LESS_THAN, TokenKind.GREATER_THAN, TokenKind.LESS_EQUAL,
+    TokenKind.GREATER_EQUAL, TokenKind.EQUAL_EQUAL, TokenKind.NOT_EQUAL,
+))
+LITERAL_TYPES = (IntLiteralNode, FloatLiteralNode)
+STORE_TYPES = (DeclarationNode, AssignmentNode)
+
+
+def result_type(kind, left_type, right_type):
+    if kind in COMPARISON_KINDS:
+        return TYPE_INT
+    return TYPE_INT if left_type == TYPE_INT and right_type == TYPE_INT else TYPE_FLOAT
+
+
+def is_literal(node, value=None):
+    if type(node) not in LITERAL_TYPES:
+        return False
+    return value is None or node.value == value
+
+
+def may_fail(expression):
+    """True if evaluating the expression can raise (a division by anything
+    other than a non-zero literal)."""
+    for node, _ in iter_preorder(expression):
+        if (type(node) is BinaryOpNode and node.operator_token.kind == TokenKind.DIVIDE
+                and not (is_literal(node.right) and node.right.value != 0)):
+            return True
+    return False
+
+
+def count_nodes(root):
+    return sum(1 for _ in iter_preorder(root))
+
+
+class LoopSummary(TreeWalker):
+    """Slots read and written anywhere inside each do-while, nested loops
+    included, keyed by the DoWhileNode."""
+
+    def __init__(self):
+        self.reads = {}
+        self.writes = {}
+        self.open_loops = []
+
+    def summarize(self, program):
+        self.walk(program)
+        return self.reads, self.writes
+
+    def enter_DoWhileNode(self, node):
+        self.open_loops.append((set(), set()))
+
+    def leave_DoWhileNode(self, node, child_results):
+        reads, writes = self.open_loops.pop()
+        self.reads[node] = reads
+        self.writes[node] = writes
+        if self.open_loops:
+            self.open_loops[-1][0].update(reads)
+            self.open_loops[-1][1].update(writes)
+
+    def leave_DeclarationNode(self, node, child_results):
+        if self.open_loops:
+            self.open_loops[-1][1].add(node.slot)
+
+    leave_AssignmentNode = leave_DeclarationNode
+
+    def leave_IdentifierNode(self, node, child_results):
+        if self.open_loops:
+            self.open_loops[-1][0].add(node.slot)
+
+
+def loop_writes(program):
+    """Slots written inside each do-while, nested loops included. Only
+    statements can write, so expressions are never visited."""
+    writes = {}
+    loops = []
+    lists = [(program, None)]
+    while lists:
+        list_node, loop = lists.pop()
+        for statement in list_node.children:
+            statement_type = type(statement)
+            if statement_type is DoWhileNode:
+                writes[statement] = set()
+                loops.append((statement, loop))
+                lists.append((statement.body, statement))
+            elif statement_type is StatementListNode:
+                lists.append((statement, loop))
+            elif loop is not None:
+                writes[loop].add(statement.slot)
+    # Inner loops were found after their parents.
+    for loop, parent in reversed(loops):
+        if parent is not None:
+            writes[parent].update(writes[loop])
+    return writes
+
+
+class RewritePass(TreeWalker):
+    """Base for passes that rebuild the tree bottom-up. Expression hooks return
+    (node, type_code) so a parent can replace a child; statement hooks return
+    the statement to keep."""
+
+    name = 'rewrite'
+
+    def __init__(self, symbol_table):
+        self.symbol_table = symbol_table
+
+    def run(self, program):
+        self.walk(program)
+
+    def leave_ProgramNode(self, node, child_results):
+        node.children = [statement for statement in child_results if statement is not None]
+        return node
+
+    leave_StatementListNode = leave_ProgramNode
+
+    def leave_DeclarationNode(self, node, child_results):
+        if child_results:
+            node.assignment_expr = child_results[0][0]
+        return node
+
+    def leave_AssignmentNode(self, node, child_results):
+        node.assignment_expr = child_results[0][0]
+        return node
+
+    def leave_DoWhileNode(self, node, child_results):
+        node.body = child_results[0]
+        node.condition = child_results[1][0]
+        return node
+
+    def leave_BinaryOpNode(self, node, child_results):
+        (node.left, left_type), (node.right, right_type) = child_results
+        return self.binary(node, left_type, right_type)
+
+    def binary(self, node, left_type, right_type):
+        return node, result_type(node.operator_token.kind, left_type, right_type)
+
+    def leave_IntLiteralNode(self, node, child_results):
+        return node, TYPE_INT
+
+    def leave_FloatLiteralNode(self, node, child_results):
+        return node, TYPE_FLOAT
+
+    def leave_IdentifierNode(self, node, child_results):
+        return node, self.symbol_table.types[node.slot]
+
+
+class ConstantFolding(RewritePass):
+    """Evaluates operations on two literals at compile time. A division by a
+    zero literal is left for run time, where it reports its error."""
+
+    name = 'constant folding'
+
+    def binary(self, node, left_type, right_type):
+        left, right, operator = node.left, node.right, node.operator_token
+        if is_literal(left) and is_literal(right):
+            if not (operator.kind == TokenKind.DIVIDE and right.value == 0):
+                value = binary_op(operator, left.value, right.value)
+                return literal_node(value, operator.line, operator.column), result_type(operator.kind, left_type, right_type)
+        return node, result_type(operator.kind, left_type, right_type)
+
+
+class ConstantPropagation(ConstantFolding):
+    """Replaces reads of variables whose value is a known constant, then folds.
+
+    Statements run in order except for do-while bodies, so a forward walk
+    tracks known values; entering a loop forgets every slot the loop writes
+    (the back edge may change it), and the state at the end of the body is
+    the state after the loop because the condition has no side effects."""
+
+    name = 'constant propagation'
+
+    def run(self, program):
+        self.known = {}
+        self.loop_writes = loop_writes(program)
+        self.walk(program)
+
+    def enter_DoWhileNode(self, node):
+        known = self.known
+        for slot in self.loop_writes[node]:
+            known.pop(slot, None)
+
+    def record_store(self, slot, expression):
+        if is_literal(expression):
+            value = expression.value
+            self.known[slot] = float(value) if self.symbol_table.types[slot] == TYPE_FLOAT else value
+        else:
+            self.known.pop(slot, None)
+
+    def leave_DeclarationNode(self, node, child_results):
+        super().leave_DeclarationNode(node, child_results)
+        if node.assignment_expr is None:
+            self.known[node.slot] = 0.0 if self.symbol_table.types[node.slot] == TYPE_FLOAT else 0
+        else:
+            self.record_store(node.slot, node.assignment_expr)
+        return node
+
+    def leave_AssignmentNode(self, node, child_results):
+        super().leave_AssignmentNode(node, child_results)
+        self.record_store(node.slot, node.assignment_expr)
+        return node
+
+    def leave_IdentifierNode(self, node, child_results):
+        value_type = self.symbol_table.types[node.slot]
+        value = self.known.get(node.slot)
+        if value is None:
+            return node, value_type
+        return literal_node(value, node.token.line, node.token.column), value_type
+
+
+class StrengthReduction(RewritePass):
+    """Algebraic identities that keep the expression's type and exact value:
+    x*1, 1*x, x/1, x+0, 0+x, x-0 become x, int x*0 becomes 0, and a variable
+    times 2 becomes an addition. `x + 0` is left alone for float x, since it
+    turns -0.0 into 0.0."""
+
+    name = 'strength reduction'
+
+    def binary(self, node, left_type, right_type):
+        kind = node.operator_token.kind
+        node_type = result_type(kind, left_type, right_type)
+        left, right = node.left, node.right
+        if kind == TokenKind.MULTIPLY:
+            if is_literal(right, 1) and left_type == node_type:
+                return left, node_type
+            if is_literal(left, 1) and right_type == node_type:
+                return right, node_type
+            if node_type == TYPE_INT:
+                if is_literal(right, 0) and not may_fail(left):
+                    return right, node_type
+                if is_literal(left, 0) and not may_fail(right):
+                    return left, node_type
+            if is_literal(right, 2) and type(left) is IdentifierNode and left_type == node_type:
+                return self.doubled(node, left), node_type
+            if is_literal(left, 2) and type(right) is IdentifierNode and right_type == node_type:
+                return self.doubled(node, right), node_type
+        elif kind == TokenKind.DIVIDE:
+            if is_literal(right, 1) and left_type == node_type:
+                return left, node_type
+        elif kind == TokenKind.PLUS and node_type == TYPE_INT:
+            if is_literal(right, 0):
+                return left, node_type
+            if is_literal(left, 0):
+                return right, node_type
+        elif kind == TokenKind.MINUS:
+            if is_literal(right, 0) and left_type == node_type:
+                return left, node_type
+        return node, node_type
+
+    def doubled(self, node, identifier):
+        operator = node.operator_token
+        copy = IdentifierNode(identifier.token)
+        copy.slot = identifier.slot
+        return BinaryOpNode(identifier, Token(TokenKind.PLUS, '+', operator.line, operator.column), copy)
+
+
+class DeadStoreElimination:
+    """Removes assignments whose value is overwritten before it is read.
+
+    Liveness is computed backwards over each statement list. Every program
+    variable is live at the end (it is part of the result). At the end of a
+    loop body the live set is what is live after the loop plus everything
+    the loop reads, a safe over-approximation of the back edge that needs
+    no fixed-point iteration. A dead declaration keeps its zero
+    initialisation but loses its initializer; stores whose expression may
+    fail are always kept."""
+
+    name = 'dead-store elimination'
+
+    def __init__(self, symbol_table):
+        self.symbol_table = symbol_table
+
+    def run(self, program):
+        loop_reads, _ = LoopSummary().summarize(program)
+        temporaries = set(self.symbol_table.temporaries)
+        live = {slot for slot in range(len(self.symbol_table)) if slot not in temporaries}
+        # Frames are [statement list node, index of the next statement to
+        # visit (walking backwards), kept statements in reverse order].
+        stack = [[program, len(program.children) - 1, []]]
+        while stack:
+            frame = stack[-1]
+            list_node, index, kept = frame
+            if index < 0:
+                kept.reverse()
+                list_node.children = kept
+                stack.pop()
+                continue
+            statement = list_node.children[index]
+            frame[1] = index - 1
+            statement_type = type(statement)
+            if statement_type is DoWhileNode:
+                kept.append(statement)
+                live |= loop_reads[statement]
+                body = statement.body
+                stack.append([body, len(body.children) - 1, []])
+                continue
+            if statement_type is StatementListNode:
+                kept.append(statement)
+                stack.append([statement, len(statement.children) - 1, []])
+                continue
+            expression = statement.assignment_expr
+            if statement.slot not in live and (expression is None or not may_fail(expression)):
+                if statement_type is AssignmentNode:
+                    continue
+                statement.assignment_expr = None
+                kept.append(statement)
+                continue
+            kept.append(statement)
+            live.discard(statement.slot)
+            if expression is not None:
+                live.update(node.slot for node, _ in iter_preorder(expression) if type(node) is IdentifierNode)
+
+
+class LoopInvariantHoister(TreeWalker):
+    """Finds the largest subexpressions of one expression that only read
+    slots the loop never writes, and replaces each with a temporary. Leave
+    hooks return (node, type_code, invariant)."""
+
+    def __init__(self, symbol_table, loop_writes, hoisted):
+        self.symbol_table = symbol_table
+        self.loop_writes = loop_writes
+        self.hoisted = hoisted
+
+    def hoist(self, expression):
+        return self.extract(*self.walk(expression))
+
+    def extract(self, node, value_type, invariant):
+        if not invariant or type(node) is not BinaryOpNode:
+            return node
+        slot = self.symbol_table.declare_temporary(value_type)
+        operator = node.operator_token
+        name = self.symbol_table.names[slot]
+        assignment = AssignmentNode(Token(TokenKind.IDENTIFIER, name, operator.line, operator.column), node)
+        assignment.slot = slot
+        self.hoisted.append(assignment)
+        identifier = IdentifierNode(Token(TokenKind.IDENTIFIER, name, operator.line, operator.column))
+        identifier.slot = slot
+        return identifier
+
+    def leave_BinaryOpNode(self, node, child_results):
+        (left, left_type, left_invariant), (right, right_type, right_invariant) = child_results
+        kind = node.operator_token.kind
+        invariant = left_invariant and right_invariant and not (
+            kind == TokenKind.DIVIDE and not (is_literal(right) and right.value != 0))
+        if invariant:
+            node.left, node.right = left, right
+        else:
+            node.left = self.extract(left, left_type, left_invariant)
+            node.right = self.extract(right, right_type, right_invariant)
+        return node, result_type(kind, left_type, right_type), invariant
+
+    def leave_IntLiteralNode(self, node, child_results):
+        return node, TYPE_INT, True
+
+    def leave_FloatLiteralNode(self, node, child_results):
+        return node, TYPE_FLOAT, True
+
+    def leave_IdentifierNode(self, node, child_results):
+        return node, self.symbol_table.types[node.slot], node.slot not in self.loop_writes
+
+
+class LoopInvariantCodeMotion:
+    """Moves loop-invariant computations in front of their do-while, into
+    temporaries. A do-while body always runs at least once, so the hoisted
+    expressions are evaluated exactly when the original program would first
+    have evaluated them, only not again. Loops are handled innermost first
+    and each looks only at its own statements and condition; whatever an
+    inner loop hoisted becomes an ordinary statement of the enclosing body,
+    so it can move further out in turn."""
+
+    name = 'loop-invariant code motion'
+
+    def __init__(self, symbol_table):
+        self.symbol_table = symbol_table
+
+    def run(self, program):
+        writes_by_loop = loop_writes(program)
+        loops = []
+        lists = [program]
+        while lists:
+            list_node = lists.pop()
+            for statement in list_node.children:
+                if type(statement) is DoWhileNode:
+                    loops.append((statement, list_node))
+                    lists.append(statement.body)
+                elif type(statement) is StatementListNode:
+                    lists.append(statement)
+        # Hoisted statements per statement list, keyed by the loop they go before.
+        pending = {}
+        for loop, parent in reversed(loops):
+            self.insert_pending(loop.body, pending)
+            writes = writes_by_loop[loop]
+            hoisted = []
+            hoister = LoopInvariantHoister(self.symbol_table, writes, hoisted)
+            for statement in loop.body.children:
+                if type(statement) in STORE_TYPES and statement.assignment_expr is not None:
+                    statement.assignment_expr = hoister.hoist(statement.assignment_expr)
+            loop.condition = hoister.hoist(loop.condition)
+            if hoisted:
+                pending.setdefault(parent, {})[loop] = hoisted
+        # Lists that are not loop bodies (the top level) are left.
+        for list_node in list(pending):
+            self.insert_pending(list_node, pending)
+
+    def insert_pending(self, list_node, pending):
+        inserts = pending.pop(list_node, None)
+        if not inserts:
+            return
+        statements = []
+        for statement in list_node.children:
+            statements.extend(inserts.get(statement, ()))
+            statements.append(statement)
+        list_node.children = statements
+
+
+OPTIMIZATION_LEVELS = {
+    0: (),
+    1: (ConstantFolding, StrengthReduction),
+    2: (ConstantPropagation, StrengthReduction, LoopInvariantCodeMotion, DeadStoreElimination),
+}
+
+
+class PassResult:
+    __slots__ = ('name', 'seconds', 'nodes_before', 'nodes_after')
+
+    def __init__(self, name, seconds, nodes_before, nodes_after):
+        self.name = name
+        self.seconds = seconds
+        self.nodes_before = nodes_before
+        self.nodes_after = nodes_after
+
+    @property
+    def removed(self):
+        return self.nodes_before - self.nodes_after
+
+    def __repr__(self):
+        return f"PassResult({self.name}, {self.seconds * 1000:.3f} ms, removed={self.removed})"
+
+
+class PassManager:
+    """Runs the passes of an optimisation level (0, 1 or 2, as in -O0/-O1/-O2)
+    over an analyzed program, in place, timing each pass and counting the
+    nodes it removed (negative when a pass adds nodes, as code motion does
+    for its temporaries)."""
+
+    def __init__(self, level=1, passes=None):
+        if passes is None:
+            if level not in OPTIMIZATION_LEVELS:
+                raise ValueError(f"Unknown optimisation level {level!r}")
+            passes = OPTIMIZATION_LEVELS[level]
+        self.level = level
+        self.passes = passes
+        self.results = []
+
+    def run(self, program, symbol_table):
+        nodes = count_nodes(program)
+        for pass_class in self.passes:
+            optimization = pass_class(symbol_table)
+            start = time.perf_counter()
+            optimization.run(program)
+            elapsed = time.perf_counter() - start
+            remaining = count_nodes(program)
+            self.results.append(PassResult(optimization.name, elapsed, nodes, remaining))
+            nodes = remaining
+        return program
+
+    def report(self):
+        lines = [f"{'pass':<28} {'ms':>9} {'removed':>9}"]
+        for result in self.results:
+            lines.append(f"{result.name:<28} {result.seconds * 1000:9.3f} {result.removed:9}")
+        return "\n".join(lines)
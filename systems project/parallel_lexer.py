@@ -0,0 +1,171 @@
+import atexit
+import mmap
+import os
+import re
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from lexical import Lexer, TokenBuffer
+
+# Same comment syntax as the lexer. No other token can contain '/', so the
+# leftmost-first matches of this regex are exactly the lexer's comment tokens,
+# including its treatment of an unterminated '/*' or a '//' with no newline.
+COMMENT_PATTERN = r'//.*?(?:\r\n?|\n)|/\*[\s\S]*?\*/'
+COMMENT_REGEX = re.compile(COMMENT_PATTERN)
+BYTES_COMMENT_REGEX = re.compile(COMMENT_PATTERN.encode('ascii'))
+
+MIN_CHUNK_SIZE = 1 << 20
+
+# Pools are kept between calls, one per worker count, so repeated lexing does
+# not pay for starting processes again.
+_pools = {}
+
+
+def worker_pool(workers):
+    pool = _pools.get(workers)
+    if pool is None:
+        pool = _pools[workers] = ProcessPoolExecutor(max_workers=workers)
+    return pool
+
+
+def discard_pool(workers):
+    pool = _pools.pop(workers, None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+@atexit.register
+def shutdown_pools():
+    for workers in list(_pools):
+        discard_pool(workers)
+
+
+def count_line_breaks(text):
+    if isinstance(text, str):
+        return text.count('\n') + text.count('\r') - text.count('\r\n')
+    return text.count(b'\n') + text.count(b'\r') - text.count(b'\r\n')
+
+
+def chunk_boundaries(source, chunk_size):
+    """Returns the offsets at which source can be split into chunks of roughly
+    chunk_size. Every boundary directly follows a '\\n' that is not inside a
+    comment, so no token or '\\r\\n' pair straddles it."""
+    if isinstance(source, str):
+        comment_regex, newline = COMMENT_REGEX, '\n'
+    else:
+        comment_regex, newline = BYTES_COMMENT_REGEX, b'\n'
+    source_length = len(source)
+    boundaries = [0]
+    comments = comment_regex.finditer(source)
+    comment = next(comments, None)
+    target = chunk_size
+    while target < source_length:
+        newline_index = source.find(newline, target)
+        if newline_index < 0:
+            break
+        boundary = newline_index + 1
+        while comment is not None and comment.end() < boundary:
+            comment = next(comments, None)
+        if comment is not None and comment.start() < boundary < comment.end():
+            target = comment.end()
+            continue
+        if boundary >= source_length:
+            break
+        boundaries.append(boundary)
+        target = boundary + chunk_size
+    boundaries.append(source_length)
+    return boundaries
+
+
+def _read_chunk(path, start, end):
+    with open(path, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return mapped[start:end]
+
+
+def _count_chunk_lines(task):
+    # Runs in a worker process, so the parent never copies the mapped file.
+    path, start, end = task
+    return count_line_breaks(_read_chunk(path, start, end))
+
+
+def _lex_chunk(task):
+    # Runs in a worker process. Returns the chunk's columns with offsets already
+    # made absolute, plus its EOF row, so the parent only concatenates arrays.
+    chunk, path, start, end, first_line, mode = task
+    if chunk is None:
+        chunk = _read_chunk(path, start, end)
+    buffer = Lexer(chunk, mode, first_line).tokenize_buffer()
+    eof = (buffer.kinds.pop(), buffer.starts.pop() + start, buffer.ends.pop() + start,
+           buffer.lines.pop(), buffer.columns.pop())
+    starts = array('q', [offset + start for offset in buffer.starts])
+    ends = array('q', [offset + start for offset in buffer.ends])
+    return buffer.kinds, starts, ends, buffer.lines, buffer.columns, eof
+
+
+class ParallelLexer:
+    """Lexes one large source across a process pool. The source is split at safe
+    newlines, each chunk is lexed with the serial Lexer starting at its real line
+    number, and the resulting columns are concatenated into one TokenBuffer.
+    The tokens and any LexicalError are identical to Lexer(source).tokenize().
+
+    With a path, workers also count each chunk's line breaks, so the parent
+    only scans for boundaries and concatenates the results. Worker processes
+    are shared between calls with the same worker count."""
+
+    def __init__(self, source_code, workers=None, chunk_size=None, mode='fast', path=None):
+        self.source_code = source_code
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.mode = mode
+        self.path = path
+
+    @classmethod
+    def from_path(cls, path, workers=None, chunk_size=None, mode='fast'):
+        # Workers map the file themselves, so chunks are never pickled.
+        with open(path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return cls('', workers, chunk_size, mode)
+            source = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(source, workers, chunk_size, mode, path)
+
+    def tokenize_buffer(self):
+        source = self.source_code
+        chunk_size = self.chunk_size or max(MIN_CHUNK_SIZE, len(source) // (self.workers * 4) + 1)
+        boundaries = chunk_boundaries(source, chunk_size)
+        if self.workers == 1 or len(boundaries) <= 2:
+            return Lexer(source, self.mode).tokenize_buffer()
+
+        try:
+            return self.lex_chunks(source, boundaries, worker_pool(self.workers))
+        except BrokenProcessPool:
+            # A worker died; the next call starts a fresh pool.
+            discard_pool(self.workers)
+            raise
+
+    def lex_chunks(self, source, boundaries, executor):
+        spans = list(zip(boundaries, boundaries[1:]))
+        if self.path:
+            chunks = [None] * len(spans)
+            breaks = executor.map(_count_chunk_lines, [(self.path, start, end) for start, end in spans])
+        else:
+            # A str source is pickled to the workers anyway, so it is sliced here.
+            chunks = [source[start:end] for start, end in spans]
+            breaks = map(count_line_breaks, chunks)
+        tasks = []
+        first_line = 1
+        for chunk, (start, end), count in zip(chunks, spans, breaks):
+            tasks.append((chunk, self.path, start, end, first_line, self.mode))
+            first_line += count
+
+        buffer = TokenBuffer(source)
+        # map() yields in chunk order, so the first LexicalError raised here
+        # is the one the serial lexer would have reported.
+        for kinds, starts, ends, lines, columns, eof in executor.map(_lex_chunk, tasks):
+            buffer.extend_columns(kinds, starts, ends, lines, columns)
+        buffer.append(*eof)
+        return buffer
+
+    def tokenize(self):
+        return list(self.tokenize_buffer())
@@ -1,132 +1,177 @@
-from lexical import Lexer, Token
-from ast_nodes import (
-    ProgramNode, StatementListNode, DeclarationNode, AssignmentNode, DoWhileNode,
-    BinaryOpNode, IntLiteralNode, FloatLiteralNode, IdentifierNode,
-    ExpressionNode, FactorNode
-)
-
-class SyntaxError(Exception):
-    pass
-
-class Parser:
-    def __init__(self, tokens):
-        self.tokens = tokens
-        self.current = 0
-
-    def match(self, *expected_types):
-        if self.current < len(self.tokens) and self.tokens[self.current].type in expected_types:
-            token = self.tokens[self.current]
-            self.current += 1
-            return token
-        return None
-
-    def expect(self, expected_type):
-        token = self.match(expected_type)
-        if not token:
-            current_token = self.tokens[self.current] if self.current < len(self.tokens) else "End of input"
-            raise SyntaxError(f"Expected {expected_type} but found {current_token} at line {current_token.line}, column {current_token.column}")
-        return token
-
-    def parse(self):
-        return self.program()
-
-    def program(self):
-        program_node = ProgramNode()
-        program_node.add_child(self.statement_list(['EOF']))
-        return program_node
-
-    def statement_list(self, stop_types):
-        statement_list_node = StatementListNode()
-        while self.tokens[self.current].type not in stop_types:
-            statement_list_node.add_child(self.statement())
-        return statement_list_node
-
-    def statement(self):
-        if self.tokens[self.current].type in ['INT_KEYWORD', 'FLOAT_KEYWORD']:
-            return self.declaration()
-        elif self.tokens[self.current].type == 'IDENTIFIER':
-            return self.assignment()
-        elif self.tokens[self.current].type == 'DO_KEYWORD':
-            return self.do_while_statement()
-        else:
-            current_token = self.tokens[self.current] if self.current < len(self.tokens) else "End of input"
-            raise SyntaxError(f"Unexpected statement: {current_token} at line {current_token.line}, column {current_token.column}")
-
-    def declaration(self):
-        type_token = self.match('INT_KEYWORD', 'FLOAT_KEYWORD')
-        identifier_token = self.expect('IDENTIFIER')
-        assignment_expr = None
-        if self.match('ASSIGN'):
-            assignment_expr = self.expr()
-        self.expect('SEMICOLON')
-        return DeclarationNode(type_token, identifier_token, assignment_expr)
-
-    def assignment(self):
-        identifier_token = self.expect('IDENTIFIER')
-        self.expect('ASSIGN')
-        assignment_expr = self.expr()
-        self.expect('SEMICOLON')
-        return AssignmentNode(identifier_token, assignment_expr)
-
-    def do_while_statement(self):
-        self.expect('DO_KEYWORD')
-        self.expect('LBRACE')
-        body = self.statement_list(['RBRACE'])
-        self.expect('RBRACE')
-        self.expect('WHILE_KEYWORD')
-        self.expect('LPAREN')
-        condition = self.expr()
-        self.expect('RPAREN')
-        self.expect('SEMICOLON')
-        return DoWhileNode(body, condition)
-
-    def expr(self):
-        left_node = self.arithmetic_expr()
-
-        while self.tokens[self.current].type in ('LESS_EQUAL', 'GREATER_EQUAL', 'LESS_THAN', 'GREATER_THAN', 'EQUAL_EQUAL', 'NOT_EQUAL'):
-            operator = self.tokens[self.current]
-            self.current += 1
-            right_node = self.arithmetic_expr()
-            left_node = BinaryOpNode(left_node, operator, right_node)
-
-        return left_node
-
-    def arithmetic_expr(self):
-        left_node = self.term()
-
-        while self.tokens[self.current].type in ('PLUS', 'MINUS'):
-            operator = self.tokens[self.current]
-            self.current += 1
-            right_node = self.term()
-            left_node = BinaryOpNode(left_node, operator, right_node)
-
-        return left_node
-
-    def term(self):
-        left_node = self.factor()
-
-        while self.tokens[self.current].type in ('MULTIPLY', 'DIVIDE'):
-            operator = self.tokens[self.current]
-            self.current += 1
-            right_node = self.factor()
-            left_node = BinaryOpNode(left_node, operator, right_node)
-
-        return left_node
-
-    def factor(self):
-        if self.tokens[self.current].type in ('INT_LITERAL'):
-            token = self.match('INT_LITERAL')
-            return IntLiteralNode(token)
-        elif self.tokens[self.current].type in ('FLOAT_LITERAL'):
-             token = self.match('FLOAT_LITERAL')
-             return FloatLiteralNode(token)
-        elif self.tokens[self.current].type in ('IDENTIFIER'):
-            token = self.match('IDENTIFIER')
-            return IdentifierNode(token)
-        elif self.match('LPAREN'):
-            expr_node = self.expr()
-            self.expect('RPAREN')
-            return expr_node
-        else:
-            current_token = self.tokens[self.current] if self.current < len(self.tokens) else "End of input"
-            raise SyntaxError(f"Unexpected factor: {current_token} at line {current_token.line}, column {current_token.column}")
+from collections import deque
+
+from lexical import Lexer, Token, TokenKind, TOKEN_TYPES
+from ast_nodes import (
+    ProgramNode, StatementListNode, DeclarationNode, AssignmentNode, DoWhileNode,
+    BinaryOpNode, IntLiteralNode, FloatLiteralNode, IdentifierNode,
+    ExpressionNode, FactorNode
+)
+
+COMPARISON_KINDS = (
+    TokenKind.LESS_EQUAL, TokenKind.GREATER_EQUAL, TokenKind.LESS_THAN,
+    TokenKind.GREATER_THAN, TokenKind.EQUAL_EQUAL, TokenKind.NOT_EQUAL,
+)
+ADDITIVE_KINDS = (TokenKind.PLUS, TokenKind.MINUS)
+MULTIPLICATIVE_KINDS = (TokenKind.MULTIPLY, TokenKind.DIVIDE)
+
+# Binding strength of each binary operator; all of them are left-associative.
+BINARY_PRECEDENCE = {}
+BINARY_PRECEDENCE.update(dict.fromkeys(COMPARISON_KINDS, 1))
+BINARY_PRECEDENCE.update(dict.fromkeys(ADDITIVE_KINDS, 2))
+BINARY_PRECEDENCE.update(dict.fromkeys(MULTIPLICATIVE_KINDS, 3))
+
+class SyntaxError(Exception):
+    pass
+
+class Parser:
+    def __init__(self, tokens):
+        # Tokens are pulled on demand from any iterable (a list, or the generator
+        # returned by Lexer.iter_tokens), so only the lookahead is held in memory.
+        self.token_stream = iter(tokens)
+        self.lookahead = deque()
+        self.current = 0
+
+    def peek(self, offset=0):
+        lookahead = self.lookahead
+        while len(lookahead) <= offset:
+            token = next(self.token_stream, None)
+            if token is None:
+                raise SyntaxError(f"Unexpected end of input after {self.current + len(lookahead)} tokens")
+            lookahead.append(token)
+        return lookahead[offset]
+
+    def advance(self):
+        token = self.peek()
+        self.lookahead.popleft()
+        self.current += 1
+        return token
+
+    def match(self, *expected_kinds):
+        if self.peek().kind in expected_kinds:
+            return self.advance()
+        return None
+
+    def expect(self, expected_kind):
+        token = self.match(expected_kind)
+        if not token:
+            current_token = self.peek()
+            raise SyntaxError(f"Expected {TOKEN_TYPES[expected_kind]} but found {current_token} at line {current_token.line}, column {current_token.column}")
+        return token
+
+    def parse(self):
+        return self.program()
+
+    def program(self):
+        program_node = ProgramNode()
+        program_node.add_child(self.statement_list((TokenKind.EOF,)))
+        return program_node
+
+    def statement_list(self, stop_kinds):
+        # Nested do-while bodies are kept on an explicit stack of open statement
+        # lists instead of recursing once per nesting level.
+        statement_list_node = StatementListNode()
+        open_lists = [(statement_list_node, stop_kinds)]
+        while True:
+            current_list, current_stop_kinds = open_lists[-1]
+            kind = self.peek().kind
+            if kind in current_stop_kinds:
+                if len(open_lists) == 1:
+                    return statement_list_node
+                open_lists.pop()
+                open_lists[-1][0].add_child(self.do_while_tail(current_list))
+            elif kind == TokenKind.DO_KEYWORD:
+                self.do_while_head()
+                open_lists.append((StatementListNode(), (TokenKind.RBRACE,)))
+            else:
+                current_list.add_child(self.statement())
+
+    def statement(self):
+        # Do-while statements are opened and closed by statement_list.
+        if self.peek().kind in (TokenKind.INT_KEYWORD, TokenKind.FLOAT_KEYWORD):
+            return self.declaration()
+        elif self.peek().kind == TokenKind.IDENTIFIER:
+            return self.assignment()
+        else:
+            current_token = self.peek()
+            raise SyntaxError(f"Unexpected statement: {current_token} at line {current_token.line}, column {current_token.column}")
+
+    def declaration(self):
+        type_token = self.match(TokenKind.INT_KEYWORD, TokenKind.FLOAT_KEYWORD)
+        identifier_token = self.expect(TokenKind.IDENTIFIER)
+        assignment_expr = None
+        if self.match(TokenKind.ASSIGN):
+            assignment_expr = self.expr()
+        self.expect(TokenKind.SEMICOLON)
+        return DeclarationNode(type_token, identifier_token, assignment_expr)
+
+    def assignment(self):
+        identifier_token = self.expect(TokenKind.IDENTIFIER)
+        self.expect(TokenKind.ASSIGN)
+        assignment_expr = self.expr()
+        self.expect(TokenKind.SEMICOLON)
+        return AssignmentNode(identifier_token, assignment_expr)
+
+    def do_while_head(self):
+        self.expect(TokenKind.DO_KEYWORD)
+        self.expect(TokenKind.LBRACE)
+
+    def do_while_tail(self, body):
+        self.expect(TokenKind.RBRACE)
+        self.expect(TokenKind.WHILE_KEYWORD)
+        self.expect(TokenKind.LPAREN)
+        condition = self.expr()
+        self.expect(TokenKind.RPAREN)
+        self.expect(TokenKind.SEMICOLON)
+        return DoWhileNode(body, condition)
+
+    def expr(self):
+        # Precedence climbing over explicit operand and operator stacks, so long
+        # operator chains and deeply nested parentheses use no Python recursion.
+        # None on the operator stack marks an open parenthesis.
+        operands = []
+        operators = []
+        open_parens = 0
+        while True:
+            while self.match(TokenKind.LPAREN):
+                operators.append(None)
+                open_parens += 1
+            operands.append(self.factor())
+
+            while True:
+                token = self.peek()
+                precedence = BINARY_PRECEDENCE.get(token.kind)
+                if precedence is not None:
+                    break
+                if token.kind == TokenKind.RPAREN and open_parens:
+                    while operators[-1] is not None:
+                        self.reduce(operands, operators)
+                    operators.pop()
+                    open_parens -= 1
+                    self.advance()
+                    continue
+                if open_parens:
+                    self.expect(TokenKind.RPAREN)
+                while operators:
+                    self.reduce(operands, operators)
+                return operands[0]
+
+            while operators and operators[-1] is not None and BINARY_PRECEDENCE[operators[-1].kind] >= precedence:
+                self.reduce(operands, operators)
+            operators.append(self.advance())
+
+    def reduce(self, operands, operators):
+        right_node = operands.pop()
+        left_node = operands.pop()
+        operands.append(BinaryOpNode(left_node, operators.pop(), right_node))
+
+    def factor(self):
+        kind = self.peek().kind
+        if kind == TokenKind.INT_LITERAL:
+            return IntLiteralNode(self.advance())
+        elif kind == TokenKind.FLOAT_LITERAL:
+            return FloatLiteralNode(self.advance())
+        elif kind == TokenKind.IDENTIFIER:
+            return IdentifierNode(self.advance())
+        else:
+            current_token = self.peek()
+            raise SyntaxError(f"Unexpected factor: {current_token} at line {current_token.line}, column {current_token.column}")
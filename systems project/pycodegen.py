@@ -0,0 +1,152 @@
+# pycodegen.py
+
+import math
+from functools import lru_cache
+
+from lexical import TokenKind
+from symbol_table import TYPE_INT, TYPE_FLOAT
+from tree_walker import TreeWalker
+from interpreter import int_div, division_error_at, results_by_name
+from complier import Compiler, VirtualMachine
+
+OPERATORS = {
+    TokenKind.PLUS: '+', TokenKind.MINUS: '-', TokenKind.MULTIPLY: '*', TokenKind.DIVIDE: '/',
+    TokenKind.LESS_THAN: '<', TokenKind.GREATER_THAN: '>',
+    TokenKind.LESS_EQUAL: '<=', TokenKind.GREATER_EQUAL: '>=',
+    TokenKind.EQUAL_EQUAL: '==', TokenKind.NOT_EQUAL: '!=',
+}
+COMPARISON_KINDS = frozenset((
+    TokenKind.LESS_THAN, TokenKind.GREATER_THAN, TokenKind.LESS_EQUAL,
+    TokenKind.GREATER_EQUAL, TokenKind.EQUAL_EQUAL, TokenKind.NOT_EQUAL,
+))
+
+FUNCTION_NAME = 'program'
+
+
+# Every division site passes its own source position, so a division by zero
+# raises the interpreter's ExecutionError directly from the generated code.
+def checked_div(left, right, line, column):
+    try:
+        return left / right
+    except ZeroDivisionError:
+        raise division_error_at(line, column) from None
+
+
+def checked_int_div(left, right, line, column):
+    try:
+        return int_div(left, right)
+    except ZeroDivisionError:
+        raise division_error_at(line, column) from None
+
+
+# Names the generated code calls, bound as default arguments so they are locals.
+HELPERS = {'checked_div': checked_div, 'checked_int_div': checked_int_div}
+HELPER_PARAMETERS = ', '.join(f"{name}={name}" for name in HELPERS)
+
+
+class PythonCodeGenerator(TreeWalker):
+    """Translates an analyzed AST into the source of one Python function.
+
+    Every symbol table slot becomes a local `v<slot>`, and the function returns
+    the final values in slot order. Leave hooks return (text, type_code) for
+    expressions; statements append lines at the current indentation. A
+    do-while becomes `while True:` with `if not <condition>: break` at the end
+    of its body."""
+
+    def __init__(self, symbol_table):
+        self.symbol_table = symbol_table
+        self.lines = []
+        self.indent = 1
+
+    def generate(self, program):
+        types = self.symbol_table.types
+        self.lines = [f"def {FUNCTION_NAME}({HELPER_PARAMETERS}):"]
+        # Slots declared in branches that never run still appear in the result.
+        self.lines.extend(f"    v{slot} = {'0.0' if type_code == TYPE_FLOAT else '0'}"
+                          for slot, type_code in enumerate(types))
+        self.indent = 1
+        self.walk(program)
+        self.lines.append(f"    return [{', '.join(f'v{slot}' for slot in range(len(types)))}]")
+        return "\n".join(self.lines) + "\n"
+
+    def line(self, text):
+        self.lines.append('    ' * self.indent + text)
+
+    def store(self, slot, expression):
+        text, value_type = expression
+        if self.symbol_table.types[slot] == TYPE_FLOAT and value_type == TYPE_INT:
+            text = f"float({text})"
+        self.line(f"v{slot} = {text}")
+
+    def leave_DeclarationNode(self, node, child_results):
+        if node.assignment_expr is None:
+            is_float = self.symbol_table.types[node.slot] == TYPE_FLOAT
+            self.line(f"v{node.slot} = {'0.0' if is_float else '0'}")
+        else:
+            self.store(node.slot, child_results[0])
+
+    def leave_AssignmentNode(self, node, child_results):
+        self.store(node.slot, child_results[0])
+
+    def enter_DoWhileNode(self, node):
+        self.line("while True:")
+        self.indent += 1
+
+    def leave_DoWhileNode(self, node, child_results):
+        condition, _ = child_results[1]
+        self.line(f"if not {condition}: break")
+        self.indent -= 1
+
+    def leave_BinaryOpNode(self, node, child_results):
+        (left, left_type), (right, right_type) = child_results
+        kind = node.operator_token.kind
+        result_type = TYPE_INT if left_type == TYPE_INT and right_type == TYPE_INT else TYPE_FLOAT
+        if kind == TokenKind.DIVIDE:
+            token = node.operator_token
+            helper = 'checked_int_div' if result_type == TYPE_INT else 'checked_div'
+            return f"{helper}({left}, {right}, {token.line}, {token.column})", result_type
+        text = f"({left} {OPERATORS[kind]} {right})"
+        if kind in COMPARISON_KINDS:
+            # True/False would leak into int variables; the language uses 1/0.
+            return f"(1 if {text} else 0)", TYPE_INT
+        return text, result_type
+
+    def leave_IntLiteralNode(self, node, child_results):
+        return repr(node.value), TYPE_INT
+
+    def leave_FloatLiteralNode(self, node, child_results):
+        value = node.value
+        return (repr(value) if math.isfinite(value) else f"float('{value!r}')"), TYPE_FLOAT
+
+    def leave_IdentifierNode(self, node, child_results):
+        return f"v{node.slot}", self.symbol_table.types[node.slot]
+
+
+@lru_cache(maxsize=256)
+def compile_function(source):
+    """Compiles generated source to a function. Cached on the source text, so
+    re-running an unchanged program skips compile() entirely."""
+    namespace = dict(HELPERS)
+    exec(compile(source, '<pycodegen>', 'exec'), namespace)
+    return namespace[FUNCTION_NAME]
+
+
+class CompiledProgram:
+    """A program translated to a native Python function. CPython refuses
+    some very deep programs (nested blocks or parentheses past its own
+    limits); those run on the bytecode VM instead, with the same results.
+    Division by zero raises ExecutionError with its location on both."""
+
+    def __init__(self, program, symbol_table):
+        self.program = program
+        self.symbol_table = symbol_table
+        self.source = PythonCodeGenerator(symbol_table).generate(program)
+        try:
+            self.function = compile_function(self.source)
+        except (SyntaxError, RecursionError, MemoryError):
+            self.function = None
+
+    def run(self):
+        if self.function is None:
+            return VirtualMachine(Compiler(self.symbol_table).compile(self.program)).run()
+        return results_by_name(self.symbol_table, self.function())
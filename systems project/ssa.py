@@ -0,0 +1,442 @@
+# ssa.py
+
+from array import array
+
+from lexical import TokenKind
+from symbol_table import TYPE_INT, TYPE_FLOAT
+from ast_nodes import BinaryOpNode
+from tree_walker import TreeWalker
+from optimizer import loop_writes
+from interpreter import ExecutionError, int_div, division_error, results_by_name
+
+# Three-address SSA form. Every instruction defines one value, identified by
+# its index; operands are value ids (or a constant-pool index for CONST, a
+# block index for BRANCH's target). Instructions are laid out block by block
+# in program order. Because the only control flow is do-while, whose body
+# always runs at least once, an instruction dominates everything laid out
+# after it; the passes below rely on that.
+CONST = 0           # constant index
+COPY = 1            # value
+PHI = 2             # value from before the loop, value from the latch
+TO_FLOAT = 3        # value
+ADD = 4
+SUB = 5
+MUL = 6
+DIV_INT = 7
+DIV_FLOAT = 8
+LESS_THAN = 9
+GREATER_THAN = 10
+LESS_EQUAL = 11
+GREATER_EQUAL = 12
+EQUAL_EQUAL = 13
+NOT_EQUAL = 14
+BRANCH = 15         # condition, target block; falls through when zero
+NOP = 16            # removed instruction
+
+OPCODE_NAMES = {
+    value: name for name, value in globals().items()
+    if name.isupper() and isinstance(value, int) and name not in ('TYPE_INT', 'TYPE_FLOAT')
+}
+BINARY_OPCODES = {
+    TokenKind.PLUS: ADD, TokenKind.MINUS: SUB, TokenKind.MULTIPLY: MUL,
+    TokenKind.LESS_THAN: LESS_THAN, TokenKind.GREATER_THAN: GREATER_THAN,
+    TokenKind.LESS_EQUAL: LESS_EQUAL, TokenKind.GREATER_EQUAL: GREATER_EQUAL,
+    TokenKind.EQUAL_EQUAL: EQUAL_EQUAL, TokenKind.NOT_EQUAL: NOT_EQUAL,
+}
+COMPARISON_OPCODES = frozenset((LESS_THAN, GREATER_THAN, LESS_EQUAL, GREATER_EQUAL, EQUAL_EQUAL, NOT_EQUAL))
+COMMUTATIVE_OPCODES = frozenset((ADD, MUL, EQUAL_EQUAL, NOT_EQUAL))
+
+
+class SSAProgram:
+    """Instructions are parallel arrays indexed by value id: opcodes,
+    operands a and b (-1 when unused) and result types. Blocks are ranges of
+    instructions starting at block_starts[block]. exit_values[slot] is the
+    value each variable holds when the program ends."""
+
+    def __init__(self, symbol_table):
+        self.symbol_table = symbol_table
+        self.opcodes = array('b')
+        self.operand_a = array('l')
+        self.operand_b = array('l')
+        self.types = array('b')
+        self.constants = []
+        self.block_starts = array('l', [0])
+        self.exit_values = array('l')
+        # Source token of every division, by value id, for error messages.
+        self.locations = {}
+
+    def __len__(self):
+        return len(self.opcodes)
+
+    def emit(self, opcode, a=-1, b=-1, value_type=TYPE_INT):
+        self.opcodes.append(opcode)
+        self.operand_a.append(a)
+        self.operand_b.append(b)
+        self.types.append(value_type)
+        return len(self.opcodes) - 1
+
+    def block_ranges(self):
+        starts = self.block_starts
+        for block in range(len(starts)):
+            end = starts[block + 1] if block + 1 < len(starts) else len(self.opcodes)
+            yield block, starts[block], end
+
+    def successors(self, block):
+        """The CFG edges out of a block: its BRANCH target, if it ends in one,
+        and the next block in layout order."""
+        starts = self.block_starts
+        end = starts[block + 1] if block + 1 < len(starts) else len(self.opcodes)
+        result = []
+        if end > starts[block] and self.opcodes[end - 1] == BRANCH:
+            result.append(self.operand_b[end - 1])
+        if block + 1 < len(starts):
+            result.append(block + 1)
+        return result
+
+    def format(self):
+        lines = []
+        names = self.symbol_table.names
+        for block, start, end in self.block_ranges():
+            lines.append(f"block{block}:  -> {', '.join(f'block{s}' for s in self.successors(block))}")
+            for value in range(start, end):
+                opcode = self.opcodes[value]
+                if opcode == NOP:
+                    continue
+                a, b = self.operand_a[value], self.operand_b[value]
+                if opcode == CONST:
+                    operands = repr(self.constants[a])
+                elif opcode == BRANCH:
+                    operands = f"%{a}, block{b}"
+                else:
+                    operands = ', '.join(f"%{operand}" for operand in (a, b) if operand >= 0)
+                lines.append(f"    %{value} = {OPCODE_NAMES[opcode]} {operands}")
+        lines.append("exit: " + ', '.join(f"{names[slot]}=%{value}" for slot, value in enumerate(self.exit_values)))
+        return "\n".join(lines)
+
+    # Passes. Each returns the number of instructions it removed; removed
+    # instructions become NOP until compact() drops them.
+
+    def copy_propagation(self):
+        """Forwards uses of COPY and of trivial phis (both operands the same
+        value, or the phi itself) to the value they copy."""
+        opcodes, operand_a, operand_b = self.opcodes, self.operand_a, self.operand_b
+        forward = list(range(len(opcodes)))
+
+        def resolve(value):
+            while forward[value] != value:
+                forward[value] = forward[forward[value]]
+                value = forward[value]
+            return value
+
+        removed = 0
+        changed = True
+        while changed:
+            changed = False
+            for value in range(len(opcodes)):
+                opcode = opcodes[value]
+                if forward[value] != value:
+                    continue
+                if opcode == COPY:
+                    forward[value] = resolve(operand_a[value])
+                elif opcode == PHI:
+                    a, b = resolve(operand_a[value]), resolve(operand_b[value])
+                    if a == b or b == value:
+                        forward[value] = a
+                    else:
+                        continue
+                else:
+                    continue
+                opcodes[value] = NOP
+                removed += 1
+                changed = True
+        self.rewrite_operands(resolve)
+        return removed
+
+    def value_numbering(self):
+        """Global value numbering: an instruction equal to an earlier one
+        (same opcode and operands, commutative operands sorted) is replaced by
+        it. Layout order is a dominance order here, so the earlier value is
+        always available. Identical constants are merged the same way."""
+        opcodes, operand_a, operand_b = self.opcodes, self.operand_a, self.operand_b
+        constants = self.constants
+        forward = list(range(len(opcodes)))
+        table = {}
+        removed = 0
+        for value in range(len(opcodes)):
+            opcode = opcodes[value]
+            if opcode == NOP or opcode == BRANCH:
+                continue
+            a, b = operand_a[value], operand_b[value]
+            if opcode == CONST:
+                key = (CONST, type(constants[a]), repr(constants[a]))
+            else:
+                if a >= 0:
+                    a = forward[a]
+                if b >= 0 and opcode != PHI:
+                    b = forward[b]
+                if opcode in COMMUTATIVE_OPCODES and b < a:
+                    a, b = b, a
+                operand_a[value], operand_b[value] = a, b
+                if opcode == PHI:
+                    # The latch operand may refer to values not numbered yet.
+                    continue
+                key = (opcode, a, b)
+            existing = table.get(key)
+            if existing is None:
+                table[key] = value
+            else:
+                forward[value] = existing
+                opcodes[value] = NOP
+                removed += 1
+        self.rewrite_operands(forward.__getitem__)
+        return removed
+
+    def dead_code_elimination(self):
+        """Removes instructions whose value no exit value, branch or
+        possibly failing division depends on."""
+        opcodes, operand_a, operand_b = self.opcodes, self.operand_a, self.operand_b
+        live = bytearray(len(opcodes))
+        temporaries = set(self.symbol_table.temporaries)
+        work = [value for slot, value in enumerate(self.exit_values) if slot not in temporaries]
+        for value in range(len(opcodes)):
+            opcode = opcodes[value]
+            if opcode == BRANCH or ((opcode == DIV_INT or opcode == DIV_FLOAT) and self.may_be_zero(operand_b[value])):
+                work.append(value)
+        while work:
+            value = work.pop()
+            if live[value]:
+                continue
+            live[value] = 1
+            opcode = opcodes[value]
+            if opcode == CONST or opcode == NOP:
+                continue
+            work.append(operand_a[value])
+            if operand_b[value] >= 0 and opcode != BRANCH:
+                work.append(operand_b[value])
+        removed = 0
+        for value in range(len(opcodes)):
+            if not live[value] and opcodes[value] != NOP:
+                opcodes[value] = NOP
+                removed += 1
+        return removed
+
+    def may_be_zero(self, value):
+        return self.opcodes[value] != CONST or self.constants[self.operand_a[value]] == 0
+
+    def rewrite_operands(self, resolve):
+        opcodes, operand_a, operand_b = self.opcodes, self.operand_a, self.operand_b
+        for value in range(len(opcodes)):
+            opcode = opcodes[value]
+            if opcode == CONST or opcode == NOP:
+                continue
+            operand_a[value] = resolve(operand_a[value])
+            if operand_b[value] >= 0 and opcode != BRANCH:
+                operand_b[value] = resolve(operand_b[value])
+        exit_values = self.exit_values
+        for slot in range(len(exit_values)):
+            exit_values[slot] = resolve(exit_values[slot])
+
+    def compact(self):
+        """Drops NOP instructions and renumbers the remaining values."""
+        opcodes = self.opcodes
+        new_ids = array('l', [-1]) * len(opcodes)
+        kept = [value for value in range(len(opcodes)) if opcodes[value] != NOP]
+        for new_id, value in enumerate(kept):
+            new_ids[value] = new_id
+        block_starts = array('l')
+        position = 0
+        for block, start, end in self.block_ranges():
+            while position < len(kept) and kept[position] < start:
+                position += 1
+            block_starts.append(position)
+        old_a, old_b, old_types = self.operand_a, self.operand_b, self.types
+        self.opcodes = array('b', (opcodes[value] for value in kept))
+        self.operand_a = array('l')
+        self.operand_b = array('l')
+        for value in kept:
+            opcode, a, b = opcodes[value], old_a[value], old_b[value]
+            if opcode != CONST:
+                a = new_ids[a]
+                if b >= 0 and opcode != BRANCH:
+                    b = new_ids[b]
+            self.operand_a.append(a)
+            self.operand_b.append(b)
+        self.types = array('b', (old_types[value] for value in kept))
+        self.block_starts = block_starts
+        self.exit_values = array('l', (new_ids[value] for value in self.exit_values))
+        self.locations = {new_ids[value]: token for value, token in self.locations.items() if new_ids[value] >= 0}
+        return len(opcodes) - len(kept)
+
+    def optimize(self):
+        removed = self.copy_propagation()
+        removed += self.value_numbering()
+        removed += self.dead_code_elimination()
+        self.compact()
+        return removed
+
+
+class SSABuilder(TreeWalker):
+    """Lowers an analyzed AST to SSA. Each variable's current value id is kept
+    per slot. A do-while starts a header block holding a phi for every slot
+    the loop writes (its first operand is the value on entry; the second is
+    filled in at the latch, the block that evaluates the condition and
+    branches back). The exit block follows the latch, and the values current
+    at the latch are those after the loop."""
+
+    def __init__(self, symbol_table):
+        self.symbol_table = symbol_table
+        self.program = SSAProgram(symbol_table)
+        self.current = array('l', [-1]) * len(symbol_table)
+        self.constant_values = {}
+        self.loops = []
+
+    def build(self, ast_root):
+        self.loop_writes = loop_writes(ast_root)
+        self.walk(ast_root)
+        program = self.program
+        program.exit_values = array('l', (self.value_of(slot) for slot in range(len(self.current))))
+        return program
+
+    def constant(self, value):
+        key = (type(value), repr(value))
+        constant_value = self.constant_values.get(key)
+        if constant_value is None:
+            program = self.program
+            program.constants.append(value)
+            value_type = TYPE_FLOAT if type(value) is float else TYPE_INT
+            constant_value = self.constant_values[key] = program.emit(CONST, len(program.constants) - 1, -1, value_type)
+        return constant_value
+
+    def value_of(self, slot):
+        value = self.current[slot]
+        if value < 0:
+            # Read before any store: the variable's zero initial value.
+            value = self.current[slot] = self.constant(0.0 if self.symbol_table.types[slot] == TYPE_FLOAT else 0)
+        return value
+
+    def store(self, slot, value, is_copy):
+        program = self.program
+        if self.symbol_table.types[slot] == TYPE_FLOAT and program.types[value] == TYPE_INT:
+            value = program.emit(TO_FLOAT, value, -1, TYPE_FLOAT)
+        elif is_copy:
+            value = program.emit(COPY, value, -1, program.types[value])
+        self.current[slot] = value
+
+    def leave_DeclarationNode(self, node, child_values):
+        if node.assignment_expr is None:
+            is_float = self.symbol_table.types[node.slot] == TYPE_FLOAT
+            self.store(node.slot, self.constant(0.0 if is_float else 0), True)
+        else:
+            self.store(node.slot, child_values[0], type(node.assignment_expr) is not BinaryOpNode)
+
+    def leave_AssignmentNode(self, node, child_values):
+        # Storing a variable or a literal is a copy; an operation already
+        # defines a new value.
+        self.store(node.slot, child_values[0], type(node.assignment_expr) is not BinaryOpNode)
+
+    def enter_DoWhileNode(self, node):
+        program = self.program
+        slots = sorted(self.loop_writes[node])
+        entry_values = [self.value_of(slot) for slot in slots]
+        header = len(program.block_starts)
+        program.block_starts.append(len(program))
+        phis = []
+        for slot, value in zip(slots, entry_values):
+            phi = program.emit(PHI, value, -1, self.symbol_table.types[slot])
+            self.current[slot] = phi
+            phis.append((slot, phi))
+        self.loops.append((header, phis))
+
+    def leave_DoWhileNode(self, node, child_values):
+        program = self.program
+        header, phis = self.loops.pop()
+        program.emit(BRANCH, child_values[1], header)
+        for slot, phi in phis:
+            program.operand_b[phi] = self.current[slot]
+        program.block_starts.append(len(program))
+
+    def leave_BinaryOpNode(self, node, child_values):
+        program = self.program
+        left, right = child_values
+        left_type, right_type = program.types[left], program.types[right]
+        value_type = TYPE_INT if left_type == TYPE_INT and right_type == TYPE_INT else TYPE_FLOAT
+        kind = node.operator_token.kind
+        if kind == TokenKind.DIVIDE:
+            value = program.emit(DIV_INT if value_type == TYPE_INT else DIV_FLOAT, left, right, value_type)
+            program.locations[value] = node.operator_token
+            return value
+        opcode = BINARY_OPCODES[kind]
+        return program.emit(opcode, left, right, TYPE_INT if opcode in COMPARISON_OPCODES else value_type)
+
+    def leave_IntLiteralNode(self, node, child_values):
+        return self.constant(node.value)
+
+    def leave_FloatLiteralNode(self, node, child_values):
+        return self.constant(node.value)
+
+    def leave_IdentifierNode(self, node, child_values):
+        return self.value_of(node.slot)
+
+
+def run_ssa(program):
+    """Executes SSA directly; used to check lowering and passes against the
+    other backends."""
+    opcodes, operand_a, operand_b = program.opcodes, program.operand_a, program.operand_b
+    constants = program.constants
+    block_starts = program.block_starts
+    values = [None] * len(opcodes)
+    pc = 0
+    end = len(opcodes)
+    while pc < end:
+        opcode = opcodes[pc]
+        a = operand_a[pc]
+        if opcode == CONST:
+            values[pc] = constants[a]
+        elif opcode == PHI:
+            # Reached by falling into the header: take the entry value.
+            values[pc] = values[a]
+        elif opcode == BRANCH:
+            if values[a]:
+                # Phis take their latch values all at once.
+                position = block_starts[operand_b[pc]]
+                latch_values = []
+                while position < end and (opcodes[position] == PHI or opcodes[position] == NOP):
+                    if opcodes[position] == PHI:
+                        latch_values.append((position, values[operand_b[position]]))
+                    position += 1
+                for phi, value in latch_values:
+                    values[phi] = value
+                pc = position
+                continue
+        elif opcode == COPY:
+            values[pc] = values[a]
+        elif opcode == TO_FLOAT:
+            values[pc] = float(values[a])
+        elif opcode != NOP:
+            left, right = values[a], values[operand_b[pc]]
+            if opcode == ADD:
+                values[pc] = left + right
+            elif opcode == SUB:
+                values[pc] = left - right
+            elif opcode == MUL:
+                values[pc] = left * right
+            elif opcode == DIV_INT or opcode == DIV_FLOAT:
+                if right == 0:
+                    raise division_error(program.locations[pc])
+                values[pc] = int_div(left, right) if opcode == DIV_INT else left / right
+            elif opcode == LESS_THAN:
+                values[pc] = 1 if left < right else 0
+            elif opcode == GREATER_THAN:
+                values[pc] = 1 if left > right else 0
+            elif opcode == LESS_EQUAL:
+                values[pc] = 1 if left <= right else 0
+            elif opcode == GREATER_EQUAL:
+                values[pc] = 1 if left >= right else 0
+            elif opcode == EQUAL_EQUAL:
+                values[pc] = 1 if left == right else 0
+            elif opcode == NOT_EQUAL:
+                values[pc] = 1 if left != right else 0
+            else:
+                raise ExecutionError(f"Bad SSA opcode {opcode} at %{pc}")
+        pc += 1
+    return results_by_name(program.symbol_table, [values[value] for value in program.exit_values])
@@ -0,0 +1,206 @@
+# stats.py
+
+import cProfile
+import io
+import json
+import pstats
+import time
+import tracemalloc
+
+from tree_walker import iter_preorder
+
+# Rates reported per phase: what the phase consumes or produces.
+PHASE_UNITS = {'read': 'bytes', 'lex': 'tokens', 'parse': 'nodes', 'analyze': 'nodes',
+               'optimize': 'nodes', 'codegen': 'nodes'}
+
+
+def tree_shape(root):
+    """Returns (node count, depth) of an AST."""
+    nodes = 0
+    depth = 0
+    for _, node_depth in iter_preorder(root):
+        nodes += 1
+        if node_depth > depth:
+            depth = node_depth
+    return nodes, depth
+
+
+class PhaseStats:
+    """Totals for one phase over every time it ran. peak_bytes is the largest
+    tracemalloc peak above the phase's starting allocation (memory tracing
+    only); items is whatever the phase's unit counts."""
+
+    __slots__ = ('name', 'calls', 'wall', 'cpu', 'peak_bytes', 'items', 'unit')
+
+    def __init__(self, name, unit=None):
+        self.name = name
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak_bytes = None
+        self.items = 0
+        self.unit = unit or PHASE_UNITS.get(name)
+
+    @property
+    def rate(self):
+        return self.items / self.wall if self.wall and self.items else None
+
+    def add(self, other):
+        self.calls += other['calls']
+        self.wall += other['wall']
+        self.cpu += other['cpu']
+        self.items += other['items']
+        if other['peak_bytes'] is not None:
+            self.peak_bytes = max(self.peak_bytes or 0, other['peak_bytes'])
+
+    def as_dict(self):
+        return {'calls': self.calls, 'wall': self.wall, 'cpu': self.cpu, 'peak_bytes': self.peak_bytes,
+                'items': self.items, 'unit': self.unit, 'rate': self.rate}
+
+
+class Phase:
+    __slots__ = ('instrumentation', 'stats', 'wall', 'cpu', 'baseline', 'profile')
+
+    def __init__(self, instrumentation, stats):
+        self.instrumentation = instrumentation
+        self.stats = stats
+        self.profile = None
+
+    def __enter__(self):
+        instrumentation = self.instrumentation
+        if instrumentation.memory:
+            tracemalloc.reset_peak()
+            self.baseline = tracemalloc.get_traced_memory()[0]
+        if instrumentation.profile_phase == self.stats.name:
+            self.profile = instrumentation.profiler
+            self.profile.enable()
+        self.cpu = time.process_time()
+        self.wall = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        if self.profile is not None:
+            self.profile.disable()
+        stats = self.stats
+        stats.calls += 1
+        stats.wall += wall
+        stats.cpu += cpu
+        if self.instrumentation.memory:
+            peak = tracemalloc.get_traced_memory()[1] - self.baseline
+            stats.peak_bytes = max(stats.peak_bytes or 0, peak)
+        return False
+
+
+class NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_PHASE = NullPhase()
+
+
+class Instrumentation:
+    """Collects wall and CPU time per compiler phase, plus item counts for
+    rates, and optionally peak memory (memory=True, through tracemalloc) and a
+    cProfile capture of one phase (profile='parse', say).
+
+    Code under measurement writes `with stats.phase('lex'):` and reports
+    counts with stats.count(); it takes NULL_STATS by default, whose phase()
+    returns one shared no-op context, so uninstrumented runs only pay for a
+    method call per phase. Use it as a context manager when memory is
+    traced, so tracing stops afterwards."""
+
+    enabled = True
+
+    def __init__(self, memory=False, profile=None):
+        self.memory = memory
+        self.profile_phase = profile
+        self.profiler = cProfile.Profile() if profile else None
+        self.phases = {}
+        self.values = {}
+        self.started_tracing = False
+
+    def __enter__(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+        return False
+
+    def record(self, name):
+        stats = self.phases.get(name)
+        if stats is None:
+            stats = self.phases[name] = PhaseStats(name)
+        return stats
+
+    def phase(self, name):
+        return Phase(self, self.record(name))
+
+    def count(self, name, items):
+        self.record(name).items += items
+
+    def note(self, key, value):
+        """Keeps the largest value seen for a whole-run metric such as ast_depth."""
+        self.values[key] = max(self.values.get(key, value), value)
+
+    def merge(self, report):
+        """Adds a report() from another run or process into this one."""
+        for name, phase in report['phases'].items():
+            self.record(name).add(phase)
+        for key, value in report['values'].items():
+            self.note(key, value)
+
+    def report(self):
+        return {'phases': {name: stats.as_dict() for name, stats in self.phases.items()},
+                'values': dict(self.values)}
+
+    def to_json(self, indent=None):
+        return json.dumps(self.report(), indent=indent)
+
+    def table(self):
+        lines = [f"{'phase':<10} {'calls':>6} {'wall ms':>10} {'cpu ms':>10} {'peak KB':>10} {'rate':>22}"]
+        for stats in self.phases.values():
+            peak = '-' if stats.peak_bytes is None else f"{stats.peak_bytes / 1024:.1f}"
+            rate = '-' if stats.rate is None else f"{stats.rate:,.0f} {stats.unit}/s"
+            lines.append(f"{stats.name:<10} {stats.calls:>6} {stats.wall * 1000:10.2f} {stats.cpu * 1000:10.2f} "
+                         f"{peak:>10} {rate:>22}")
+        wall = sum(stats.wall for stats in self.phases.values())
+        cpu = sum(stats.cpu for stats in self.phases.values())
+        lines.append(f"{'total':<10} {'':>6} {wall * 1000:10.2f} {cpu * 1000:10.2f}")
+        lines.extend(f"{key}: {value}" for key, value in self.values.items())
+        return "\n".join(lines)
+
+    def profile_text(self, limit=25, sort='cumulative'):
+        if self.profiler is None:
+            return ''
+        output = io.StringIO()
+        pstats.Stats(self.profiler, stream=output).sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+
+class NullInstrumentation:
+    enabled = False
+
+    def phase(self, name):
+        return NULL_PHASE
+
+    def count(self, name, items):
+        pass
+
+    def note(self, key, value):
+        pass
+
+
+NULL_STATS = NullInstrumentation()
@@ -1,25 +1,102 @@
-# symbol_table.py
-
-# Removed: from semantic_analyzer import SemanticError
-# SemanticError is now defined in semantic_analyzer.py and imported by test.py and semantic_analyzer.py
-
-class SymbolTable:
-    def __init__(self):
-        self.symbols = {}
-
-    def add_symbol(self, name, attributes):
-        # We can still raise SemanticError here because semantic_analyzer.py
-        # will have imported SemanticError before importing SymbolTable.
-        # However, to be completely safe and break the cycle, you could
-        # define a basic error class here or raise a generic Exception,
-        # but raising SemanticError is fine in this structure.
-        from semantic_analzer import SemanticError # Import locally to avoid circular dependency at load time
-        if name in self.symbols:
-            raise SemanticError(f"Variable '{name}' already declared.")
-        self.symbols[name] = attributes
-
-    def get_symbol(self, name):
-        return self.symbols.get(name)
-
-    def has_symbol(self, name):
-        return name in self.symbols
+# symbol_table.py
+
+# SemanticError lives here so the symbol table can raise it without importing
+# semantic_analyzer.py; semantic_analyzer.py re-exports it.
+
+import sys
+from array import array
+
+# Compact type codes for declared variables.
+TYPE_INT = 0
+TYPE_FLOAT = 1
+TYPE_NAMES = ('int', 'float')
+TYPE_CODES = {'int': TYPE_INT, 'float': TYPE_FLOAT}
+
+
+class SemanticError(Exception):
+    pass
+
+
+class SymbolTable:
+    """Resolves variable names to dense integer slots.
+
+    Every declaration gets a new slot; names[slot] and types[slot] describe it
+    for the rest of compilation, so later stages can keep variables in plain
+    arrays indexed by slot. `visible` maps each name to the slot it currently
+    refers to. Scopes are a stack of slot lists: closing a scope removes its
+    slots from `visible` (restoring any slot they shadowed) without copying
+    anything."""
+
+    def __init__(self):
+        self.names = []
+        self.types = array('b')
+        self.previous = array('l')
+        self.depths = array('l')
+        self.visible = {}
+        self.scopes = [[]]
+        self.temporaries = []
+
+    def declare(self, name, type_code):
+        name = sys.intern(name)
+        previous = self.visible.get(name, -1)
+        depth = len(self.scopes) - 1
+        if previous >= 0 and self.depths[previous] == depth:
+            raise SemanticError(f"Variable '{name}' already declared.")
+        slot = len(self.names)
+        self.names.append(name)
+        self.types.append(type_code)
+        self.previous.append(previous)
+        self.depths.append(depth)
+        self.visible[name] = slot
+        self.scopes[-1].append(slot)
+        return slot
+
+    def declare_temporary(self, type_code):
+        """Slot for a value introduced by the optimizer. Temporaries are never
+        visible by name and are left out of program results."""
+        slot = len(self.names)
+        self.names.append(f"$t{slot}")
+        self.types.append(type_code)
+        self.previous.append(-1)
+        self.depths.append(-1)
+        self.temporaries.append(slot)
+        return slot
+
+    def lookup(self, name):
+        return self.visible.get(name, -1)
+
+    def push_scope(self):
+        self.scopes.append([])
+
+    def pop_scope(self):
+        visible = self.visible
+        for slot in reversed(self.scopes.pop()):
+            previous = self.previous[slot]
+            if previous >= 0:
+                visible[self.names[slot]] = previous
+            else:
+                del visible[self.names[slot]]
+
+    def type_name(self, slot):
+        return TYPE_NAMES[self.types[slot]]
+
+    def __len__(self):
+        return len(self.names)
+
+    # Name-based interface kept for existing callers.
+
+    def add_symbol(self, name, attributes):
+        self.declare(name, TYPE_CODES[attributes['type']])
+
+    def get_symbol(self, name):
+        slot = self.visible.get(name, -1)
+        if slot < 0:
+            return None
+        return {'type': TYPE_NAMES[self.types[slot]]}
+
+    def has_symbol(self, name):
+        return name in self.visible
+
+    @property
+    def symbols(self):
+        return {name: {'type': TYPE_NAMES[type_code]} for name, type_code in zip(self.names, self.types)}
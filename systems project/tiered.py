@@ -0,0 +1,268 @@
+# tiered.py
+
+import time
+from collections import OrderedDict
+from statistics import median
+
+from ast_nodes import DeclarationNode, AssignmentNode, IdentifierNode
+from symbol_table import TYPE_INT, TYPE_FLOAT
+from interpreter import Interpreter
+from pycodegen import PythonCodeGenerator, HELPERS, HELPER_PARAMETERS
+from tree_walker import iter_preorder
+
+# Iterations of one loop, over all of its runs, before it is compiled.
+HOT_LOOP_THRESHOLD = 50
+# Interpreted time of a loop is kept per PROFILE_BATCH iterations, for at
+# most MAX_PROFILE_BATCHES batches, to estimate the time compiling saves.
+PROFILE_BATCH = 10
+MAX_PROFILE_BATCHES = 100
+MAX_COMPILED_LOOPS = 64
+LOOP_FUNCTION = 'loop'
+TYPE_NAMES = {TYPE_INT: 'int', TYPE_FLOAT: 'float'}
+
+
+def loop_slots(node):
+    """Slots a loop reads or writes, its condition included, in slot order."""
+    return sorted({child.slot for child, _ in iter_preorder(node)
+                   if type(child) in (IdentifierNode, DeclarationNode, AssignmentNode)})
+
+
+class SpecializingGenerator(PythonCodeGenerator):
+    """Python code generation with variable types taken from the values seen
+    at run time instead of the symbol table."""
+
+    def __init__(self, symbol_table, observed):
+        super().__init__(symbol_table)
+        self.observed = observed
+
+    def leave_IdentifierNode(self, node, child_results):
+        return f"v{node.slot}", self.observed[node.slot]
+
+
+def loop_source(node, symbol_table, observed):
+    """A function that runs the loop on the values list from the start of its
+    next iteration to its exit and returns the number of iterations, or -1
+    without touching anything when a variable's type is not the one observed.
+    Stores convert to the declared type, so types checked on entry hold for
+    the whole run. Division by zero raises ExecutionError as the interpreter
+    does."""
+    slots = sorted(observed)
+    generator = SpecializingGenerator(symbol_table, observed)
+    generator.lines = []
+    generator.indent = 2
+    generator.walk(node.body)
+    condition, _ = generator.walk(node.condition)
+    lines = [f"def {LOOP_FUNCTION}(values, {HELPER_PARAMETERS}):"]
+    lines.extend(f"    v{slot} = values[{slot}]" for slot in slots)
+    guards = ' or '.join(f"type(v{slot}) is not {TYPE_NAMES[observed[slot]]}" for slot in slots)
+    if guards:
+        lines.append(f"    if {guards}:")
+        lines.append("        return -1")
+    lines.append("    iterations = 0")
+    lines.append("    while True:")
+    lines.append("        iterations += 1")
+    lines.extend(generator.lines)
+    lines.append(f"        if not {condition}: break")
+    lines.extend(f"    values[{slot}] = v{slot}" for slot in slots)
+    lines.append("    return iterations")
+    return "\n".join(lines) + "\n"
+
+
+class CompiledLoop:
+    __slots__ = ('function', 'source')
+
+    def __init__(self, function, source):
+        self.function = function
+        self.source = source
+
+
+class LoopProfile:
+    """Time spent in one loop, interpreted and compiled, over all of its runs.
+    Interpreted time is kept per batch of iterations and the median batch is
+    used, so a pause during a few of them does not skew the estimate."""
+
+    __slots__ = ('batches', 'batch_iterations', 'batch_seconds', 'compiled_iterations', 'compiled_seconds')
+
+    def __init__(self):
+        # Seconds per iteration of each full batch.
+        self.batches = []
+        self.batch_iterations = 0
+        self.batch_seconds = 0.0
+        self.compiled_iterations = 0
+        self.compiled_seconds = 0.0
+
+    def add_interpreted(self, seconds, iterations):
+        if len(self.batches) >= MAX_PROFILE_BATCHES:
+            return
+        self.batch_iterations += iterations
+        self.batch_seconds += seconds
+        if self.batch_iterations >= PROFILE_BATCH:
+            self.batches.append(self.batch_seconds / self.batch_iterations)
+            self.batch_iterations = 0
+            self.batch_seconds = 0.0
+
+    def seconds_saved(self):
+        """Interpreted minus compiled time for the iterations that ran compiled."""
+        if self.batches:
+            per_iteration = median(self.batches)
+        elif self.batch_iterations:
+            per_iteration = self.batch_seconds / self.batch_iterations
+        else:
+            return 0.0
+        return per_iteration * self.compiled_iterations - self.compiled_seconds
+
+
+class LoopCache:
+    """Compiled loops keyed by loop node, least recently used first, holding
+    at most max_entries. Counters and the profile of every loop seen cover
+    every engine that shares the cache."""
+
+    def __init__(self, max_entries=MAX_COMPILED_LOOPS):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.compilations = 0
+        self.compile_failures = 0
+        self.compile_seconds = 0.0
+        self.hits = 0
+        self.evictions = 0
+        self.guard_failures = 0
+        self.compiled_iterations = 0
+        self.profiles = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return entry
+
+    def add(self, key, entry):
+        self.entries[key] = entry
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def discard(self, key):
+        self.entries.pop(key, None)
+
+    def profile(self, key):
+        profile = self.profiles.get(key)
+        if profile is None:
+            profile = self.profiles[key] = LoopProfile()
+        return profile
+
+    def stats(self):
+        return {
+            'compilations': self.compilations,
+            'compile_failures': self.compile_failures,
+            'compile_seconds': self.compile_seconds,
+            'cache_hits': self.hits,
+            'cache_entries': len(self.entries),
+            'evictions': self.evictions,
+            'guard_failures': self.guard_failures,
+            'compiled_iterations': self.compiled_iterations,
+            'seconds_saved': sum(profile.seconds_saved() for profile in self.profiles.values()),
+        }
+
+
+class TieredInterpreter(Interpreter):
+    """Interpreter that compiles hot do-while loops to Python.
+
+    Each DoWhileNode counts its iterations. When a loop passes `threshold`,
+    the types of the variables it touches are recorded and the loop is
+    compiled to a function specialised for them, with a type guard on entry,
+    and execution switches to it at the next iteration. A failed guard sends
+    that run back to the tree walker and drops the compiled loop, so it is
+    compiled again for the new types once hot. Compiled code reports a
+    division by zero with the same ExecutionError as the tree walker.
+
+    Loops that do not compile (past CPython's nesting limits) stay
+    interpreted. `cache` may be shared between engines running the same
+    AST; seconds_saved in its stats() estimates interpreted minus compiled
+    time for the iterations that ran compiled, without compile time, from
+    each loop's interpreted iterations over all of its runs, those before
+    it became hot included."""
+
+    def __init__(self, symbol_table, parameters=None, threshold=HOT_LOOP_THRESHOLD, cache=None):
+        super().__init__(symbol_table, parameters)
+        self.threshold = threshold
+        self.cache = LoopCache() if cache is None else cache
+        self.counts = {}
+        self.slots = {}
+        self.uncompilable = set()
+
+    def observed_types(self, node):
+        slots = self.slots.get(node)
+        if slots is None:
+            slots = self.slots[node] = loop_slots(node)
+        values = self.values
+        return {slot: TYPE_FLOAT if type(values[slot]) is float else TYPE_INT for slot in slots}
+
+    def run_loop(self, node):
+        counts = self.counts
+        count = counts.get(node, 0)
+        profile = self.cache.profile(node)
+        started = time.perf_counter()
+        interpreted = 0
+        while True:
+            if count >= self.threshold and node not in self.uncompilable:
+                profile.add_interpreted(time.perf_counter() - started, interpreted)
+                if self.run_compiled(node, profile):
+                    counts[node] = count
+                    return
+                # Interpreted again until the loop is hot for its new types.
+                count = 0
+                started = time.perf_counter()
+                interpreted = 0
+            self.execute(node.body)
+            count += 1
+            interpreted += 1
+            if not self.evaluate(node.condition):
+                profile.add_interpreted(time.perf_counter() - started, interpreted)
+                counts[node] = count
+                return
+            if interpreted == PROFILE_BATCH:
+                now = time.perf_counter()
+                profile.add_interpreted(now - started, interpreted)
+                started = now
+                interpreted = 0
+
+    def run_compiled(self, node, profile):
+        """Runs the rest of the loop compiled. False means nothing ran and
+        the caller goes on interpreting."""
+        cache = self.cache
+        entry = cache.get(node)
+        if entry is None:
+            entry = self.compile_loop(node, self.observed_types(node))
+            if entry is None:
+                return False
+            cache.add(node, entry)
+        start = time.perf_counter()
+        iterations = entry.function(self.values)
+        if iterations < 0:
+            cache.guard_failures += 1
+            cache.discard(node)
+            return False
+        cache.compiled_iterations += iterations
+        profile.compiled_iterations += iterations
+        profile.compiled_seconds += time.perf_counter() - start
+        return True
+
+    def compile_loop(self, node, observed):
+        cache = self.cache
+        start = time.perf_counter()
+        try:
+            source = loop_source(node, self.symbol_table, observed)
+            namespace = dict(HELPERS)
+            exec(compile(source, '<tiered>', 'exec'), namespace)
+        except (SyntaxError, RecursionError, MemoryError):
+            cache.compile_failures += 1
+            self.uncompilable.add(node)
+            return None
+        finally:
+            cache.compile_seconds += time.perf_counter() - start
+        cache.compilations += 1
+        return CompiledLoop(namespace[LOOP_FUNCTION], source)
@@ -0,0 +1,84 @@
+# tree_walker.py
+
+# Returned by an enter_ hook to keep the walker out of that node's children.
+SKIP_CHILDREN = object()
+
+
+class TreeWalker:
+    """Base class for passes over the AST.
+
+    Subclasses define enter_<NodeClass>(node), called before a node's children,
+    and leave_<NodeClass>(node, child_results), called after them; the value a
+    leave_ hook returns is what the parent receives in its child_results, so
+    types and other attributes can be synthesised bottom-up. Hooks are found
+    along the node class's MRO (so enter_ExpressionNode covers every
+    expression) and resolved once per node class, then cached on the walker
+    class. Traversal uses an explicit stack, so tree depth is not limited by
+    the Python recursion limit."""
+
+    _dispatch = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._dispatch = {}
+
+    @classmethod
+    def resolve(cls, node_type):
+        enter = leave = None
+        for klass in node_type.__mro__:
+            if enter is None:
+                enter = getattr(cls, 'enter_' + klass.__name__, None)
+            if leave is None:
+                leave = getattr(cls, 'leave_' + klass.__name__, None)
+        # Leaf classes (no enter_ hook, children fixed to the class-level empty
+        # tuple) are left immediately without touching the stack.
+        leaf = enter is None and getattr(node_type, 'children', None) == ()
+        cls._dispatch[node_type] = entry = (enter, leave, leaf)
+        return entry
+
+    def walk(self, root):
+        dispatch = self._dispatch
+        resolve = self.resolve
+        results = []
+        append_result = results.append
+        # Each suspended frame is (node, leave hook, children, index of the next
+        # child, where the node's child results start in `results`). The root is
+        # walked as the only child of a sentinel frame.
+        stack = []
+        push = stack.append
+        node, leave, children, index, base = None, None, (root,), 0, 0
+        while True:
+            if index < len(children):
+                child = children[index]
+                index += 1
+                child_enter, child_leave, leaf = dispatch.get(child.__class__) or resolve(child.__class__)
+                if leaf:
+                    append_result(child_leave(self, child, ()) if child_leave is not None else None)
+                    continue
+                if child_enter is not None and child_enter(self, child) is SKIP_CHILDREN:
+                    grandchildren = ()
+                else:
+                    grandchildren = child.children
+                if grandchildren:
+                    push((node, leave, children, index, base))
+                    node, leave, children, index, base = child, child_leave, grandchildren, 0, len(results)
+                else:
+                    append_result(child_leave(self, child, ()) if child_leave is not None else None)
+                continue
+            if not stack:
+                return results[0]
+            child_results = results[base:]
+            del results[base:]
+            append_result(leave(self, node, child_results) if leave is not None else None)
+            node, leave, children, index, base = stack.pop()
+
+
+def iter_preorder(root):
+    """Yields (node, depth) pairs in pre-order without recursion."""
+    stack = [(root, 0)]
+    while stack:
+        node, depth = stack.pop()
+        yield node, depth
+        children = node.children
+        for index in range(len(children) - 1, -1, -1):
+            stack.append((children[index], depth + 1))
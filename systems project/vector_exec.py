@@ -0,0 +1,208 @@
+# vector_exec.py
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from lexical import TokenKind
+from ast_nodes import (
+    ProgramNode, StatementListNode, DeclarationNode, AssignmentNode, DoWhileNode,
+    IntLiteralNode, FloatLiteralNode, IdentifierNode
+)
+from symbol_table import TYPE_FLOAT
+from interpreter import Interpreter, ExecutionError, results_by_name
+
+# Ints are int64 here but unbounded in the scalar backends, so a lane is only
+# vectorised while its ints stay within INT_LIMIT, where sums and differences
+# cannot wrap. A product is checked in floats against PRODUCT_LIMIT before it
+# is trusted. Ints above EXACT_FLOAT_INT have no exact float, which changes
+# int/float comparisons.
+INT_LIMIT = 2 ** 62
+PRODUCT_LIMIT = 2.0 ** 61
+EXACT_FLOAT_INT = 2 ** 53
+
+COMPARISONS = {
+    TokenKind.LESS_THAN: 'less', TokenKind.GREATER_THAN: 'greater',
+    TokenKind.LESS_EQUAL: 'less_equal', TokenKind.GREATER_EQUAL: 'greater_equal',
+    TokenKind.EQUAL_EQUAL: 'equal', TokenKind.NOT_EQUAL: 'not_equal',
+}
+
+
+class VectorResult:
+    """Final variables of every lane. columns maps each name to an int64 or
+    float64 array over the lanes, like Interpreter.run's dict; the lanes in
+    `fallback` ran on the interpreter instead and their entries in columns
+    mean nothing. lane(i) gives (values, error) for any lane either way."""
+
+    def __init__(self, columns, fallback, lanes):
+        self.columns = columns
+        self.fallback = fallback
+        self.lanes = lanes
+
+    def __len__(self):
+        return self.lanes
+
+    def lane(self, index):
+        if index in self.fallback:
+            return self.fallback[index]
+        return {name: column[index].item() for name, column in self.columns.items()}, None
+
+
+class VectorExecutor:
+    """Runs one analyzed program over many input states at once with NumPy.
+
+    Every variable is a column with one entry per lane, and each expression
+    is evaluated as array operations over the lanes still running. A
+    do-while loop keeps the lanes whose condition is true and repeats until
+    none are left, so lanes may take different numbers of iterations.
+
+    Inputs work as for Interpreter(parameters=...): a declaration without an
+    initializer takes the variable's input, given as one value per lane (or
+    one value for all). Lanes that divide by zero or leave the range where
+    int64 matches Python's ints drop out of the vector run and are run again
+    on the interpreter, so every lane's result is what scalar execution
+    gives, errors and int/float types included."""
+
+    def __init__(self, program, symbol_table):
+        if np is None:
+            raise ImportError("vector execution needs NumPy")
+        self.program = program
+        self.symbol_table = symbol_table
+        self.float_slots = [type_code == TYPE_FLOAT for type_code in symbol_table.types]
+        self.columns = None
+        self.parameters = None
+        self.escaped = None
+        self.count = 0
+
+    def run(self, inputs=None, lanes=None):
+        inputs = inputs or {}
+        if lanes is None:
+            lanes = max((len(values) for values in inputs.values() if np.ndim(values)), default=1)
+        self.count = lanes
+        self.parameters = self.parameter_columns(inputs)
+        self.columns = [np.zeros(lanes, np.float64 if is_float else np.int64) for is_float in self.float_slots]
+        self.escaped = np.zeros(lanes, bool)
+        with np.errstate(all='ignore'):
+            self.execute(self.program, None)
+        fallback = {}
+        for lane in np.flatnonzero(self.escaped).tolist():
+            parameters = {name: np.asarray(values).item() if not np.ndim(values) else np.asarray(values)[lane].item()
+                          for name, values in inputs.items()}
+            interpreter = Interpreter(self.symbol_table, parameters)
+            try:
+                fallback[lane] = interpreter.run(self.program), None
+            except ExecutionError as e:
+                fallback[lane] = None, str(e)
+        columns = results_by_name(self.symbol_table, self.columns)
+        self.columns = self.parameters = None
+        return VectorResult(columns, fallback, lanes)
+
+    def parameter_columns(self, inputs):
+        columns = {}
+        for slot, name in enumerate(self.symbol_table.names):
+            if name not in inputs:
+                continue
+            values = np.asarray(inputs[name])
+            if self.float_slots[slot]:
+                values = values.astype(np.float64)
+            elif values.dtype.kind not in 'iu':
+                raise ValueError(f"Parameter '{name}' must be an int, got {values.dtype} values")
+            else:
+                values = values.astype(np.int64)
+            columns[slot] = np.broadcast_to(values, (self.count,))
+        return columns
+
+    def flag(self, lanes, bad):
+        """Marks the lanes where `bad` holds as leaving the vector run."""
+        if np.ndim(bad) == 0:
+            if bad:
+                self.escaped[slice(None) if lanes is None else lanes] = True
+        elif bad.any():
+            self.escaped[bad if lanes is None else lanes[bad]] = True
+
+    def live(self, lanes):
+        return lanes[~self.escaped[lanes]]
+
+    def store(self, slot, value, lanes):
+        if lanes is None:
+            dtype = np.float64 if self.float_slots[slot] else np.int64
+            self.columns[slot] = np.broadcast_to(value, (self.count,)).astype(dtype)
+        else:
+            self.columns[slot][lanes] = value
+
+    def execute(self, node, lanes):
+        node_type = type(node)
+        if node_type is StatementListNode or node_type is ProgramNode:
+            for statement in node.children:
+                self.execute(statement, lanes)
+        elif node_type is AssignmentNode:
+            self.store(node.slot, self.evaluate(node.assignment_expr, lanes), lanes)
+        elif node_type is DeclarationNode:
+            if node.assignment_expr is not None:
+                value = self.evaluate(node.assignment_expr, lanes)
+            elif node.slot in self.parameters:
+                value = self.parameters[node.slot]
+                if lanes is not None:
+                    value = value[lanes]
+                if not self.float_slots[node.slot]:
+                    self.flag(lanes, (value > INT_LIMIT) | (value < -INT_LIMIT))
+            else:
+                value = 0
+            self.store(node.slot, value, lanes)
+        elif node_type is DoWhileNode:
+            active = self.live(np.arange(self.count) if lanes is None else lanes)
+            while len(active):
+                # While every lane runs, whole columns are used without gathering.
+                running = None if len(active) == self.count else active
+                self.execute(node.body, running)
+                condition = self.evaluate(node.condition, running)
+                active = self.live(active[np.broadcast_to(condition != 0, active.shape)])
+        else:
+            raise ExecutionError(f"Cannot execute {node!r}")
+
+    def evaluate(self, node, lanes):
+        node_type = type(node)
+        if node_type is IdentifierNode:
+            column = self.columns[node.slot]
+            return column if lanes is None else column[lanes]
+        if node_type is FloatLiteralNode:
+            return np.float64(node.value)
+        if node_type is IntLiteralNode:
+            if node.value > INT_LIMIT:
+                self.flag(lanes, True)
+                return np.int64(0)
+            return np.int64(node.value)
+        left = self.evaluate(node.left, lanes)
+        right = self.evaluate(node.right, lanes)
+        return self.binary_op(node.operator_token, left, right, lanes)
+
+    def binary_op(self, operator_token, left, right, lanes):
+        kind = operator_token.kind
+        left_float = left.dtype.kind == 'f'
+        right_float = right.dtype.kind == 'f'
+        is_float = left_float or right_float
+        if kind == TokenKind.PLUS or kind == TokenKind.MINUS:
+            result = left + right if kind == TokenKind.PLUS else left - right
+            if not is_float:
+                self.flag(lanes, (result > INT_LIMIT) | (result < -INT_LIMIT))
+            return result
+        if kind == TokenKind.MULTIPLY:
+            if not is_float:
+                self.flag(lanes, np.abs(left.astype(np.float64) * right) > PRODUCT_LIMIT)
+            return left * right
+        if kind == TokenKind.DIVIDE:
+            zero = right == 0
+            self.flag(lanes, zero)
+            right = np.where(zero, 1, right)
+            if is_float:
+                return left / right
+            quotient = np.abs(left) // np.abs(right)
+            return np.where((left < 0) != (right < 0), -quotient, quotient)
+        comparison = COMPARISONS.get(kind)
+        if comparison is None:
+            raise ExecutionError(f"Unknown operator '{operator_token.lexeme}'")
+        if left_float != right_float:
+            integer = right if left_float else left
+            self.flag(lanes, np.abs(integer) > EXACT_FLOAT_INT)
+        return getattr(np, comparison)(left, right).astype(np.int64)
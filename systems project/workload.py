@@ -0,0 +1,192 @@
+# workload.py
+
+import random
+
+from lexical import LexicalError
+from parser import SyntaxError
+from semantic_analzer import SemanticError
+
+ERROR_KINDS = ('lexical', 'syntax', 'semantic')
+# The exception each injected error kind raises.
+ERROR_EXCEPTIONS = {'lexical': LexicalError, 'syntax': SyntaxError, 'semantic': SemanticError}
+
+# Size tiers for benchmarks, smallest first.
+TIERS = {
+    '1k': 1 << 10, '64k': 1 << 16, '1m': 1 << 20, '16m': 1 << 24, '256m': 1 << 28, '1g': 1 << 30,
+}
+
+COMPARISONS = ('<', '>', '<=', '>=', '!=')
+
+
+class ProgramGenerator:
+    """Seeded generator of valid programs for this grammar.
+
+    Programs mix declarations, assignments and nested do-while loops with
+    expressions up to `width` operands wide and `depth` levels of nested
+    parentheses. Every name is unique, int variables only receive int
+    expressions, loops count their own counter up to `iterations`, and
+    division is only by non-zero literals, so programs pass SemanticAnalyzer
+    and also run to completion on every backend. `comments` and `noise` are
+    the chances of a comment and of extra whitespace around a statement.
+
+    generate(size) returns the program as one string; chunks(size) yields it
+    a top-level statement at a time for sizes that should not be held in memory.
+    error='lexical', 'syntax' or 'semantic' puts one such error at a random
+    point of the program."""
+
+    def __init__(self, seed=0, width=4, depth=2, loop_depth=3, iterations=4, comments=0.1, noise=0.1,
+                 floats=0.3):
+        self.rng = random.Random(seed)
+        self.width = width
+        self.depth = depth
+        self.loop_depth = loop_depth
+        self.iterations = iterations
+        self.comments = comments
+        self.noise = noise
+        self.floats = floats
+        self.names = 0
+
+    def new_name(self, prefix):
+        self.names += 1
+        return f"{prefix}{self.names}"
+
+    def literal(self, is_float):
+        rng = self.rng
+        if is_float:
+            return f"{rng.randint(0, 99)}.{rng.randint(0, 99)}"
+        return str(rng.randint(0, 99))
+
+    def operand(self, scope, is_float):
+        rng = self.rng
+        ints, floats, _ = scope
+        count = len(ints) + len(floats) if is_float else len(ints)
+        if count and rng.random() < 0.6:
+            index = rng.randrange(count)
+            return ints[index] if index < len(ints) else floats[index - len(ints)]
+        return self.literal(is_float and rng.random() < 0.5)
+
+    def expression(self, scope, is_float, depth=0):
+        """An expression whose type fits an int variable unless is_float."""
+        rng = self.rng
+        if depth >= self.depth or rng.random() < 0.25:
+            return self.operand(scope, is_float)
+        count = rng.randint(2, max(2, self.width))
+        parts = [self.expression(scope, is_float, depth + 1)]
+        for _ in range(count - 1):
+            choice = rng.random()
+            if choice < 0.1:
+                # Comparisons give 1 or 0 whatever their operand types.
+                parts.append(rng.choice(COMPARISONS))
+                parts.append(self.expression(scope, True, depth + 1))
+                text = ' '.join(parts)
+                parts = [f"({text})"]
+            elif choice < 0.25:
+                parts.append('/')
+                parts.append(str(rng.randint(1, 9)))
+            elif choice < 0.45:
+                # Small literal factors keep values from growing inside loops.
+                parts.append('*')
+                parts.append(str(rng.randint(0, 3)))
+            else:
+                parts.append(rng.choice('+-'))
+                parts.append(self.expression(scope, is_float, depth + 1))
+        text = ' '.join(parts)
+        return f"({text})" if depth else text
+
+    def decorate(self, text, indent):
+        rng = self.rng
+        if rng.random() < self.noise:
+            text = rng.choice(('  ', '\t', ' \n' + indent)) + text + rng.choice((' ', '\t ', '\n'))
+        if rng.random() < self.comments:
+            if rng.random() < 0.5:
+                text = f"{text} // note {self.names}"
+            else:
+                text = f"/* block {self.names} */ {text}"
+        return indent + text + "\n"
+
+    def statements(self, scope, indent, loop_depth):
+        """Yields statements at one nesting level forever; the caller stops.
+        scope is (int names, float names, int names that are not loop
+        counters), the names visible here."""
+        rng = self.rng
+        ints, floats, targets = scope
+        while True:
+            choice = rng.random()
+            if choice < 0.2 or not ints:
+                name = self.new_name('i')
+                yield self.decorate(f"int {name} = {self.expression(scope, False)};", indent)
+                ints.append(name)
+                targets.append(name)
+            elif choice < 0.3:
+                name = self.new_name('f')
+                yield self.decorate(f"float {name} = {self.expression(scope, True)};", indent)
+                floats.append(name)
+            elif choice < 0.8:
+                if floats and rng.random() < self.floats:
+                    yield self.decorate(f"{rng.choice(floats)} = {self.expression(scope, True)};", indent)
+                elif targets:
+                    yield self.decorate(f"{rng.choice(targets)} = {self.expression(scope, False)};", indent)
+            elif loop_depth < self.loop_depth:
+                yield self.loop(scope, indent, loop_depth)
+
+    def loop(self, scope, indent, loop_depth):
+        """A counted do-while loop, returned whole so it is never split."""
+        rng = self.rng
+        ints, floats, targets = scope
+        counter = self.new_name('loop')
+        parts = [self.decorate(f"int {counter} = 0;", indent), f"{indent}do {{\n"]
+        ints.append(counter)
+        inner = indent + "    "
+        parts.append(f"{inner}{counter} = {counter} + 1;\n")
+        saved = len(ints), len(floats), len(targets)
+        body = self.statements(scope, inner, loop_depth + 1)
+        parts.extend(next(body) for _ in range(rng.randint(1, 5)))
+        # Names declared in the body go out of scope after the loop.
+        del ints[saved[0]:], floats[saved[1]:], targets[saved[2]:]
+        parts.append(f"{indent}}} while ({counter} < {rng.randint(1, self.iterations)});\n")
+        return ''.join(parts)
+
+    def chunks(self, size, error=None):
+        if error is not None and error not in ERROR_KINDS:
+            raise ValueError(f"Unknown error kind {error!r}")
+        scope = ([], [], [])
+        statements = self.statements(scope, "", 0)
+        error_at = self.rng.randint(0, max(0, size - 1)) if error else None
+        written = 0
+        while written < size:
+            chunk = next(statements)
+            if error_at is not None and written + len(chunk) > error_at:
+                chunk = self.error_statement(error, scope) + chunk
+                error_at = None
+            written += len(chunk)
+            yield chunk
+
+    def generate(self, size, error=None):
+        return ''.join(self.chunks(size, error))
+
+    def error_statement(self, kind, scope):
+        rng = self.rng
+        ints = scope[0]
+        if kind == 'lexical':
+            return f"{rng.choice(ints) if ints else 'x'} = 1 {rng.choice('$@#?')} 2;\n"
+        if kind == 'syntax':
+            return rng.choice((
+                "int = 3;\n",
+                f"{ints[0] if ints else 'x'} = (1 + 2;\n",
+                "do { } while (1)\n",
+                "} \n",
+                f"{ints[0] if ints else 'x'} = 1 2;\n",
+            ))
+        choices = [f"{self.new_name('missing')} = 1;\n", f"int ok{self.names} = {self.new_name('missing')};\n"]
+        if ints:
+            choices.append(f"{rng.choice(ints)} = 1.5;\n")
+            choices.append(f"int {rng.choice(ints)} = 2;\n")
+        return rng.choice(choices)
+
+
+def write_program(path, size, seed=0, error=None, **options):
+    """Streams a generated program of about `size` characters to `path`."""
+    generator = ProgramGenerator(seed, **options)
+    with open(path, 'w') as output:
+        for chunk in generator.chunks(size, error):
+            output.write(chunk)